@@ -1,11 +1,135 @@
+import re
+
+from django import forms
 from django.contrib import admin
-from .models import Profile, Project, Task, Document, Comment
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models import Q, Sum
+from django.template.response import TemplateResponse
+from django.utils.html import format_html
+from . import archive, deletion, membership, search
+from .models import (
+    ArchivedComment,
+    ArchivedTask,
+    Profile,
+    Project,
+    Task,
+    Document,
+    Comment,
+)
+from .paginator import ApproximateCountPaginator
+from .utils import chunked
+
+
+class RawIdFieldListFilter(admin.RelatedFieldListFilter):
+    """
+    Related field filter for large tables. Instead of loading every related
+    object to build the sidebar it shows the selected object and an ID input,
+    the filter counterpart of ``raw_id_fields``.
+    """
+
+    template = "admin/models_task/raw_id_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        ignored = {self.lookup_kwarg, self.lookup_kwarg_isnull, "p"}
+        self.preserved_params = [
+            (name, value)
+            for name, values in request.GET.lists()
+            if name not in ignored
+            for value in values
+        ]
+
+    def field_choices(self, field, request, model_admin):
+        if not self.lookup_val:
+            return []
+        try:
+            selected = field.related_model._default_manager.filter(
+                pk__in=self.lookup_val
+            )
+            return [(obj.pk, str(obj)) for obj in selected]
+        except (ValueError, ValidationError):
+            return []
+
+    def has_output(self):
+        return True
+
+
+class FullTextSearchMixin:
+    """
+    Serve ``search_fields`` from the full-text index instead of ``LIKE`` scans.
+
+    Fields covered by the index are matched through it. Lookups across a
+    relation (``project__title``) search the small related table and filter on
+    the foreign key, which the foreign key index serves.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if not re.search(r"\w", search_term) or not search.available(
+            self.model, queryset.db
+        ):
+            return super().get_search_results(request, queryset, search_term)
+
+        indexed = search.INDEXED_FIELDS[self.model]
+        condition = Q()
+        if any(field in indexed for field in self.search_fields):
+            condition |= Q(pk__in=search.matching(self.model, search_term, queryset.db))
+        for field in self.search_fields:
+            if "__" not in field:
+                continue
+            relation, lookup = field.split("__", 1)
+            related = self.model._meta.get_field(relation).related_model
+            condition |= Q(
+                **{
+                    f"{relation}__in": related._default_manager.filter(
+                        **{f"{lookup}__icontains": search_term}
+                    ).values("pk")
+                }
+            )
+        return queryset.filter(condition), False
 
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ("user", "role", "contact_number")
+    list_display = ("thumbnail", "user", "role", "contact_number")
+    list_display_links = ("user",)
+    list_select_related = ("user",)
     search_fields = ("user__username", "role")
+    autocomplete_fields = ("user",)
+
+    @admin.display(description="Picture")
+    def thumbnail(self, obj):
+        url = obj.thumbnail_url()
+        if not url:
+            return "-"
+        return format_html('<img src="{}" width="32" height="32" alt="">', url)
+
+
+class TeamChangeForm(forms.Form):
+    operation = forms.ChoiceField(
+        choices=[("add", "Add to the teams"), ("remove", "Remove from the teams")],
+        widget=forms.RadioSelect,
+        initial="add",
+    )
+    usernames = forms.CharField(
+        widget=forms.Textarea,
+        help_text="Usernames, separated by spaces, commas or new lines.",
+    )
+
+    def clean_usernames(self):
+        names = set(re.split(r"[\s,]+", self.cleaned_data["usernames"])) - {""}
+        found = {}
+        for chunk in chunked(names, 900):
+            found.update(
+                get_user_model()
+                .objects.filter(username__in=chunk)
+                .values_list("username", "pk")
+            )
+        missing = sorted(names - found.keys())
+        if missing:
+            raise ValidationError(f"Unknown usernames: {', '.join(missing[:20])}")
+        return list(found.values())
 
 
 @admin.register(Project)
@@ -13,23 +137,158 @@ class ProjectAdmin(admin.ModelAdmin):
     list_display = ("title", "start_date", "end_date")
     search_fields = ("title",)
     list_filter = ("start_date", "end_date")
+    autocomplete_fields = ("team_members",)
+    actions = ("change_team", "delete_in_batches")
+
+    @admin.action(
+        description="Add or remove team members of selected projects",
+        permissions=["change"],
+    )
+    def change_team(self, request, queryset):
+        """Change the teams of many projects at once, see ``membership``."""
+        form = TeamChangeForm(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            pks = list(queryset.values_list("pk", flat=True))
+            users = form.cleaned_data["usernames"]
+            if form.cleaned_data["operation"] == "add":
+                count = membership.add(pks, users)
+                self.message_user(request, f"Added {count} team memberships.")
+            else:
+                count = membership.remove(pks, users)
+                self.message_user(request, f"Removed {count} team memberships.")
+            return None
+
+        return TemplateResponse(
+            request,
+            "admin/models_task/project/change_team.html",
+            {
+                **self.admin_site.each_context(request),
+                "title": "Change project teams",
+                "opts": self.model._meta,
+                "form": form,
+                "pks": list(queryset.values_list("pk", flat=True)),
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            },
+        )
+
+    @admin.action(
+        description="Delete selected projects in batches", permissions=["delete"]
+    )
+    def delete_in_batches(self, request, queryset):
+        """
+        Delete big projects without loading their tasks and comments, see
+        ``models_task.deletion``. Unlike the built-in action the confirmation
+        page lists task totals rather than every object to be deleted.
+        """
+        # Rows are deleted directly, check what the collector would check
+        perms_lacking = [
+            model._meta.verbose_name_plural
+            for model in (Task, Comment, Document)
+            if not self.admin_site.get_model_admin(model).has_delete_permission(request)
+        ]
+        if request.POST.get("post") and not perms_lacking:
+            pks = list(queryset.values_list("pk", flat=True))
+            deletion.schedule(pks)
+            self.message_user(
+                request,
+                f"Marked {len(pks)} projects for deletion, their rows are being "
+                "deleted in the background. They disappear from this list once "
+                "all their rows are gone; should a restart interrupt the "
+                "deletion, run 'manage.py delete_projects --pending'.",
+            )
+            return None
+
+        projects = queryset.annotate(task_count=Sum("task_stats__count")).order_by("pk")
+        return TemplateResponse(
+            request,
+            "admin/models_task/project/delete_in_batches.html",
+            {
+                **self.admin_site.each_context(request),
+                "title": "Delete projects in batches",
+                "opts": self.model._meta,
+                "projects": projects,
+                "perms_lacking": perms_lacking,
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            },
+        )
 
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ("title", "status", "project", "assignee", "created_at")
-    search_fields = ("title", "project__title")
-    list_filter = ("status", "project", "assignee")
+    list_select_related = ("project", "assignee")
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    search_fields = ("title", "description", "project__title")
+    list_filter = (
+        "status",
+        ("project", RawIdFieldListFilter),
+        ("assignee", RawIdFieldListFilter),
+    )
+    autocomplete_fields = ("project", "assignee")
 
 
 @admin.register(Document)
-class DocumentAdmin(admin.ModelAdmin):
+class DocumentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ("name", "version", "project", "uploaded_at")
-    search_fields = ("name", "project__title")
+    list_select_related = ("project",)
+    search_fields = ("name", "description", "project__title")
+    autocomplete_fields = ("project",)
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ("author", "created_at", "task", "project")
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ("author", "created_at", "task", "project", "parent")
+    list_select_related = ("author", "task", "project", "parent__author")
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     search_fields = ("author__username", "text")
-    list_filter = ("task", "project")
+    list_filter = (
+        ("task", RawIdFieldListFilter),
+        ("project", RawIdFieldListFilter),
+        ("parent", RawIdFieldListFilter),
+    )
+    autocomplete_fields = ("author", "task", "project")
+    raw_id_fields = ("parent",)
+
+
+class ArchiveAdmin(admin.ModelAdmin):
+    """Archived rows are read-only, they can only be restored."""
+
+    actions = ("restore",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedTask)
+class ArchivedTaskAdmin(ArchiveAdmin):
+    list_display = ("title", "status", "project", "assignee", "archived_at")
+    list_select_related = ("project", "assignee")
+    search_fields = ("title",)
+    list_filter = ("status", ("project", RawIdFieldListFilter))
+
+    @admin.action(description="Restore selected tasks with their comments")
+    def restore(self, request, queryset):
+        tasks, comments = archive.restore_tasks(
+            list(queryset.values_list("pk", flat=True))
+        )
+        self.message_user(request, f"Restored {tasks} tasks and {comments} comments.")
+
+
+@admin.register(ArchivedComment)
+class ArchivedCommentAdmin(ArchiveAdmin):
+    list_display = ("author", "created_at", "task", "project", "archived_at")
+    list_select_related = ("author", "task", "project")
+    list_filter = (("project", RawIdFieldListFilter),)
+
+    @admin.action(description="Restore selected project comments")
+    def restore(self, request, queryset):
+        restored = archive.restore_comments(list(queryset.values_list("pk", flat=True)))
+        self.message_user(
+            request,
+            f"Restored {restored} comments. Task comments are restored with their task.",
+        )
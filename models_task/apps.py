@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ModelsTaskConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "models_task"
+
+    def ready(self):
+        from . import db, profiling, signals  # noqa: F401
+
+        profiling.install()
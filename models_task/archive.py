@@ -0,0 +1,229 @@
+"""
+Archival of finished tasks and old comments.
+
+Tasks that have been ``completed`` or ``closed`` for a while, together with
+their comments, are moved to ``ArchivedTask`` and ``ArchivedComment`` so that
+the hot tables only hold live work. Every batch is copied and deleted in its
+own short transaction, which keeps locks brief and makes an interrupted run
+safe to start again: it simply picks up the rows that are still left.
+
+Tasks carry no closing timestamp, ``updated_at`` stands in for it. Project
+comments are archived a whole thread at a time, once its last reply is old.
+"""
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Concat, Left
+
+from . import cache, deletion
+from .models import (
+    ArchivedComment,
+    ArchivedTask,
+    Comment,
+    Task,
+    suppress_transitions,
+)
+from .utils import pk_batches
+
+ARCHIVED_STATUSES = ("completed", "closed")
+
+TASK_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "status",
+    "project_id",
+    "assignee_id",
+    "created_at",
+    "updated_at",
+)
+COMMENT_FIELDS = (
+    "id",
+    "text",
+    "author_id",
+    "created_at",
+    "updated_at",
+    "task_id",
+    "project_id",
+    "parent_id",
+    "path",
+)
+
+
+def archivable_tasks(before, using="default"):
+    return Task.objects.using(using).filter(
+        status__in=ARCHIVED_STATUSES, updated_at__lt=before
+    )
+
+
+def archivable_comments(before, using="default"):
+    """
+    Project comments of threads with no comment since ``before``. Task comments
+    follow their task.
+    """
+    root = Left(OuterRef("path"), Comment.SEGMENT)
+    recent = Comment.objects.using(using).filter(
+        task__isnull=True,
+        path__gte=root,
+        path__lt=Concat(root, Value("~")),
+        created_at__gte=before,
+    )
+    return (
+        Comment.objects.using(using)
+        .filter(task__isnull=True, created_at__lt=before)
+        .exclude(Exists(recent))
+    )
+
+
+def _insert(model, rows, using):
+    objs = [model(**row) for row in rows]
+    model.objects.using(using).bulk_create(objs, batch_size=500)
+    # bulk_create() stamps auto_now(_add) fields, keep the copied values
+    stamped = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    stamped = [name for name in stamped if rows and name in rows[0]]
+    if stamped:
+        for obj, row in zip(objs, rows):
+            for name in stamped:
+                setattr(obj, name, row[name])
+        model.objects.using(using).bulk_update(objs, stamped, batch_size=500)
+
+
+def archive_task_batch(pks, using="default"):
+    """Move the tasks ``pks`` and their comments, return ``(tasks, comments)``."""
+    with transaction.atomic(using=using):
+        # Checked again under the write lock in case a task was reopened
+        tasks = list(
+            Task.objects.using(using)
+            .select_for_update()
+            .filter(pk__in=pks, status__in=ARCHIVED_STATUSES)
+            .values(*TASK_FIELDS)
+        )
+        pks = [task["id"] for task in tasks]
+        comments = Comment.objects.using(using).filter(task_id__in=pks)
+        rows = list(comments.values(*COMMENT_FIELDS))
+        _insert(ArchivedTask, tasks, using)
+        _insert(ArchivedComment, rows, using)
+        # Plain DELETEs with the bookkeeping done once for the batch: status
+        # counters, work items, change feed and cache
+        deletion.delete_task_batch(pks, using)
+    return len(tasks), len(rows)
+
+
+def archive_comment_batch(pks, using="default"):
+    with transaction.atomic(using=using):
+        comments = Comment.objects.using(using).filter(pk__in=pks, task__isnull=True)
+        rows = list(comments.values(*COMMENT_FIELDS))
+        _insert(ArchivedComment, rows, using)
+        comments.delete()
+    return len(rows)
+
+
+def archive_tasks(before, batch_size=500, using="default"):
+    """Archive tasks finished before ``before``, yielding each batch's counts."""
+    for pks in pk_batches(archivable_tasks(before, using), batch_size):
+        yield archive_task_batch(pks, using)
+
+
+def archive_comments(before, batch_size=500, using="default"):
+    """Archive project comments older than ``before``, yielding batch sizes."""
+    # Newest first, deleting a comment deletes the replies still left
+    comments = archivable_comments(before, using)
+    for pks in pk_batches(comments, batch_size, descending=True):
+        yield archive_comment_batch(pks, using)
+
+
+def restore_tasks(pks, using="default"):
+    """Move archived tasks and their comments back, return ``(tasks, comments)``."""
+    with transaction.atomic(using=using):
+        archived = ArchivedTask.objects.using(using).filter(pk__in=pks)
+        tasks = list(archived.values(*TASK_FIELDS))
+        comments = ArchivedComment.objects.using(using).filter(task__in=archived)
+        rows = list(comments.values(*COMMENT_FIELDS))
+        # Adjusts the task status counters and logs the tasks as created to
+        # the change feed. Their status history is still in the transition log.
+        token = suppress_transitions.set(True)
+        try:
+            _insert(Task, tasks, using)
+        finally:
+            suppress_transitions.reset(token)
+        _insert(Comment, rows, using)
+        archived.delete()
+        # bulk_create() sends no signals, drop the stale list entries here
+        project_ids = {task["project_id"] for task in tasks}
+        cache.invalidate(
+            [
+                *cache.project.keys(project_ids),
+                *cache.project_tasks.keys(project_ids),
+                *cache.project_comments.keys(project_ids),
+            ],
+            using,
+        )
+    return len(tasks), len(rows)
+
+
+def restore_comments(pks, using="default"):
+    """
+    Move archived project comments back with the rest of their threads, return
+    how many were restored.
+    """
+    with transaction.atomic(using=using):
+        roots = (
+            ArchivedComment.objects.using(using)
+            .filter(pk__in=pks, task__isnull=True)
+            .values(root=Left("path", Comment.SEGMENT))
+        )
+        archived = (
+            ArchivedComment.objects.using(using)
+            .alias(root=Left("path", Comment.SEGMENT))
+            .filter(task__isnull=True, root__in=roots)
+        )
+        rows = list(archived.values(*COMMENT_FIELDS))
+        # A parent deleted while its replies were archived leaves them roots
+        restored = {row["id"] for row in rows}
+        parent_ids = {row["parent_id"] for row in rows} - restored - {None}
+        live = set(
+            Comment.objects.using(using)
+            .filter(pk__in=parent_ids)
+            .values_list("pk", flat=True)
+        )
+        for row in rows:
+            if row["parent_id"] in parent_ids - live:
+                row["parent_id"] = None
+        _insert(Comment, rows, using)
+        archived.delete()
+        cache.invalidate(
+            cache.project_comments.keys({row["project_id"] for row in rows}), using
+        )
+    return len(rows)
+
+
+def task_rows(*fields, using="default", **filters):
+    """
+    Return ``values()`` rows of live and archived tasks matching ``filters``,
+    each with an ``archived`` flag. The result is a union and can still be
+    ordered and sliced, e.g. ``task_rows(project_id=1).order_by("-created_at")``.
+    """
+    fields = fields or TASK_FIELDS
+    live = Task.objects.using(using).filter(**filters).order_by()
+    archived = ArchivedTask.objects.using(using).filter(**filters).order_by()
+    return (
+        live.values(*fields)
+        .annotate(archived=Value(False))
+        .union(archived.values(*fields).annotate(archived=Value(True)), all=True)
+    )
+
+
+def comment_rows(*fields, using="default", **filters):
+    """Like ``task_rows()``, for live and archived comments."""
+    fields = fields or COMMENT_FIELDS
+    live = Comment.objects.using(using).filter(**filters).order_by()
+    archived = ArchivedComment.objects.using(using).filter(**filters).order_by()
+    return (
+        live.values(*fields)
+        .annotate(archived=Value(False))
+        .union(archived.values(*fields).annotate(archived=Value(True)), all=True)
+    )
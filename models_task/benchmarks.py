@@ -0,0 +1,271 @@
+"""
+Benchmarks of the models_task hot paths, run by ``manage.py benchmark``.
+
+Each benchmark runs one request or write against a seeded dataset and is
+timed over repeated runs, then run once more to count its queries and once
+under ``tracemalloc`` for its peak memory. Write benchmarks run in a
+transaction that is rolled back, so every run sees the same data.
+
+Results are plain dicts, so they can be saved as a JSON baseline and later
+runs compared against it with ``compare()``.
+"""
+
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from . import membership
+from .models import Comment, Project, Task
+from .profiling import QueryRecorder, percentile
+
+# populate_fake_data arguments of each dataset size
+SCALES = {
+    "10k": {
+        "users": 200,
+        "projects": 20,
+        "tasks": 10_000,
+        "documents": 500,
+        "comments": 20_000,
+    },
+    "100k": {
+        "users": 1_000,
+        "projects": 100,
+        "tasks": 100_000,
+        "documents": 5_000,
+        "comments": 200_000,
+    },
+    "1m": {
+        "users": 5_000,
+        "projects": 500,
+        "tasks": 1_000_000,
+        "documents": 20_000,
+        "comments": 2_000_000,
+    },
+}
+
+# Differences below these are noise, whatever the relative threshold
+NOISE_MS = 0.5
+NOISE_BYTES = 64 * 1024
+
+BULK_SIZE = 500
+
+BENCHMARKS = {}
+
+
+def benchmark(name, writes=False):
+    """Register ``function(fixture)`` as the benchmark ``name``."""
+
+    def register(function):
+        BENCHMARKS[name] = (function, writes)
+        return function
+
+    return register
+
+
+class Fixture:
+    """The objects the benchmarks work on, picked once per dataset."""
+
+    def __init__(self):
+        User = get_user_model()
+        self.user, _ = User.objects.get_or_create(
+            username="benchmark",
+            defaults={"is_staff": True, "is_superuser": True},
+        )
+        self.client = Client(HTTP_HOST=client_host())
+        self.client.force_login(self.user)
+
+        # The busiest project, assignee and task are the worst cases
+        self.project_id = busiest(Task.objects.all(), "project")
+        if self.project_id is None:
+            raise ValueError("The database has no tasks.")
+        self.assignee_id = busiest(Task.objects.exclude(assignee=None), "assignee")
+        self.task_id = busiest(Comment.objects.exclude(task=None), "task")
+        self.member_ids = list(
+            Project.team_members.through.objects.filter(
+                project_id=self.project_id
+            ).values_list("user_id", flat=True)
+        )
+        # The API only shows the projects a user is on
+        membership.add(Project.objects.values_list("pk", flat=True), [self.user.pk])
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        if response.status_code != 200:
+            raise AssertionError(f"GET {url} returned {response.status_code}")
+        # Streaming responses only do their work when consumed
+        if response.streaming:
+            b"".join(response.streaming_content)
+        else:
+            response.content
+        return response
+
+
+def client_host():
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def busiest(queryset, field):
+    return (
+        queryset.values(field)
+        .annotate(n=Count("id"))
+        .order_by("-n")
+        .values_list(field, flat=True)
+        .first()
+    )
+
+
+@benchmark("admin-task-changelist")
+def admin_task_changelist(fixture):
+    fixture.get(reverse("admin:models_task_task_changelist"))
+
+
+@benchmark("admin-task-changelist-filtered")
+def admin_task_changelist_filtered(fixture):
+    fixture.get(
+        reverse("admin:models_task_task_changelist"),
+        status__exact="open",
+        project__id__exact=fixture.project_id,
+    )
+
+
+@benchmark("admin-comment-changelist-task")
+def admin_comment_changelist_task(fixture):
+    fixture.get(
+        reverse("admin:models_task_comment_changelist"),
+        task__id__exact=fixture.task_id,
+    )
+
+
+@benchmark("api-tasks-status")
+def api_tasks_status(fixture):
+    fixture.get(reverse("models_task:task-list"), status="open")
+
+
+@benchmark("api-tasks-project")
+def api_tasks_project(fixture):
+    fixture.get(reverse("models_task:task-list"), project=fixture.project_id)
+
+
+@benchmark("api-tasks-assignee")
+def api_tasks_assignee(fixture):
+    fixture.get(reverse("models_task:task-list"), assignee=fixture.assignee_id)
+
+
+@benchmark("api-comment-thread")
+def api_comment_thread(fixture):
+    fixture.get(reverse("models_task:comment-list"), task=fixture.task_id)
+
+
+@benchmark("bulk-create-tasks", writes=True)
+def bulk_create_tasks(fixture):
+    members = fixture.member_ids or [None]
+    Task.objects.bulk_create(
+        Task(
+            title=f"Benchmark task {i}",
+            description="",
+            project_id=fixture.project_id,
+            assignee_id=members[i % len(members)],
+        )
+        for i in range(BULK_SIZE)
+    )
+
+
+@benchmark("bulk-create-comments", writes=True)
+def bulk_create_comments(fixture):
+    Comment.objects.bulk_create(
+        Comment(
+            text=f"Benchmark comment {i}",
+            author_id=fixture.user.pk,
+            task_id=fixture.task_id,
+        )
+        for i in range(BULK_SIZE)
+    )
+
+
+@benchmark("delete-project", writes=True)
+def delete_project(fixture):
+    Project.objects.get(pk=fixture.project_id).delete()
+
+
+def run_once(function, fixture, writes):
+    """Run a benchmark, return its duration in ms."""
+    if not writes:
+        started = time.perf_counter()
+        function(fixture)
+        return (time.perf_counter() - started) * 1000
+    with transaction.atomic():
+        started = time.perf_counter()
+        function(fixture)
+        elapsed = (time.perf_counter() - started) * 1000
+        transaction.set_rollback(True)
+    return elapsed
+
+
+def measure(name, fixture, repeat=20, warmup=2):
+    """Time the benchmark ``name``, count its queries and trace its memory."""
+    function, writes = BENCHMARKS[name]
+    for _ in range(warmup):
+        run_once(function, fixture, writes)
+    timings = [run_once(function, fixture, writes) for _ in range(repeat)]
+
+    # Not CaptureQueriesContext, requests reset the connection's query log
+    queries = QueryRecorder()
+    with connection.execute_wrapper(queries):
+        run_once(function, fixture, writes)
+
+    tracemalloc.start()
+    try:
+        run_once(function, fixture, writes)
+        memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50": percentile(timings, 0.5),
+        "p90": percentile(timings, 0.9),
+        "p99": percentile(timings, 0.99),
+        "queries": queries.count,
+        "memory": memory,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Return a message per regression of ``results`` against ``baseline``: a
+    median or peak memory more than ``threshold`` (a fraction) above the
+    baseline's, or any additional query.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if (
+            result["p50"] > base["p50"] * (1 + threshold)
+            and result["p50"] - base["p50"] > NOISE_MS
+        ):
+            regressions.append(
+                f"{name}: p50 {base['p50']:.2f} -> {result['p50']:.2f} ms"
+            )
+        if result["queries"] > base["queries"]:
+            regressions.append(
+                f"{name}: {base['queries']} -> {result['queries']} queries"
+            )
+        if (
+            result["memory"] > base["memory"] * (1 + threshold)
+            and result["memory"] - base["memory"] > NOISE_BYTES
+        ):
+            regressions.append(
+                f"{name}: peak memory {base['memory'] / 1024:.0f} -> "
+                f"{result['memory'] / 1024:.0f} KiB"
+            )
+    return regressions
@@ -0,0 +1,184 @@
+"""
+Read-through cache for hot models_task reads.
+
+Entries hold the same serialized dicts as the JSON API and are dropped by the
+signal handlers in ``signals.py`` once the write that changed them commits.
+Lists are cached a page at a time, see ``CachedPage``. Eviction is left to the
+cache backend: every entry gets the configured TTL and the default
+local-memory backend evicts least recently used entries once it holds
+``MAX_ENTRIES``.
+"""
+
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+
+_MISSING = object()
+
+
+def get_cache():
+    return caches[getattr(settings, "MODELS_TASK_CACHE", "default")]
+
+
+class CachedRead:
+    """A named family of cache entries, one per argument, with hit counters."""
+
+    registry = {}
+    _lock = threading.Lock()
+
+    def __init__(self, name, loader, timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.loader = loader
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.registry[name] = self
+
+    def key(self, arg):
+        return f"models_task:{self.name}:{arg}"
+
+    def get(self, arg):
+        cache = get_cache()
+        value = cache.get(self.key(arg), _MISSING)
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is _MISSING:
+            value = self.loader(arg)
+            cache.set(self.key(arg), value, self.timeout)
+        return value
+
+    async def aget(self, arg):
+        cache = get_cache()
+        value = await cache.aget(self.key(arg), _MISSING)
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is _MISSING:
+            # Misses load through the sync ORM, in a worker thread
+            value = await sync_to_async(self.loader)(arg)
+            await cache.aset(self.key(arg), value, self.timeout)
+        return value
+
+    def keys(self, args):
+        return [self.key(arg) for arg in args if arg is not None]
+
+    @classmethod
+    def stats(cls):
+        stats = {}
+        for name, read in cls.registry.items():
+            total = read.hits + read.misses
+            stats[name] = {
+                "hits": read.hits,
+                "misses": read.misses,
+                "hit_rate": read.hits / total if total else None,
+            }
+        return stats
+
+
+def invalidate(keys, using=None):
+    """Delete ``keys`` once the current transaction, if any, has committed."""
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: get_cache().delete_many(keys), using=using)
+
+
+def _load(view_name, **filters):
+    # Imported late as views use this module. Sharing the JSON API's
+    # representation keeps cached and uncached reads identical.
+    from . import views
+
+    view = getattr(views, view_name)()
+    rows = list(
+        view.model.objects.filter(**filters)
+        .order_by(*view.ordering)
+        .values(*view.lookups())
+    )
+    return view.serialize(rows) if rows else []
+
+
+def _first(items):
+    return items[0] if items else None
+
+
+project = CachedRead("project", lambda pk: _first(_load("ProjectView", pk=pk)))
+task = CachedRead("task", lambda pk: _first(_load("TaskView", pk=pk)))
+comment = CachedRead("comment", lambda pk: _first(_load("CommentView", pk=pk)))
+
+
+class CachedPage(CachedRead):
+    """
+    The first keyset page of the children of a parent object, e.g. a
+    project's tasks, rather than the whole list, so a parent with many
+    children costs one bounded entry. Later pages are read uncached through
+    the page's ``next`` cursor. Entries are None for parents that do not exist.
+    """
+
+    def __init__(self, name, view_name, parent, parent_field, **filters):
+        self.view_name = view_name
+        # Model name in models.py, looked up late like the views
+        self.parent = parent
+        self.parent_field = parent_field
+        self.filters = filters
+        super().__init__(name, self.first_page)
+
+    def queryset(self, view, pk):
+        return view.model.objects.filter(
+            **{self.parent_field: pk}, **self.filters
+        ).order_by(*view.ordering)
+
+    def project_of(self, pk):
+        """The id of the parent's project, None when there is no parent ``pk``."""
+        if self.parent == "Project":
+            return pk
+        # Otherwise a task, its cached representation names the project
+        item = task.get(pk)
+        return item and item["project"]
+
+    async def aproject_of(self, pk):
+        if self.parent == "Project":
+            return pk
+        item = await task.aget(pk)
+        return item and item["project"]
+
+    def first_page(self, pk):
+        from . import models, views
+
+        view = getattr(views, self.view_name)()
+        page = view.page(self.queryset(view, pk), view.default_limit)
+        # Only an empty page needs a second query to tell a childless parent
+        # from a missing one
+        if not page["results"]:
+            parent = getattr(models, self.parent)
+            if not parent._default_manager.filter(pk=pk).exists():
+                return None
+        return page
+
+
+project_tasks = CachedPage("project_tasks", "TaskView", "Project", "project_id")
+task_comments = CachedPage("task_comments", "CommentView", "Task", "task_id")
+# Comments on the project itself, not on its tasks
+project_comments = CachedPage(
+    "project_comments", "CommentView", "Project", "project_id", task=None
+)
+
+
+def _project_ids(user_id):
+    from .models import Project
+
+    Membership = Project.team_members.through
+    return sorted(
+        Membership.objects.filter(user_id=user_id).values_list("project_id", flat=True)
+    )
+
+
+# Ids of the projects a user is a team member of, see models_task.membership
+user_projects = CachedRead("user_projects", _project_ids)
@@ -0,0 +1,39 @@
+"""
+SQLite performance profile applied to every new connection.
+
+``DEFAULT_SQLITE_PRAGMAS`` maps PRAGMA names to values, the
+``MODELS_TASK_SQLITE_PRAGMAS`` setting replaces them, ``None`` keeps SQLite's
+defaults. WAL lets readers proceed while a writer commits,
+``synchronous=normal`` is durable in WAL mode except for the last transactions
+on power loss, and ``busy_timeout`` makes writers wait for the lock instead of
+failing with "database is locked".
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+    # KiB when negative
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+    "temp_store": "memory",
+}
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "MODELS_TASK_SQLITE_PRAGMAS", DEFAULT_SQLITE_PRAGMAS)
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
@@ -0,0 +1,207 @@
+"""
+Batched deletion of large projects.
+
+``Project.delete()`` goes through Django's deletion collector, which loads
+every task and comment of the project into memory and sends signals for
+each of them. Here the project's rows are deleted bottom up in batches of
+plain DELETE statements, each batch in its own short transaction, and what
+the signal receivers would do per row is done once per batch:
+
+* the task status counters are adjusted,
+* the work items of the deleted tasks are removed,
+* task deletions are logged to the change feed (comments go with their task
+  or project, whose deletion is logged),
+* cached entries are invalidated.
+
+Full-text search rows follow through the database triggers. Document blobs
+are shared and left to ``prune_document_blobs``. The project row itself is
+deleted last, with the regular signals, once nothing refers to it.
+
+An interrupted run leaves a consistent, partly emptied project behind and
+can simply be started again. ``schedule()`` marks the projects with
+``Project.deletion_requested_at`` before deleting them in a background
+thread, so deletions a restart cuts short are resumed by
+``manage.py delete_projects --pending``.
+"""
+
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache
+from .models import (
+    ArchivedComment,
+    ArchivedTask,
+    Change,
+    Comment,
+    Document,
+    Project,
+    ProjectTaskStats,
+    Task,
+    WorkItem,
+)
+from .utils import pk_batches
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _delete(queryset):
+    """Delete ``queryset`` with a single DELETE, without collecting or signals."""
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_comment_batch(pks, using="default"):
+    with transaction.atomic(using=using):
+        comments = Comment._base_manager.using(using).filter(pk__in=pks)
+        task_ids = set(comments.exclude(task=None).values_list("task_id", flat=True))
+        Change.objects.db_manager(using).log_comments(pks, action="deleted")
+        deleted = _delete(comments)
+        # Remaining work items may show one of these as latest comment
+        WorkItem.objects.db_manager(using).refresh(task_ids)
+        cache.invalidate(
+            [*cache.comment.keys(pks), *cache.task_comments.keys(task_ids)], using
+        )
+    return deleted
+
+
+def delete_task_batch(pks, using="default"):
+    """Delete the tasks ``pks`` with their comments, return ``(tasks, comments)``."""
+    with transaction.atomic(using=using):
+        comments = Comment._base_manager.using(using).filter(task_id__in=pks)
+        comment_ids = list(comments.values_list("pk", flat=True))
+        Change.objects.db_manager(using).log_comments(comment_ids, action="deleted")
+        deleted_comments = _delete(comments)
+        _delete(WorkItem.objects.using(using).filter(task_id__in=pks))
+
+        tasks = Task.objects.using(using).filter(pk__in=pks)
+        deltas = {key: -count for key, count in tasks.status_counts().items()}
+        Change.objects.db_manager(using).log_tasks(pks, action="deleted")
+        deleted_tasks = _delete(tasks)
+        ProjectTaskStats.objects.db_manager(using).adjust(deltas)
+        project_ids = {project_id for project_id, _ in deltas}
+        cache.invalidate(
+            [
+                *cache.task.keys(pks),
+                *cache.task_comments.keys(pks),
+                *cache.comment.keys(comment_ids),
+                *cache.project.keys(project_ids),
+                *cache.project_tasks.keys(project_ids),
+            ],
+            using,
+        )
+    return deleted_tasks, deleted_comments
+
+
+def delete_project(pk, batch_size=1000, using="default"):
+    """
+    Delete the project ``pk`` and everything under it in batches, yielding
+    ``(label, count)`` after each batch.
+    """
+    tasks = Task._base_manager.using(using).filter(project_id=pk)
+    for pks in pk_batches(tasks, batch_size):
+        deleted_tasks, deleted_comments = delete_task_batch(pks, using)
+        yield "tasks", deleted_tasks
+        if deleted_comments:
+            yield "comments", deleted_comments
+
+    # The comments on the project itself. Newest first, so replies go before
+    # the comments they answer.
+    comments = Comment._base_manager.using(using).filter(project_id=pk)
+    for pks in pk_batches(comments, batch_size, descending=True):
+        yield "comments", delete_comment_batch(pks, using)
+
+    # No signal receivers, single DELETEs per batch are all there is to it
+    for label, queryset in (
+        ("documents", Document._base_manager.using(using).filter(project_id=pk)),
+        (
+            "archived comments",
+            ArchivedComment._base_manager.using(using).filter(project_id=pk),
+        ),
+        # Archived before comments had to have a project, or since moved
+        (
+            "archived comments",
+            ArchivedComment._base_manager.using(using).filter(task__project_id=pk),
+        ),
+        (
+            "archived tasks",
+            ArchivedTask._base_manager.using(using).filter(project_id=pk),
+        ),
+    ):
+        for pks in pk_batches(queryset, batch_size):
+            with transaction.atomic(using=using):
+                batch = queryset.model._base_manager.using(using).filter(pk__in=pks)
+                yield label, _delete(batch)
+
+    with transaction.atomic(using=using):
+        project = Project.objects.using(using).filter(pk=pk).first()
+        if project is not None:
+            # Only the team, the counters and the project row are left
+            project.delete()
+            yield "projects", 1
+
+
+def delete_projects(pks, batch_size=1000, using="default"):
+    for pk in pks:
+        yield from delete_project(pk, batch_size, using)
+
+
+def _run(pks, batch_size):
+    try:
+        for pk in pks:
+            totals = Counter()
+            for label, count in delete_project(pk, batch_size):
+                totals[label] += count
+            logger.info("Deleted project %s: %s", pk, dict(totals))
+    except Exception:
+        logger.exception("Deleting projects %s failed", pks)
+    finally:
+        # Pool threads hold their own connections
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # A single thread, concurrent bulk deletes would only contend
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deletion")
+        return _executor
+
+
+def pending(using="default"):
+    """Ids of the projects marked for deletion, in the order they were marked."""
+    return list(
+        Project.objects.using(using)
+        .exclude(deletion_requested_at=None)
+        .order_by("deletion_requested_at", "pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def schedule(pks, batch_size=1000, using=None):
+    """
+    Mark the projects ``pks`` for deletion and delete them in the background
+    once the transaction commits.
+    """
+    pks = list(pks)
+    Project.objects.using(using).filter(pk__in=pks).update(
+        deletion_requested_at=timezone.now()
+    )
+
+    def submit():
+        if not getattr(settings, "MODELS_TASK_BACKGROUND_DELETION", True):
+            # Inline, e.g. for tests
+            for _ in delete_projects(pks, batch_size):
+                pass
+        else:
+            get_executor().submit(_run, pks, batch_size)
+
+    transaction.on_commit(submit, using=using)
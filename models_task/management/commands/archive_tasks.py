@@ -0,0 +1,93 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from models_task import archive
+from models_task.utils import throughput
+
+
+class Command(BaseCommand):
+    help = (
+        "Move tasks finished more than --days ago, with their comments, to the "
+        "archive tables. Each batch commits on its own, so an interrupted run "
+        "can simply be started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Archive completed and closed tasks not updated for this many days",
+        )
+        parser.add_argument(
+            "--comment-days",
+            type=int,
+            help="Also archive project comments older than this many days",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Tasks moved per transaction"
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches, to leave room for other writers",
+        )
+        parser.add_argument(
+            "--restore",
+            type=int,
+            nargs="+",
+            metavar="TASK_ID",
+            help="Restore these archived tasks instead of archiving",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        if kwargs["restore"]:
+            tasks, comments = archive.restore_tasks(kwargs["restore"])
+            self.stdout.write(
+                self.style.SUCCESS(f"Restored {tasks} tasks and {comments} comments.")
+            )
+            return
+
+        now = timezone.now()
+        self.run(
+            "tasks",
+            archive.archive_tasks(
+                now - timedelta(days=kwargs["days"]), kwargs["batch_size"]
+            ),
+            kwargs["pause"],
+        )
+        if kwargs["comment_days"] is not None:
+            self.run(
+                "project comments",
+                archive.archive_comments(
+                    now - timedelta(days=kwargs["comment_days"]), kwargs["batch_size"]
+                ),
+                kwargs["pause"],
+            )
+
+    def run(self, label, batches, pause):
+        started = time.perf_counter()
+        moved = comments = 0
+        for counts in batches:
+            if isinstance(counts, tuple):
+                moved += counts[0]
+                comments += counts[1]
+            else:
+                moved += counts
+            self.stdout.write(f"Archived {moved} {label}...")
+            if pause:
+                time.sleep(pause)
+
+        if comments:
+            self.stdout.write(f"Archived {comments} task comments along with them")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {label}: " + throughput(moved, time.perf_counter() - started)
+            )
+        )
@@ -0,0 +1,165 @@
+"""
+Benchmark the models_task hot paths on a seeded dataset.
+
+The dataset is seeded with populate_fake_data into a separate benchmark
+database, the configured database is never touched. Seeding 1m tasks takes
+a while, --keepdb keeps the database for the next run of the same scale.
+
+Save a baseline, then fail later runs that regress against it:
+
+    manage.py benchmark --scale 100k --keepdb --save-baseline bench.json
+    manage.py benchmark --scale 100k --keepdb --baseline bench.json
+
+A run fails when a benchmark's median latency or peak memory grew by more
+than --threshold, or when it runs more queries than in the baseline.
+"""
+
+import json
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from models_task import benchmarks
+from models_task.models import Task
+
+
+class Command(BaseCommand):
+    help = "Measure latency, query counts and memory of the hot paths"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            choices=benchmarks.SCALES,
+            default="10k",
+            help="Dataset size, in tasks",
+        )
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            choices=benchmarks.BENCHMARKS,
+            metavar="NAME",
+            help="Run only these benchmarks",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Timed runs per benchmark"
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=2, help="Untimed runs per benchmark"
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the seeded benchmark database and reuse it if it exists",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes seeding the dataset",
+        )
+        parser.add_argument("--save-baseline", metavar="FILE")
+        parser.add_argument("--baseline", metavar="FILE")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Tolerated growth of latency and memory over the baseline, "
+            "as a fraction",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["repeat"] < 1:
+            raise CommandError("--repeat must be positive.")
+        baseline = None
+        if kwargs["baseline"]:
+            with open(kwargs["baseline"]) as f:
+                baseline = json.load(f)
+            if baseline["scale"] != kwargs["scale"]:
+                raise CommandError(
+                    f"The baseline was measured at --scale {baseline['scale']}."
+                )
+
+        test_name = connection.settings_dict["TEST"]["NAME"]
+        try:
+            old_name = self.setup_database(kwargs["scale"], kwargs["keepdb"])
+            try:
+                self.seed(kwargs["scale"], kwargs["workers"])
+                results = self.run(kwargs)
+            finally:
+                connection.creation.destroy_test_db(
+                    old_name, verbosity=0, keepdb=kwargs["keepdb"]
+                )
+        finally:
+            # setup_database() pointed the test database at the benchmark one
+            connection.settings_dict["TEST"]["NAME"] = test_name
+
+        if kwargs["save_baseline"]:
+            with open(kwargs["save_baseline"], "w") as f:
+                json.dump({"scale": kwargs["scale"], "results": results}, f, indent=2)
+            self.stdout.write(f"Saved the baseline to {kwargs['save_baseline']}")
+
+        if baseline is not None:
+            regressions = benchmarks.compare(
+                results, baseline["results"], kwargs["threshold"]
+            )
+            if regressions:
+                for message in regressions:
+                    self.stderr.write(message)
+                raise CommandError(
+                    f"{len(regressions)} regressions against {kwargs['baseline']}."
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def setup_database(self, scale, keepdb):
+        """Switch to the benchmark database of ``scale``, return the old name."""
+        if connection.vendor == "sqlite":
+            name = str(settings.BASE_DIR / f"benchmark_{scale}.sqlite3")
+        else:
+            name = f"benchmark_{scale}"
+        old_name = connection.settings_dict["NAME"]
+        connection.settings_dict["TEST"]["NAME"] = name
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb
+        )
+        return old_name
+
+    def seed(self, scale, workers):
+        counts = benchmarks.SCALES[scale]
+        existing = Task.objects.count()
+        if existing == counts["tasks"]:
+            return
+        if existing:
+            raise CommandError(
+                f"The kept benchmark database holds {existing} tasks, not "
+                f"{counts['tasks']}. Run without --keepdb to seed it again."
+            )
+        self.stdout.write(f"Seeding the {scale} dataset...")
+        call_command(
+            "populate_fake_data",
+            **counts,
+            batch_size=2000,
+            workers=workers,
+            seed=1,
+            stdout=self.stdout,
+        )
+
+    def run(self, kwargs):
+        fixture = benchmarks.Fixture()
+        results = {}
+        self.stdout.write(
+            f"\n{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'queries':>8} "
+            f"{'peak KiB':>9}  benchmark"
+        )
+        for name in kwargs["only"] or benchmarks.BENCHMARKS:
+            result = benchmarks.measure(
+                name, fixture, repeat=kwargs["repeat"], warmup=kwargs["warmup"]
+            )
+            results[name] = result
+            self.stdout.write(
+                f"{result['p50']:>9.2f} {result['p90']:>9.2f} {result['p99']:>9.2f} "
+                f"{result['queries']:>8} {result['memory'] / 1024:>9.0f}  {name}"
+            )
+        return results
@@ -0,0 +1,143 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from models_task.models import Project, Task, Comment
+
+
+class Command(BaseCommand):
+    help = (
+        "Show query plans and timings of the Task/Comment hot queries with and "
+        "without their indexes"
+    )
+
+    # Columns the benchmarked queries filter or sort on. Every index leading
+    # with one of them is dropped for the 'before' run, the foreign key
+    # indexes included, so the planner cannot fall back to a near miss.
+    COLUMNS = {"project_id", "assignee_id", "task_id", "status", "created_at"}
+
+    def indexes(self, cursor):
+        names = []
+        for model in (Task, Comment):
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+            names.extend(
+                name
+                for name, info in constraints.items()
+                if info["index"]
+                and not info["unique"]
+                and not info["primary_key"]
+                and info["columns"]
+                and info["columns"][0] in self.COLUMNS
+            )
+        return sorted(names)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Runs per query, median is shown"
+        )
+
+    def queries(self):
+        # Benchmark against the busiest project, assignee and task
+        project_id = (
+            Task.objects.values("project")
+            .annotate(n=Count("id"))
+            .order_by("-n")
+            .values_list("project", flat=True)
+            .first()
+        )
+        assignee_id = (
+            Task.objects.exclude(assignee=None)
+            .values("assignee")
+            .annotate(n=Count("id"))
+            .order_by("-n")
+            .values_list("assignee", flat=True)
+            .first()
+        )
+        task_id = (
+            Comment.objects.exclude(task=None)
+            .values("task")
+            .annotate(n=Count("id"))
+            .order_by("-n")
+            .values_list("task", flat=True)
+            .first()
+        )
+        if project_id is None:
+            raise CommandError("No tasks found, run populate_fake_data first.")
+
+        return [
+            (
+                "Tasks of a project by status (TaskAdmin filters)",
+                Task.objects.filter(project_id=project_id, status="open").order_by(
+                    "-created_at"
+                )[:100],
+            ),
+            (
+                "Tasks of an assignee by status (TaskAdmin filters)",
+                Task.objects.filter(assignee_id=assignee_id, status="working").order_by(
+                    "-created_at"
+                )[:100],
+            ),
+            (
+                "Status summary of a project",
+                Task.objects.filter(project_id=project_id)
+                .values("status")
+                .annotate(n=Count("id")),
+            ),
+            (
+                "Latest comments on a task",
+                Comment.objects.filter(task_id=task_id)[:50],
+            ),
+            (
+                "Latest comments on a project",
+                Comment.objects.filter(project_id=project_id)[:50],
+            ),
+        ]
+
+    def measure(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def report(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        results = {}
+        for label, queryset in queries:
+            results[label] = self.measure(queryset, repeat)
+            self.stdout.write(f"{label}: {results[label]:.2f} ms")
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f"    {line}")
+        return results
+
+    def handle(self, *args, **kwargs):
+        if not connection.features.can_rollback_ddl:
+            raise CommandError(
+                "The 'before' run drops indexes inside a rolled back transaction "
+                "and needs a database with transactional DDL."
+            )
+        repeat = kwargs["repeat"]
+        queries = self.queries()
+
+        with transaction.atomic():
+            # Drop the indexes, measure, then roll the drop back
+            with connection.cursor() as cursor:
+                for name in self.indexes(cursor):
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+            before = self.report("Without indexes", queries, repeat)
+            transaction.set_rollback(True)
+
+        after = self.report("With indexes", queries, repeat)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Summary (median ms)"))
+        for label, _ in queries:
+            speedup = before[label] / after[label] if after[label] else 0
+            self.stdout.write(
+                f"{label}: {before[label]:.2f} -> {after[label]:.2f} ({speedup:.1f}x)"
+            )
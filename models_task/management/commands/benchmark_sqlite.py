@@ -0,0 +1,151 @@
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from models_task.db import DEFAULT_SQLITE_PRAGMAS, apply_pragmas
+from models_task.profiling import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure SQLite read/write concurrency on a scratch database with "
+        "SQLite's defaults and with MODELS_TASK_SQLITE_PRAGMAS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument(
+            "--seconds", type=float, default=5, help="Duration of each run"
+        )
+        parser.add_argument(
+            "--rows", type=int, default=100000, help="Rows seeded before each run"
+        )
+
+    def handle(self, *args, **kwargs):
+        profile = (
+            getattr(settings, "MODELS_TASK_SQLITE_PRAGMAS", None)
+            or DEFAULT_SQLITE_PRAGMAS
+        )
+        for label, pragmas in (
+            ("SQLite defaults", {}),
+            ("Performance profile", profile),
+        ):
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / "benchmark.sqlite3"
+                self.seed(path, kwargs["rows"])
+                result = self.run(path, pragmas, **kwargs)
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(
+                f"  reads  {result['reads'] / kwargs['seconds']:,.0f}/s  "
+                f"p50 {result['read_p50']:.2f}ms  p99 {result['read_p99']:.2f}ms"
+            )
+            self.stdout.write(
+                f"  writes {result['writes'] / kwargs['seconds']:,.0f} tx/s  "
+                f"p50 {result['write_p50']:.2f}ms  p99 {result['write_p99']:.2f}ms  "
+                f"lock errors {result['errors']}"
+            )
+
+    def connect(self, path, pragmas):
+        # Autocommit mode, transactions are opened explicitly below
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        apply_pragmas(connection.cursor(), pragmas)
+        return connection
+
+    def seed(self, path, rows):
+        connection = sqlite3.connect(path)
+        connection.execute(
+            "CREATE TABLE task (id INTEGER PRIMARY KEY, project_id INTEGER, "
+            "status TEXT, title TEXT)"
+        )
+        connection.execute(
+            "CREATE INDEX task_project_status ON task (project_id, status)"
+        )
+        connection.executemany(
+            "INSERT INTO task (project_id, status, title) VALUES (?, ?, ?)",
+            (
+                (random.randrange(100), random.choice("abcdefg"), f"Task {i}")
+                for i in range(rows)
+            ),
+        )
+        connection.commit()
+        connection.close()
+
+    def run(self, path, pragmas, readers, writers, seconds, **kwargs):
+        deadline = time.monotonic() + seconds
+        read_times, write_times, errors = [], [], []
+        lock = threading.Lock()
+
+        def read():
+            connection = self.connect(path, pragmas)
+            timings = []
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection.execute(
+                        "SELECT status, COUNT(*) FROM task WHERE project_id = ? "
+                        "GROUP BY status",
+                        [random.randrange(100)],
+                    ).fetchall()
+                    connection.execute(
+                        "SELECT * FROM task ORDER BY id DESC LIMIT 50"
+                    ).fetchall()
+                except sqlite3.OperationalError:
+                    with lock:
+                        errors.append(1)
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+            connection.close()
+            with lock:
+                read_times.extend(timings)
+
+        def write():
+            connection = self.connect(path, pragmas)
+            timings = []
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection.execute("BEGIN IMMEDIATE")
+                    connection.executemany(
+                        "INSERT INTO task (project_id, status, title) VALUES (?, ?, ?)",
+                        [(random.randrange(100), "a", "New task")] * 10,
+                    )
+                    connection.execute(
+                        "UPDATE task SET status = 'b' WHERE id = ?",
+                        [random.randrange(1, 1000)],
+                    )
+                    connection.execute("COMMIT")
+                except sqlite3.OperationalError:
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK")
+                    with lock:
+                        errors.append(1)
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+            connection.close()
+            with lock:
+                write_times.extend(timings)
+
+        threads = [threading.Thread(target=read) for _ in range(readers)]
+        threads += [threading.Thread(target=write) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return {
+            "reads": len(read_times),
+            "read_p50": statistics.median(read_times) if read_times else 0,
+            "read_p99": percentile(read_times, 0.99) or 0,
+            "writes": len(write_times),
+            "write_p50": statistics.median(write_times) if write_times else 0,
+            "write_p99": percentile(write_times, 0.99) or 0,
+            "errors": len(errors),
+        }
@@ -0,0 +1,66 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from models_task import deletion
+from models_task.models import Project
+from models_task.utils import throughput
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete projects with all their tasks, comments and documents in "
+        "batches, in bounded memory. Each batch commits on its own, so an "
+        "interrupted run can simply be started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_ids", type=int, nargs="*", metavar="PROJECT_ID")
+        parser.add_argument(
+            "--pending",
+            action="store_true",
+            help="Also delete the projects marked for deletion in the admin, "
+            "e.g. after a restart interrupted their background deletion",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows deleted per transaction"
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches, to leave room for other writers",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        pks = kwargs["project_ids"]
+        if kwargs["pending"]:
+            pks = list(dict.fromkeys([*pks, *deletion.pending()]))
+        elif not pks:
+            raise CommandError("Give project ids or --pending.")
+        missing = set(pks) - set(
+            Project.objects.filter(pk__in=pks).values_list("pk", flat=True)
+        )
+        if missing:
+            raise CommandError(f"No projects with ids {sorted(missing)}.")
+
+        started = time.perf_counter()
+        totals = Counter()
+        for label, count in deletion.delete_projects(pks, kwargs["batch_size"]):
+            totals[label] += count
+            self.stdout.write(f"Deleted {totals[label]} {label}...")
+            if kwargs["pause"]:
+                time.sleep(kwargs["pause"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Deleted projects: "
+                + throughput(totals.total(), time.perf_counter() - started)
+            )
+        )
+        self.stdout.write(
+            ", ".join(f"{count} {label}" for label, count in sorted(totals.items()))
+        )
@@ -0,0 +1,43 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from models_task.transfer import FORMATS, SPECS, detect_format, export_rows, write_rows
+from models_task.utils import throughput
+
+
+class Command(BaseCommand):
+    help = "Stream a models_task model to a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=sorted(SPECS), help="Model to export")
+        parser.add_argument("path", help="Output file, or - for stdout")
+        parser.add_argument(
+            "--format", choices=FORMATS, help="File format (default: from extension)"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched from the database per query",
+        )
+
+    def handle(self, *args, **kwargs):
+        spec = SPECS[kwargs["model"]]
+        path = kwargs["path"]
+        fmt = detect_format(path, kwargs["format"])
+        rows = export_rows(spec, kwargs["chunk_size"])
+
+        started = time.perf_counter()
+        if path == "-":
+            count = write_rows(sys.stdout, fmt, spec, rows)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as stream:
+                count = write_rows(stream, fmt, spec, rows)
+
+        # Keep stdout clean when the export itself is written there
+        self.stderr.write(
+            f"Exported {kwargs['model']}: "
+            + throughput(count, time.perf_counter() - started)
+        )
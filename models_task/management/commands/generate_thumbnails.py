@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from models_task import thumbnails
+from models_task.models import Profile
+from models_task.utils import chunked, throughput
+
+
+def generate(name):
+    try:
+        return name, thumbnails.generate(name), None
+    except Exception as error:
+        return name, None, str(error)
+
+
+class Command(BaseCommand):
+    help = "Generate the missing thumbnails of existing profile pictures in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes resizing images",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Profiles updated at once"
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Also process profiles whose thumbnails were generated, e.g. "
+            "after adding a thumbnail size",
+        )
+
+    def handle(self, *args, **kwargs):
+        profiles = Profile.objects.exclude(profile_picture="").exclude(
+            profile_picture__isnull=True
+        )
+        if not kwargs["force"]:
+            profiles = profiles.filter(profile_picture_hash="")
+        pending = list(profiles.order_by("pk").values_list("pk", "profile_picture"))
+
+        pool = None
+        if kwargs["workers"] > 1 and len(pending) > 1:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            pool = multiprocessing.get_context("fork").Pool(kwargs["workers"])
+        started = time.perf_counter()
+        done = failed = 0
+        try:
+            for batch in chunked(pending, kwargs["batch_size"]):
+                names = list(dict.fromkeys(name for _, name in batch))
+                results = pool.imap(generate, names) if pool else map(generate, names)
+                digests = {}
+                for name, digest, error in results:
+                    if error:
+                        failed += 1
+                        self.stderr.write(f"{name}: {error}")
+                    else:
+                        digests[name] = digest
+                profile_pks = {}
+                for pk, name in batch:
+                    if name in digests:
+                        profile_pks.setdefault(name, []).append(pk)
+                with transaction.atomic():
+                    for name, pks in profile_pks.items():
+                        # Pictures replaced in the meantime are skipped, as in
+                        # thumbnails.process()
+                        done += Profile.objects.filter(
+                            pk__in=pks, profile_picture=name
+                        ).update(profile_picture_hash=digests[name])
+                self.stdout.write(f"Processed {done} profiles...")
+        finally:
+            if pool:
+                pool.terminate()
+
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} pictures failed"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Generated thumbnails: "
+                + throughput(done, time.perf_counter() - started)
+            )
+        )
@@ -0,0 +1,57 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from models_task.transfer import FORMATS, SPECS, detect_format, import_batch, read_rows
+from models_task.utils import chunked, throughput
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or JSONL file into a models_task model, upserting by id"
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=sorted(SPECS), help="Model to import")
+        parser.add_argument("path", help="Input file, or - for stdin")
+        parser.add_argument(
+            "--format", choices=FORMATS, help="File format (default: from extension)"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows written per transaction",
+        )
+
+    def handle(self, *args, **kwargs):
+        spec = SPECS[kwargs["model"]]
+        path = kwargs["path"]
+        fmt = detect_format(path, kwargs["format"])
+
+        if path == "-":
+            self.load(spec, sys.stdin, fmt, kwargs["batch_size"])
+        else:
+            with open(path, newline="", encoding="utf-8") as stream:
+                self.load(spec, stream, fmt, kwargs["batch_size"])
+
+    def load(self, spec, stream, fmt, batch_size):
+        started = time.perf_counter()
+        written = skipped = 0
+        for batch in chunked(read_rows(stream, fmt, spec), batch_size):
+            with transaction.atomic():
+                created, missing = import_batch(spec, batch)
+            written += created
+            skipped += missing
+            self.stdout.write(f"Imported {written} rows...")
+
+        if skipped:
+            self.stdout.write(
+                self.style.WARNING(f"Skipped {skipped} rows with unknown foreign keys")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {spec.model._meta.verbose_name_plural}: "
+                + throughput(written, time.perf_counter() - started)
+            )
+        )
@@ -0,0 +1,182 @@
+"""
+Load test the API at high concurrency.
+
+Start the servers to compare against the same database, e.g.
+
+    gunicorn myproject.wsgi --workers 4 --threads 8 --bind 127.0.0.1:8000
+    uvicorn myproject.asgi:application --workers 4 --port 8001
+
+then compare the sync views under WSGI with the async views under ASGI:
+
+    manage.py load_test http://127.0.0.1:8000/api/tasks/ \\
+        http://127.0.0.1:8001/api/async/tasks/ --user admin --concurrency 200
+
+Each URL is hammered in turn by ``--concurrency`` keep-alive connections for
+``--duration`` seconds. The client is a minimal asyncio HTTP/1.1 client, so a
+single process can hold hundreds of connections open.
+"""
+
+import asyncio
+import time
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    SESSION_KEY,
+    get_user_model,
+)
+from django.core.management.base import BaseCommand, CommandError
+
+from models_task.profiling import percentile
+
+
+async def exchange(reader, writer, request):
+    """Send one request, read the response, return ``(status, keep_alive)``."""
+    writer.write(request)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        while await reader.readline() not in (b"\r\n", b""):
+            pass
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get("connection") != "close"
+
+
+async def client(url, request, deadline, timeout, result):
+    connection = None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.wait_for(
+                    asyncio.open_connection(url.hostname, url.port or 80), timeout
+                )
+            status, keep_alive = await asyncio.wait_for(
+                exchange(*connection, request), timeout
+            )
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            result["errors"] += 1
+            keep_alive = False
+        except asyncio.TimeoutError:
+            result["timeouts"] += 1
+            keep_alive = False
+        else:
+            result["latencies"].append(time.perf_counter() - started)
+            if status >= 400:
+                result["errors"] += 1
+        if not keep_alive and connection is not None:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def run(url, cookie, concurrency, duration, timeout):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    request = (
+        f"GET {path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        f"Cookie: {cookie}\r\nAccept: application/json\r\n\r\n"
+    ).encode()
+    result = {"latencies": [], "errors": 0, "timeouts": 0}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(
+        *(client(parts, request, deadline, timeout, result) for _ in range(concurrency))
+    )
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+class Command(BaseCommand):
+    help = "Compare request throughput and latency of API URLs under concurrency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+", help="http:// URLs to load, in turn")
+        parser.add_argument(
+            "--concurrency", type=int, default=100, help="Open connections per URL"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10.0, help="Seconds of load per URL"
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=30.0, help="Seconds before a request fails"
+        )
+        parser.add_argument(
+            "--user",
+            help="Send the requests logged in as this user. The servers must "
+            "share this project's database and session settings.",
+        )
+
+    def handle(self, *args, **kwargs):
+        for url in kwargs["urls"]:
+            if urlsplit(url).scheme != "http":
+                raise CommandError(f"Only http:// URLs are supported: {url}")
+
+        session = None
+        cookie = ""
+        if kwargs["user"]:
+            session = self.login(kwargs["user"])
+            cookie = f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+        try:
+            rows = []
+            for url in kwargs["urls"]:
+                self.stdout.write(f"Loading {url}...")
+                result = asyncio.run(
+                    run(
+                        url,
+                        cookie,
+                        kwargs["concurrency"],
+                        kwargs["duration"],
+                        kwargs["timeout"],
+                    )
+                )
+                rows.append((url, result))
+        finally:
+            if session is not None:
+                session.delete()
+
+        self.stdout.write(
+            f"\n{'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} "
+            f"{'p99 ms':>8} {'errors':>7} {'timeouts':>8}  url"
+        )
+        for url, result in rows:
+            latencies = result["latencies"]
+            line = [
+                f"{len(latencies):>9}",
+                f"{len(latencies) / result['elapsed']:>8.1f}",
+            ]
+            for fraction in (0.5, 0.9, 0.99):
+                value = percentile(latencies, fraction)
+                line.append(
+                    f"{value * 1000:>8.1f}" if value is not None else f"{'-':>8}"
+                )
+            line += [f"{result['errors']:>7}", f"{result['timeouts']:>8}", f" {url}"]
+            self.stdout.write(" ".join(line))
+
+    def login(self, username):
+        try:
+            user = get_user_model()._default_manager.get_by_natural_key(username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {username!r}.")
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session
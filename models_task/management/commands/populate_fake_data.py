@@ -1,10 +1,22 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
 from faker import Faker
 from datetime import timedelta
+import multiprocessing
 import random
 import string
-from models_task.models import Profile, Project, Task, Document, Comment
+import time
+from models_task import membership
+from models_task.models import Profile, Project, Task, Document, Comment, WorkItem
+from models_task.seeding import (
+    generate_shard,
+    generate_username,
+    init_worker,
+    plan_shards,
+)
+from models_task.utils import throughput
 
 User = get_user_model()
 
@@ -28,6 +40,25 @@ class Command(BaseCommand):
         parser.add_argument(
             "--comments", type=int, default=30, help="Number of comments to create"
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=0,
+            help="Insert rows with bulk_create in batches of this size "
+            "(0 keeps the row-by-row mode)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes generating rows (implies bulk mode)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Seed for reproducible output, independent of --workers",
+        )
 
     def generate_unique_username(self, fake):
         while True:
@@ -45,6 +76,15 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         fake = Faker()
 
+        if kwargs["workers"] > 1 and kwargs["batch_size"] <= 0:
+            kwargs["batch_size"] = 1000
+        if kwargs["batch_size"] > 0:
+            return self.handle_bulk(fake, **kwargs)
+
+        if kwargs["seed"] is not None:
+            fake.seed_instance(kwargs["seed"])
+            random.seed(kwargs["seed"])
+
         # Get the counts from arguments
         num_users = kwargs["users"]
         num_projects = kwargs["projects"]
@@ -87,6 +127,7 @@ class Command(BaseCommand):
 
         self.stdout.write("Creating projects...")
         projects = []
+        memberships = []
         for i in range(num_projects):
             try:
                 start_date = fake.date_between(start_date="-1y", end_date="today")
@@ -100,11 +141,11 @@ class Command(BaseCommand):
                     start_date=start_date,
                     end_date=end_date,
                 )
-                # Add random team members
+                # Add random team members, all inserted at once below
                 team_members = random.sample(
                     users, random.randint(2, min(5, len(users)))
                 )
-                project.team_members.set(team_members)
+                memberships.extend((project.pk, user.pk) for user in team_members)
                 projects.append(project)
 
                 if (i + 1) % 50 == 0:  # Progress update every 50 projects
@@ -115,6 +156,7 @@ class Command(BaseCommand):
                     self.style.WARNING(f"Error creating project: {str(e)}")
                 )
                 continue
+        membership.add_pairs(memberships)
 
         # Skip creating tasks and documents if no projects were created
         if not projects:
@@ -198,3 +240,171 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS("Successfully populated the database with sample data!")
         )
+
+    def handle_bulk(self, fake, batch_size, workers, seed, **kwargs):
+        started = time.perf_counter()
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.stdout.write(f"Using seed {seed} with {workers} worker(s)")
+        fake.seed_instance(seed)
+
+        self.batch_size = batch_size
+        self.workers = workers
+        self.seed = seed
+        self.seen_usernames = set()
+        self.project_members = {}
+
+        self.stdout.write("Creating users and profiles...")
+        # Hashing is deliberately slow, so hash the shared password only once
+        password = make_password("password123")
+        user_ids = self.run_phase(
+            "users",
+            kwargs["users"],
+            {"password": password},
+            lambda rows: self.write_users(fake, rows),
+        )
+        if not user_ids:
+            self.stdout.write(self.style.ERROR("No users were created."))
+            return
+
+        self.stdout.write("Creating projects...")
+        project_ids = self.run_phase(
+            "projects",
+            kwargs["projects"],
+            {"user_ids": user_ids},
+            self.write_projects,
+        )
+        if not project_ids:
+            self.stdout.write(self.style.ERROR("No projects were created. Aborting..."))
+            return
+
+        # Work items are built once at the end instead of per batch
+        with WorkItem.objects.deferred():
+            self.stdout.write("Creating tasks...")
+            task_ids = self.run_phase(
+                "tasks", kwargs["tasks"], {"project_members": self.project_members}
+            )
+
+            self.stdout.write("Creating documents...")
+            document_ids = self.run_phase(
+                "documents", kwargs["documents"], {"project_ids": project_ids}
+            )
+
+            self.stdout.write("Creating comments...")
+            comment_ids = self.run_phase(
+                "comments",
+                kwargs["comments"],
+                {
+                    "user_ids": user_ids,
+                    "project_ids": project_ids,
+                    "task_ids": task_ids,
+                },
+            )
+
+        total = (
+            len(user_ids)
+            + len(project_ids)
+            + len(task_ids)
+            + len(document_ids)
+            + len(comment_ids)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Successfully populated the database with sample data: "
+                + throughput(total, time.perf_counter() - started)
+            )
+        )
+
+    def run_phase(self, label, count, context, write=None):
+        """
+        Generate ``count`` rows shard by shard and return the new primary keys.
+
+        Rows are funnelled to this process and written one shard per
+        transaction. Users and projects need that single writer for username
+        de-duplication and team memberships; the other entities are written by
+        the workers themselves when the database accepts concurrent writers.
+        """
+        started = time.perf_counter()
+        shards = plan_shards(label, count, self.batch_size, self.seed)
+        parallel_write = (
+            write is None and self.workers > 1 and connection.vendor != "sqlite"
+        )
+        write = write or self.write_objects
+
+        ids = []
+        if self.workers > 1 and len(shards) > 1:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            pool = multiprocessing.get_context("fork").Pool(
+                self.workers,
+                initializer=init_worker,
+                initargs=(context, parallel_write),
+            )
+            results = pool.imap(generate_shard, shards)
+        else:
+            pool, parallel_write = None, False
+            init_worker(context, False)
+            results = map(generate_shard, shards)
+
+        try:
+            for result in results:
+                if parallel_write:
+                    ids.extend(result)
+                else:
+                    with transaction.atomic():
+                        ids.extend(write(result))
+                self.stdout.write(f"Created {len(ids)} {label}...")
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        self.stdout.write(
+            f"Created {label}: " + throughput(len(ids), time.perf_counter() - started)
+        )
+        return ids
+
+    def write_objects(self, objs):
+        type(objs[0]).objects.bulk_create(objs)
+        return [obj.pk for obj in objs]
+
+    def write_users(self, fake, rows):
+        users = [user for user, _ in rows]
+        # One query per batch to replace usernames that are already taken
+        while True:
+            usernames = [user.username for user in users]
+            batch, taken = set(), set()
+            for username in usernames:
+                if username in batch or username in self.seen_usernames:
+                    taken.add(username)
+                batch.add(username)
+            taken.update(
+                User.objects.filter(username__in=usernames).values_list(
+                    "username", flat=True
+                )
+            )
+            if not taken:
+                break
+            for user in users:
+                if user.username in taken:
+                    user.username = generate_username(fake)
+                    user.email = f"{user.username}@example.com"
+        self.seen_usernames.update(usernames)
+
+        User.objects.bulk_create(users)
+        profiles = []
+        for user, profile in rows:
+            profile.user_id = user.pk
+            profiles.append(profile)
+        Profile.objects.bulk_create(profiles)
+        return [user.pk for user in users]
+
+    def write_projects(self, rows):
+        projects = [project for project, _ in rows]
+        Project.objects.bulk_create(projects)
+
+        memberships = []
+        for project, members in rows:
+            self.project_members[project.pk] = members
+            memberships.extend((project.pk, user_id) for user_id in members)
+        membership.add_pairs(memberships)
+        return [project.pk for project in projects]
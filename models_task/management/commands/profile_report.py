@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from models_task import profiling
+
+
+class Command(BaseCommand):
+    help = "Show per-route latency and SQL percentiles recorded by the profiler"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Number of routes to show"
+        )
+        parser.add_argument(
+            "--reset", action="store_true", help="Discard the recorded data"
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["reset"]:
+            profiling.reset()
+            self.stdout.write(self.style.SUCCESS("Profiling data discarded."))
+            return
+
+        rows = profiling.report()
+        if not rows:
+            self.stdout.write(
+                "No requests recorded. Is QueryProfilingMiddleware enabled and "
+                "MODELS_TASK_PROFILING_DIR set?"
+            )
+            return
+
+        for row in rows[: kwargs["limit"]]:
+            self.stdout.write(self.style.MIGRATE_HEADING(row["route"]))
+            self.stdout.write(
+                f"  requests {row['requests']}  "
+                f"wall p50/p90/p99 {self.ms(row, 'wall')}  "
+                f"sql {self.ms(row, 'sql_time')}  "
+                f"queries {row['queries_p50']}/{row['queries_p90']}/{row['queries_p99']}"
+            )
+            for sql, count in row["duplicates"].items():
+                self.stdout.write(f"  {count} duplicate(s): {sql[:120]}")
+
+    def ms(self, row, name):
+        return "/".join(
+            f"{row[f'{name}_{label}'] * 1000:.1f}ms" for label in ("p50", "p90", "p99")
+        )
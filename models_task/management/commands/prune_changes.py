@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from models_task.models import Change
+
+
+class Command(BaseCommand):
+    help = "Bound the change feed log by size and age"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=getattr(settings, "MODELS_TASK_CHANGES_KEEP", 100000),
+            help="Number of newest changes to keep",
+        )
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=getattr(settings, "MODELS_TASK_CHANGES_KEEP_DAYS", 7),
+            help="Delete changes older than this many days",
+        )
+
+    def handle(self, *args, **kwargs):
+        deleted = Change.objects.prune(
+            keep=kwargs["keep"],
+            before=timezone.now() - timedelta(days=kwargs["days"]),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} changes."))
@@ -0,0 +1,61 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from models_task.models import Document
+
+
+class Command(BaseCommand):
+    help = "Delete stored document files that no document refers to any more"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=24,
+            help="Only delete files older than this many hours, so uploads "
+            "whose document is not saved yet are kept",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="List the files only"
+        )
+
+    def handle(self, *args, **kwargs):
+        field = Document._meta.get_field("file")
+        storage = field.storage
+        root = storage.path(field.upload_to)
+        referenced = set(
+            Document._base_manager.exclude(file="").values_list("file", flat=True)
+        )
+        cutoff = time.time() - kwargs["min_age"] * 3600
+
+        candidates = []
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, storage.location).replace(os.sep, "/")
+                if name not in referenced and os.path.getmtime(path) < cutoff:
+                    candidates.append(path)
+        # Spooled content left behind by interrupted saves
+        spool = storage.path(".tmp")
+        if os.path.isdir(spool):
+            candidates.extend(
+                path
+                for path in (os.path.join(spool, name) for name in os.listdir(spool))
+                if os.path.getmtime(path) < cutoff
+            )
+
+        freed = 0
+        for path in candidates:
+            freed += os.path.getsize(path)
+            if kwargs["dry_run"]:
+                self.stdout.write(path)
+            else:
+                os.unlink(path)
+        verb = "Would delete" if kwargs["dry_run"] else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {len(candidates)} files, {freed / 1024 / 1024:.1f} MB."
+            )
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from models_task.models import ProjectCycleStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild or verify the per-project cycle time rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the rollups with the transition log, fail on drift",
+        )
+
+    def handle(self, *args, **kwargs):
+        if not kwargs["verify"]:
+            count = ProjectCycleStats.objects.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily rollups."))
+            return
+
+        expected = ProjectCycleStats.objects.expected()
+        stored = ProjectCycleStats.objects.stored()
+        drift = sorted(
+            key
+            for key in expected.keys() | stored.keys()
+            if stored.get(key, {}) != expected.get(key, {})
+        )
+        for project_id, day in drift:
+            self.stdout.write(
+                f"Project {project_id} {day}: stored "
+                f"{dict(stored.get((project_id, day), {}))}, expected "
+                f"{dict(expected.get((project_id, day), {}))}"
+            )
+        if drift:
+            raise CommandError(
+                f"{len(drift)} rollups are out of date, run rebuild_cycle_stats."
+            )
+        self.stdout.write(self.style.SUCCESS("All cycle time rollups are correct."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from models_task import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search index and its sync triggers"
+
+    def handle(self, *args, **kwargs):
+        with connection.schema_editor() as schema_editor:
+            search.install(schema_editor)
+        self.stdout.write(self.style.SUCCESS("Full-text search index rebuilt."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from models_task.models import ProjectTaskStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild or verify the per-project task status counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the counters with the Task table, fail on drift",
+        )
+
+    def handle(self, *args, **kwargs):
+        if not kwargs["verify"]:
+            counts = ProjectTaskStats.objects.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rebuilt {len(counts)} counters for {sum(counts.values())} tasks."
+                )
+            )
+            return
+
+        expected = ProjectTaskStats.objects.expected()
+        stored = ProjectTaskStats.objects.stored()
+        drift = {
+            key: (stored[key], expected[key])
+            for key in expected.keys() | stored.keys()
+            if stored[key] != expected[key]
+        }
+        for (project_id, status), (actual, correct) in sorted(drift.items()):
+            self.stdout.write(
+                f"Project {project_id} {status}: stored {actual}, expected {correct}"
+            )
+        if drift:
+            raise CommandError(
+                f"{len(drift)} counters are out of date, run rebuild_task_stats."
+            )
+        self.stdout.write(self.style.SUCCESS("All task status counters are correct."))
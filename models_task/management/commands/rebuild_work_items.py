@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from models_task.models import WorkItem
+from models_task.utils import throughput
+
+
+class Command(BaseCommand):
+    help = "Rebuild or verify the materialized per-user work items"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the work items with the source tables, fail on drift",
+        )
+
+    def handle(self, *args, **kwargs):
+        if not kwargs["verify"]:
+            started = time.perf_counter()
+            count = WorkItem.objects.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Rebuilt work items: "
+                    + throughput(count, time.perf_counter() - started)
+                )
+            )
+            return
+
+        stale = WorkItem.objects.verify()
+        for pk in stale[:20]:
+            self.stdout.write(f"Task {pk}: work item out of date")
+        if stale:
+            raise CommandError(
+                f"{len(stale)} work items are out of date, run rebuild_work_items."
+            )
+        self.stdout.write(self.style.SUCCESS("All work items are up to date."))
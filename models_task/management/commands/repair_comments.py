@@ -0,0 +1,102 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+
+from models_task import archive, cache
+from models_task.models import ArchivedComment, ArchivedTask, Comment
+from models_task.utils import pk_batches, throughput
+
+
+class Command(BaseCommand):
+    help = (
+        "Repair the denormalized columns of comments in batches: the project "
+        "of task comments, which must be their task's, missing thread paths, "
+        "and archived comments without a project. Run it whenever rows were "
+        "written around the ORM, e.g. tasks moved with raw SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Comments per transaction"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the comments that need repairs",
+        )
+        parser.add_argument(
+            "--archive-orphans",
+            action="store_true",
+            help="Move comments with neither a task nor a project to the archive",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        started = time.perf_counter()
+        checked = projects = paths = 0
+        # In primary key order, parents get their path before their replies
+        for pks in pk_batches(Comment.objects.all(), kwargs["batch_size"]):
+            batch = Comment.objects.filter(pk__in=pks)
+            if kwargs["dry_run"]:
+                projects += (
+                    batch.exclude(task=None).exclude(project=F("task__project")).count()
+                )
+                paths += batch.filter(path="").count()
+            else:
+                with transaction.atomic():
+                    moved = batch.sync_projects()
+                    paths += batch.filter(path="").count()
+                    batch.set_paths()
+                    if moved:
+                        cache.invalidate(cache.comment.keys(pks))
+                projects += moved
+            checked += len(pks)
+            self.stdout.write(f"Checked {checked} comments...")
+
+        # Archived before comments had to have a project
+        archived_projects = 0
+        task_project = ArchivedTask._base_manager.filter(pk=OuterRef("task")).values(
+            "project_id"
+        )
+        missing = ArchivedComment.objects.exclude(task=None).filter(project=None)
+        for pks in pk_batches(missing, kwargs["batch_size"]):
+            if kwargs["dry_run"]:
+                archived_projects += len(pks)
+            else:
+                archived_projects += ArchivedComment.objects.filter(pk__in=pks).update(
+                    project_id=Subquery(task_project)
+                )
+        if archived_projects:
+            verb = "Need" if kwargs["dry_run"] else "Repaired"
+            self.stdout.write(
+                f"{verb} {archived_projects} projects of archived comments."
+            )
+
+        # Nothing to derive their project from, they can only be archived
+        orphans = Comment.objects.filter(task=None, project=None)
+        if kwargs["archive_orphans"] and not kwargs["dry_run"]:
+            archived = 0
+            # Newest first, so replies go before the comments they answer
+            for pks in pk_batches(orphans, kwargs["batch_size"], descending=True):
+                archived += archive.archive_comment_batch(pks)
+            if archived:
+                self.stdout.write(f"Archived {archived} comments without a project.")
+        elif orphan_count := orphans.count():
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{orphan_count} comments have neither a task nor a project, "
+                    "move them to the archive with --archive-orphans."
+                )
+            )
+
+        verb = "Need" if kwargs["dry_run"] else "Repaired"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {projects} projects and {paths} paths. Checked "
+                + throughput(checked, time.perf_counter() - started)
+            )
+        )
@@ -0,0 +1,134 @@
+"""
+Project team membership lookups and bulk changes.
+
+``project_ids(user)`` answers "which projects is this user on" from the
+read-through cache, and remembers the answer on the user object for the rest
+of the request, so permission checks stop querying the M2M through table.
+The JSON API only shows tasks, comments and documents of the requesting
+user's projects.
+Entries are dropped when memberships change, by the ``m2m_changed`` receivers
+for ``Project.team_members`` and by the bulk functions below.
+
+``add()`` and ``remove()`` change the memberships of many users in many
+projects in a few statements rather than one ``team_members.add()`` per
+project. Like ``QuerySet.update()`` they send no ``m2m_changed`` signals and
+refresh the work items and cached entries the receivers would.
+"""
+
+from itertools import product
+
+from django.db import transaction
+
+from . import cache
+from .models import Project, WorkItem
+from .utils import chunked
+
+Membership = Project.team_members.through
+
+# Stay below the SQLite bound parameter limit with two IN lists
+CHUNK_SIZE = 450
+
+
+def project_ids(user):
+    """Return the frozenset of ids of the projects ``user`` is a member of."""
+    if not user.is_authenticated:
+        return frozenset()
+    try:
+        return user._member_project_ids
+    except AttributeError:
+        pass
+    # Remembered for the rest of the request, request.user lives as long
+    user._member_project_ids = frozenset(cache.user_projects.get(user.pk))
+    return user._member_project_ids
+
+
+def is_member(user, project):
+    """Return whether ``user`` is on the team of ``project``, a project or id."""
+    return getattr(project, "pk", project) in project_ids(user)
+
+
+async def aproject_ids(user):
+    """Async ``project_ids()``, for the user of ``await request.auser()``."""
+    if not user.is_authenticated:
+        return frozenset()
+    try:
+        return user._member_project_ids
+    except AttributeError:
+        pass
+    user._member_project_ids = frozenset(await cache.user_projects.aget(user.pk))
+    return user._member_project_ids
+
+
+async def ais_member(user, project):
+    return getattr(project, "pk", project) in await aproject_ids(user)
+
+
+def changed(project_ids, user_ids, using="default"):
+    """Refresh what depends on the memberships of ``user_ids`` in ``project_ids``."""
+    project_ids, user_ids = list(project_ids), list(user_ids)
+    manager = WorkItem.objects.db_manager(using)
+    for projects in chunked(project_ids, CHUNK_SIZE):
+        for users in chunked(user_ids, CHUNK_SIZE):
+            manager.refresh_assignments(projects, users)
+    cache.invalidate(
+        [
+            # Projects embed their team
+            *cache.project.keys(project_ids),
+            *cache.user_projects.keys(user_ids),
+        ],
+        using,
+    )
+
+
+def add_pairs(pairs, using="default"):
+    """
+    Add memberships from ``(project_id, user_id)`` pairs, return how many
+    were created. Existing memberships are left alone.
+    """
+    pairs = set(pairs)
+    with transaction.atomic(using=using):
+        existing = set()
+        for projects in chunked({project_id for project_id, _ in pairs}, 900):
+            existing.update(
+                Membership.objects.using(using)
+                .filter(project_id__in=projects)
+                .values_list("project_id", "user_id")
+            )
+        created = pairs - existing
+        Membership.objects.using(using).bulk_create(
+            [
+                Membership(project_id=project_id, user_id=user_id)
+                for project_id, user_id in created
+            ],
+            batch_size=1000,
+            # A concurrent add may have inserted some of them meanwhile
+            ignore_conflicts=True,
+        )
+        changed(
+            {project_id for project_id, _ in created},
+            {user_id for _, user_id in created},
+            using,
+        )
+    return len(created)
+
+
+def add(project_ids, user_ids, using="default"):
+    """Add every user of ``user_ids`` to every project of ``project_ids``."""
+    return add_pairs(product(set(project_ids), set(user_ids)), using)
+
+
+def remove(project_ids, user_ids, using="default"):
+    """Remove every user of ``user_ids`` from every project of ``project_ids``."""
+    project_ids, user_ids = set(project_ids), set(user_ids)
+    deleted = 0
+    with transaction.atomic(using=using):
+        for projects in chunked(project_ids, CHUNK_SIZE):
+            for users in chunked(user_ids, CHUNK_SIZE):
+                deleted += (
+                    Membership.objects.using(using)
+                    .filter(project_id__in=projects, user_id__in=users)
+                    .delete()[0]
+                )
+        if deleted:
+            changed(project_ids, user_ids, using)
+    return deleted
@@ -0,0 +1,82 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .profiling import QueryRecorder, profiler, recording
+
+
+class QueryProfilingMiddleware:
+    """
+    Record SQL count, SQL time, duplicate queries and wall time per request.
+
+    Only counters are kept per query, so the overhead is a couple of
+    ``perf_counter()`` calls per statement. ``MODELS_TASK_PROFILING_SAMPLE_RATE``
+    profiles a fraction of requests on busy deployments.
+    """
+
+    sync_capable = True
+    # Async views must not be forced through a thread by this middleware
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recording(recorder):
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recording(recorder):
+            response = await self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    def sampled(self):
+        rate = getattr(settings, "MODELS_TASK_PROFILING_SAMPLE_RATE", 1.0)
+        return rate >= 1 or random.random() < rate
+
+    def finish(self, request, response, recorder, started):
+        match = request.resolver_match
+        route = f"{request.method} /{match.route if match else '<unresolved>'}"
+        # File responses run no queries while streaming, and wrapping them
+        # would stop the server from sending the file with sendfile()
+        if response.streaming and getattr(response, "file_to_stream", None) is None:
+            # Queries of streamed responses run while the body is consumed
+            stream = self.astream if response.is_async else self.stream
+            response.streaming_content = stream(
+                response.streaming_content, route, started, recorder
+            )
+        else:
+            profiler.record(route, time.perf_counter() - started, recorder)
+        return response
+
+    def stream(self, content, route, started, recorder):
+        try:
+            with recording(recorder):
+                yield from content
+        finally:
+            profiler.record(route, time.perf_counter() - started, recorder)
+
+    async def astream(self, content, route, started, recorder):
+        try:
+            with recording(recorder):
+                async for chunk in content:
+                    yield chunk
+        finally:
+            profiler.record(route, time.perf_counter() - started, recorder)
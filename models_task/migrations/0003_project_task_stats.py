@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_task_stats(apps, schema_editor):
+    Task = apps.get_model("models_task", "Task")
+    ProjectTaskStats = apps.get_model("models_task", "ProjectTaskStats")
+    counts = (
+        Task.objects.order_by()
+        .values_list("project_id", "status")
+        .annotate(count=models.Count("pk"))
+    )
+    ProjectTaskStats.objects.bulk_create(
+        [
+            ProjectTaskStats(project_id=project_id, status=status, count=count)
+            for project_id, status, count in counts
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_task", "0002_task_comment_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectTaskStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("open", "Open"),
+                            ("review", "In Review"),
+                            ("working", "In Progress"),
+                            ("awaiting_release", "Awaiting Release"),
+                            ("waiting_qa", "Waiting for QA"),
+                            ("completed", "Completed"),
+                            ("closed", "Closed"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="task_stats",
+                        to="models_task.project",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("project", "status"), name="unique_project_task_status"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_task_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from models_task import search
+
+
+def searchable(apps):
+    # Spelled out, later searchable models install their own index
+    return [
+        apps.get_model("models_task", name) for name in ("Task", "Comment", "Document")
+    ]
+
+
+def install(apps, schema_editor):
+    search.install(schema_editor, models=searchable(apps))
+
+
+def uninstall(apps, schema_editor):
+    search.uninstall(schema_editor, models=searchable(apps))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_task", "0004_api_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
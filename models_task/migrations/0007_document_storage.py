@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:10
+
+import models_task.storage
+from django.db import migrations, models
+
+from models_task import search
+
+
+def reinstall_search(apps, schema_editor):
+    # SQLite rebuilds the table for AlterField, dropping the search triggers
+    search.install(schema_editor, models=[apps.get_model("models_task", "Document")])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_task", "0006_archive"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AlterField(
+            model_name="document",
+            name="file",
+            field=models.FileField(
+                storage=models_task.storage.document_storage,
+                upload_to="project_documents/",
+            ),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_task", "0007_document_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="profile_picture_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,157 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Left
+
+
+def build_work_items(apps, schema_editor):
+    # WorkItemManager.compute() as of this migration, on the historical models
+    alias = schema_editor.connection.alias
+    Task = apps.get_model("models_task", "Task")
+    Comment = apps.get_model("models_task", "Comment")
+    Project = apps.get_model("models_task", "Project")
+    WorkItem = apps.get_model("models_task", "WorkItem")
+    Membership = Project.team_members.through
+
+    latest = (
+        Comment.objects.using(alias)
+        .filter(task=models.OuterRef("pk"))
+        .order_by("-created_at", "-id")
+    )
+    tasks = (
+        Task.objects.using(alias)
+        .filter(assignee__isnull=False)
+        .filter(
+            models.Exists(
+                Membership.objects.filter(
+                    project_id=models.OuterRef("project_id"),
+                    user_id=models.OuterRef("assignee_id"),
+                )
+            )
+        )
+        .annotate(
+            comment_text=models.Subquery(
+                latest.annotate(snippet=Left("text", 200)).values("snippet")[:1]
+            ),
+            comment_author=models.Subquery(latest.values("author__username")[:1]),
+            comment_at=models.Subquery(latest.values("created_at")[:1]),
+        )
+        .order_by("pk")
+        .values_list(
+            "pk",
+            "assignee_id",
+            "project_id",
+            "project__title",
+            "title",
+            "status",
+            "updated_at",
+            "comment_text",
+            "comment_author",
+            "comment_at",
+        )
+    )
+    last = 0
+    while rows := list(tasks.filter(pk__gt=last)[:900]):
+        WorkItem.objects.using(alias).bulk_create(
+            WorkItem(
+                task_id=pk,
+                user_id=user_id,
+                project_id=project_id,
+                project_title=project_title,
+                title=title,
+                status=status,
+                task_updated_at=updated_at,
+                last_comment_text=comment_text or "",
+                last_comment_author=comment_author or "",
+                last_comment_at=comment_at,
+                activity_at=max(updated_at, comment_at or updated_at),
+            )
+            for (
+                pk,
+                user_id,
+                project_id,
+                project_title,
+                title,
+                status,
+                updated_at,
+                comment_text,
+                comment_author,
+                comment_at,
+            ) in rows
+        )
+        last = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_task", "0009_change_feed"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WorkItem",
+            fields=[
+                (
+                    "task",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="work_item",
+                        serialize=False,
+                        to="models_task.task",
+                    ),
+                ),
+                ("project_title", models.CharField(max_length=200)),
+                ("title", models.CharField(max_length=200)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("open", "Open"),
+                            ("review", "In Review"),
+                            ("working", "In Progress"),
+                            ("awaiting_release", "Awaiting Release"),
+                            ("waiting_qa", "Waiting for QA"),
+                            ("completed", "Completed"),
+                            ("closed", "Closed"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("task_updated_at", models.DateTimeField()),
+                ("last_comment_text", models.CharField(blank=True, max_length=200)),
+                ("last_comment_author", models.CharField(blank=True, max_length=150)),
+                ("last_comment_at", models.DateTimeField(blank=True, null=True)),
+                ("activity_at", models.DateTimeField()),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="models_task.project",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="work_items",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-activity_at", "-task"],
+                        name="work_item_user_activity_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_work_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_task", "0010_work_items"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskTransition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task_id", models.BigIntegerField()),
+                ("project_id", models.BigIntegerField()),
+                ("from_status", models.PositiveSmallIntegerField()),
+                ("to_status", models.PositiveSmallIntegerField()),
+                ("at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["task_id", "at"], name="transition_task_idx")
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ProjectCycleStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("completed", models.IntegerField(default=0)),
+                ("cycle_time", models.BigIntegerField(default=0)),
+                ("cycle_time_count", models.IntegerField(default=0)),
+                ("lead_time", models.BigIntegerField(default=0)),
+                ("lead_time_count", models.IntegerField(default=0)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cycle_stats",
+                        to="models_task.project",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("project", "day"), name="unique_project_cycle_day"
+                    )
+                ],
+            },
+        ),
+    ]
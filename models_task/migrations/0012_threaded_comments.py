@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Cast, LPad
+
+from models_task import search
+
+
+def reinstall_search(apps, schema_editor):
+    # SQLite rebuilds the table to add the path column, dropping the triggers
+    search.install(schema_editor, models=[apps.get_model("models_task", "Comment")])
+
+
+def backfill_paths(apps, schema_editor):
+    # Existing comments become the roots of their own threads
+    path = LPad(Cast("id", models.CharField()), 10, models.Value("0"))
+    for name in ("Comment", "ArchivedComment"):
+        model = apps.get_model("models_task", name)
+        model.objects.using(schema_editor.connection.alias).update(path=path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_task", "0011_task_transitions"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AddField(
+            model_name="archivedcomment",
+            name="parent_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="archivedcomment",
+            name="path",
+            field=models.CharField(blank=True, max_length=250),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="replies",
+                to="models_task.comment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="path",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=250
+            ),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(fields=["task", "path"], name="comment_thread_idx"),
+        ),
+    ]
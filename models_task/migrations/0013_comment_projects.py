@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+from models_task import search
+from models_task.utils import pk_batches
+
+
+def reinstall_search(apps, schema_editor):
+    # SQLite rebuilds the table to add the constraint, dropping the triggers
+    search.install(schema_editor, models=[apps.get_model("models_task", "Comment")])
+
+
+def backfill_projects(apps, schema_editor):
+    # Task comments, live and archived, take their task's project. One UPDATE
+    # per batch keeps the write transactions short on large tables.
+    alias = schema_editor.connection.alias
+    for comment_model, task_model in (
+        ("Comment", "Task"),
+        ("ArchivedComment", "ArchivedTask"),
+    ):
+        Comment = apps.get_model("models_task", comment_model)
+        Task = apps.get_model("models_task", task_model)
+        task_project = Task.objects.using(alias).filter(pk=models.OuterRef("task"))
+        missing = Comment.objects.using(alias).exclude(task=None).filter(project=None)
+        for pks in pk_batches(missing, 1000):
+            Comment.objects.using(alias).filter(pk__in=pks).update(
+                project_id=models.Subquery(task_project.values("project_id")[:1])
+            )
+
+
+def check_projects(apps, schema_editor):
+    # Comments with neither a task nor a project are never deleted here
+    Comment = apps.get_model("models_task", "Comment")
+    missing = Comment.objects.using(schema_editor.connection.alias).filter(project=None)
+    if missing.exists():
+        raise RuntimeError(
+            f"{missing.count()} comments have neither a task nor a project. "
+            "Move them to the archive with 'manage.py repair_comments "
+            "--archive-orphans' before migrating."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_task", "0012_threaded_comments"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_projects, migrations.RunPython.noop),
+        migrations.RunPython(check_projects, migrations.RunPython.noop),
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.RemoveIndex(
+            model_name="comment",
+            name="comment_project_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["project", "-created_at", "-id"],
+                name="comment_project_created_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="comment",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("project__isnull", False)),
+                name="comment_has_project",
+            ),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
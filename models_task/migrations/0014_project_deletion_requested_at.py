@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_task", "0013_comment_projects"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="deletion_requested_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
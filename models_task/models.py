@@ -1,8 +1,16 @@
-from django.db import models
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import MappingProxyType
 
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.functions import Cast, Concat, Left, LPad
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
+from django.utils import timezone
+
+from .storage import document_storage
 
 User = get_user_model()
 
@@ -32,10 +40,26 @@ class Profile(models.Model):
         null=True,
         blank=True,
     )
+    # Content hash of profile_picture, set once its thumbnails are generated
+    profile_picture_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.user.username} - {self.get_role_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that a replaced picture is thumbnailed on save
+        if "profile_picture" in field_names:
+            picture = values[field_names.index("profile_picture")]
+            instance._loaded_picture = picture or None
+        return instance
+
+    def thumbnail_url(self, size="small"):
+        from .thumbnails import thumbnail_url
+
+        return thumbnail_url(self, size)
+
 
 class Project(models.Model):
     title = models.CharField(max_length=200)
@@ -43,10 +67,202 @@ class Project(models.Model):
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
     team_members = models.ManyToManyField(User, related_name="projects", blank=True)
+    # Set when a batched deletion is scheduled, see models_task.deletion
+    deletion_requested_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return self.title
 
+    def task_status_counts(self):
+        """Return ``{status: count}`` for this project's tasks in one lookup."""
+        return dict(self.task_stats.filter(count__gt=0).values_list("status", "count"))
+
+
+# Set while TaskQuerySet.delete() accounts for the deleted rows itself
+suppress_task_stats = ContextVar("suppress_task_stats", default=False)
+
+# Set while a bulk load skips work item refreshes, see WorkItemManager.deferred()
+defer_work_items = ContextVar("defer_work_items", default=False)
+
+# Set while archived tasks are restored, their transitions are already logged
+suppress_transitions = ContextVar("suppress_transitions", default=False)
+
+
+class TaskQuerySet(models.QuerySet):
+    """
+    Keeps ``ProjectTaskStats`` in step on the bulk write paths, which bypass
+    the per-instance save signals.
+    """
+
+    STATS_FIELDS = {"status", "project", "project_id"}
+    # Fields whose bulk updates are logged to the change feed and work items
+    TRACKED_FIELDS = STATS_FIELDS | {"assignee", "assignee_id", "title"}
+
+    def status_counts(self):
+        """Return a Counter of ``(project_id, status)`` pairs in this queryset."""
+        rows = (
+            self.order_by()
+            .values_list("project_id", "status")
+            .annotate(count=models.Count("pk"))
+        )
+        return Counter({(project, status): count for project, status, count in rows})
+
+    def _status_counts_of(self, pks):
+        counts = Counter()
+        pks = list(pks)
+        # Stay below the SQLite bound parameter limit
+        for start in range(0, len(pks), 900):
+            counts.update(
+                self.model._default_manager.using(self.db)
+                .filter(pk__in=pks[start : start + 900])
+                .status_counts()
+            )
+        return counts
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        existing = {}
+        if kwargs.get("update_conflicts") or kwargs.get("ignore_conflicts"):
+            pks = [obj.pk for obj in objs if obj.pk is not None]
+            for start in range(0, len(pks), 900):
+                existing.update(
+                    (pk, (project, status))
+                    for pk, project, status in self.model._base_manager.using(self.db)
+                    .filter(pk__in=pks[start : start + 900])
+                    .values_list("pk", "project_id", "status")
+                )
+
+        # Upserts overwrite only update_fields, existing rows keep the rest
+        update_fields = set(kwargs.get("update_fields") or ())
+        moves = bool(update_fields & {"project", "project_id"})
+        sets_status = "status" in update_fields
+        upserted = {}
+        deltas = Counter()
+        for obj in objs:
+            if obj.pk in existing:
+                if kwargs.get("ignore_conflicts"):
+                    continue
+                project_id, status = existing[obj.pk]
+                upserted[obj.pk] = (
+                    obj.project_id if moves else project_id,
+                    obj.status if sets_status else status,
+                )
+                deltas[existing[obj.pk]] -= 1
+                deltas[upserted[obj.pk]] += 1
+            else:
+                deltas[(obj.project_id, obj.status)] += 1
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            created = super().bulk_create(objs, *args, **kwargs)
+            ProjectTaskStats.objects.db_manager(self.db).adjust(deltas)
+            self._sync_comments(
+                [
+                    pk
+                    for pk, (project_id, _) in upserted.items()
+                    if project_id != existing[pk][0]
+                ]
+            )
+            # bulk_create() sends no post_save signals to log the changes
+            changes = Change.objects.db_manager(self.db)
+            changes.log_tasks(
+                [
+                    obj.pk
+                    for obj in objs
+                    if obj.pk is not None and obj.pk not in existing
+                ],
+                action="created",
+            )
+            changes.log_tasks(upserted)
+            # Upserts may also unassign existing tasks
+            WorkItem.objects.db_manager(self.db).refresh(
+                obj.pk
+                for obj in objs
+                if obj.pk is not None and (existing or obj.assignee_id)
+            )
+            TaskTransition.objects.db_manager(self.db).record(
+                [
+                    (obj.pk, obj.project_id, None, obj.status)
+                    for obj in objs
+                    if obj.pk not in existing
+                ]
+                + [
+                    (pk, project_id, existing[pk][1], status)
+                    for pk, (project_id, status) in upserted.items()
+                ]
+            )
+        return created
+
+    def update(self, **kwargs):
+        if not self.TRACKED_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            # The rows are selected up front, the update may change which
+            # rows the queryset matches
+            if "status" in kwargs:
+                statuses = dict(self.values_list("pk", "status"))
+                pks = list(statuses)
+            else:
+                pks = list(self.values_list("pk", flat=True))
+            if self.STATS_FIELDS.intersection(kwargs):
+                rows = self._update_counting(pks, **kwargs)
+                if "project" in kwargs or "project_id" in kwargs:
+                    self._sync_comments(pks)
+            else:
+                rows = super().update(**kwargs)
+            Change.objects.db_manager(self.db).log_tasks(pks)
+            WorkItem.objects.db_manager(self.db).refresh(pks)
+            if "status" in kwargs:
+                TaskTransition.objects.db_manager(self.db).record_changed(statuses)
+        return rows
+
+    def _sync_comments(self, pks):
+        # Task comments carry their task's project
+        for start in range(0, len(pks), 900):
+            Comment.objects.using(self.db).filter(
+                task_id__in=pks[start : start + 900]
+            ).sync_projects()
+
+    def _update_counting(self, pks, **kwargs):
+        changed = self.STATS_FIELDS.intersection(kwargs)
+        if any(hasattr(kwargs[name], "resolve_expression") for name in changed):
+            # The new values depend on each row (bulk_update() ends up
+            # here too), so recount the same rows afterwards
+            before = self._status_counts_of(pks)
+            rows = super().update(**kwargs)
+            deltas = self._status_counts_of(pks)
+        else:
+            before = self.status_counts()
+            rows = super().update(**kwargs)
+            project = kwargs.get("project", kwargs.get("project_id"))
+            if isinstance(project, models.Model):
+                project = project.pk
+            deltas = Counter()
+            for (project_id, status), count in before.items():
+                key = (
+                    project_id if project is None else project,
+                    kwargs.get("status", status),
+                )
+                deltas[key] += count
+        deltas.subtract(before)
+        ProjectTaskStats.objects.db_manager(self.db).adjust(deltas)
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db, savepoint=False):
+            deltas = Counter()
+            deltas.subtract(self.status_counts())
+            token = suppress_task_stats.set(True)
+            try:
+                deleted = super().delete()
+            finally:
+                suppress_task_stats.reset(token)
+            ProjectTaskStats.objects.db_manager(self.db).adjust(deltas)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
 
 class Task(models.Model):
     STATUS_CHOICES = [
@@ -73,14 +289,41 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.title} - {self.get_status_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that status and project changes can be counted on save
+        instance._loaded_values = {
+            name: value
+            for name, value in zip(field_names, values)
+            if name in ("project_id", "status")
+        }
+        return instance
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "status"], name="task_project_status_idx"),
+            models.Index(
+                fields=["assignee", "status"], name="task_assignee_status_idx"
+            ),
+            # Keyset pagination of the API
+            models.Index(fields=["created_at", "id"], name="task_created_idx"),
+            models.Index(
+                fields=["project", "created_at", "id"],
+                name="task_project_created_idx",
+            ),
+        ]
+
 
 class Document(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
-    file = models.FileField(upload_to="project_documents/")
+    file = models.FileField(upload_to="project_documents/", storage=document_storage)
     version = models.CharField(max_length=50)
     project = models.ForeignKey(
         Project, on_delete=models.CASCADE, related_name="documents"
@@ -91,7 +334,139 @@ class Document(models.Model):
         return f"{self.name} (v{self.version})"
 
 
+class CommentQuerySet(models.QuerySet):
+    # Fields shown by the work items of the comments' tasks
+    WORK_ITEM_FIELDS = {"text", "author", "author_id", "task", "task_id"}
+    # Fields whose bulk updates are logged to the change feed
+    TRACKED_FIELDS = WORK_ITEM_FIELDS | {"project", "project_id"}
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        existing = set()
+        if kwargs.get("update_conflicts") or kwargs.get("ignore_conflicts"):
+            pks = [obj.pk for obj in objs if obj.pk is not None]
+            for start in range(0, len(pks), 900):
+                existing.update(
+                    self.model._base_manager.using(self.db)
+                    .filter(pk__in=pks[start : start + 900])
+                    .values_list("pk", flat=True)
+                )
+        # Task comments carry their task's project
+        task_ids = {obj.task_id for obj in objs if obj.task_id is not None}
+        if task_ids:
+            projects = dict(
+                Task._base_manager.using(self.db)
+                .filter(pk__in=task_ids)
+                .values_list("pk", "project_id")
+            )
+            for obj in objs:
+                if obj.task_id is not None:
+                    obj.project_id = projects.get(obj.task_id, obj.project_id)
+        with transaction.atomic(using=self.db, savepoint=False):
+            created = super().bulk_create(objs, *args, **kwargs)
+            # In primary key order, parents before their replies
+            pks = sorted(obj.pk for obj in objs if not obj.path and obj.pk is not None)
+            for chunk in range(0, len(pks), 500):
+                self.filter(pk__in=pks[chunk : chunk + 500]).set_paths()
+            # bulk_create() sends no post_save signals to log the changes
+            changes = Change.objects.db_manager(self.db)
+            changes.log_comments(
+                [
+                    obj.pk
+                    for obj in objs
+                    if obj.pk is not None and obj.pk not in existing
+                ],
+                action="created",
+            )
+            if not kwargs.get("ignore_conflicts"):
+                changes.log_comments(existing)
+            # The work items show each task's latest comment
+            WorkItem.objects.db_manager(self.db).refresh(
+                {obj.task_id for obj in objs if obj.task_id is not None}
+            )
+        return created
+
+    def update(self, **kwargs):
+        if not self.TRACKED_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            # Selected up front, the update may change which rows match
+            rows = list(self.values_list("pk", "task_id"))
+            updated = super().update(**kwargs)
+            pks = [pk for pk, _ in rows]
+            Change.objects.db_manager(self.db).log_comments(pks)
+            if self.WORK_ITEM_FIELDS.intersection(kwargs):
+                task_ids = {task_id for _, task_id in rows if task_id is not None}
+                if "task" in kwargs or "task_id" in kwargs:
+                    # And the tasks the comments moved to
+                    for start in range(0, len(pks), 900):
+                        task_ids.update(
+                            Comment._base_manager.using(self.db)
+                            .filter(pk__in=pks[start : start + 900])
+                            .exclude(task=None)
+                            .values_list("task_id", flat=True)
+                        )
+                WorkItem.objects.db_manager(self.db).refresh(task_ids)
+        return updated
+
+    def set_paths(self):
+        """
+        Fill in the path of the comments saved without one: one UPDATE for
+        the roots, then one per level of replies.
+        """
+        segment = LPad(
+            Cast("id", models.CharField()), Comment.SEGMENT, models.Value("0")
+        )
+        parent_path = Comment._base_manager.filter(pk=models.OuterRef("parent")).values(
+            "path"
+        )
+        self.filter(path="", parent=None).update(path=segment)
+        replies = self.filter(path="").exclude(parent=None)
+        while replies.exclude(parent__path="").update(
+            path=Concat(models.Subquery(parent_path), segment)
+        ):
+            pass
+
+    def sync_projects(self):
+        """
+        Give the task comments among these their task's project, return how
+        many had another.
+        """
+        task_project = Task._base_manager.filter(pk=models.OuterRef("task")).values(
+            "project_id"
+        )
+        return (
+            self.exclude(task=None)
+            .exclude(project=models.F("task__project"))
+            .update(project_id=models.Subquery(task_project))
+        )
+
+    def threaded(self):
+        """Order threads oldest first, each reply below its parent."""
+        return self.order_by("path")
+
+    def subtree(self, comment):
+        """``comment`` and all replies below it, as one index range scan."""
+        # Paths are digits, "~" sorts after every path below this one
+        return self.filter(
+            task_id=comment.task_id,
+            path__gte=comment.path,
+            path__lt=comment.path + "~",
+        ).threaded()
+
+    def thread(self, comment):
+        """The whole thread ``comment`` belongs to."""
+        root = Comment(task_id=comment.task_id, path=comment.path[: Comment.SEGMENT])
+        return self.subtree(root)
+
+
 class Comment(models.Model):
+    # Each comment's path is its ancestors' ids and its own, zero padded to
+    # SEGMENT digits, so sorting by path lists threads in display order
+    SEGMENT = 10
+    MAX_DEPTH = 25
+
     text = models.TextField()
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -99,6 +474,9 @@ class Comment(models.Model):
     task = models.ForeignKey(
         Task, on_delete=models.CASCADE, related_name="comments", null=True, blank=True
     )
+    # Set on task comments too, to their task's project. Left blank, it is
+    # filled in from the task on save. Nullable only so that existing rows
+    # can be repaired in batches before comment_has_project is added.
     project = models.ForeignKey(
         Project,
         on_delete=models.CASCADE,
@@ -106,9 +484,819 @@ class Comment(models.Model):
         null=True,
         blank=True,
     )
+    parent = models.ForeignKey(
+        "self", on_delete=models.CASCADE, related_name="replies", null=True, blank=True
+    )
+    path = models.CharField(
+        max_length=SEGMENT * MAX_DEPTH, default="", blank=True, editable=False
+    )
+
+    objects = CommentQuerySet.as_manager()
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.created_at}"
 
+    @property
+    def depth(self):
+        return len(self.path) // self.SEGMENT - 1
+
+    def ancestor_ids(self):
+        return [
+            int(self.path[start : start + self.SEGMENT])
+            for start in range(0, len(self.path) - self.SEGMENT, self.SEGMENT)
+        ]
+
+    def clean(self):
+        if self.task_id is None and self.project_id is None:
+            raise ValidationError("A comment needs a task or a project.")
+        if self.parent is not None and self.parent.depth + 1 >= self.MAX_DEPTH:
+            raise ValidationError(
+                {"parent": f"Replies nest at most {self.MAX_DEPTH} levels deep."}
+            )
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.parent_id is not None:
+            # Replies belong where their thread does
+            self.task_id = self.parent.task_id
+            self.project_id = self.parent.project_id
+        elif self._state.adding and self.task_id is not None:
+            self.project_id = self.task.project_id
+        using = kwargs.get("using") or router.db_for_write(Comment, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+            if not self.path:
+                parent_path = self.parent.path if self.parent_id is not None else ""
+                self.path = parent_path + str(self.pk).zfill(self.SEGMENT)
+                if len(self.path) > self.SEGMENT * self.MAX_DEPTH:
+                    raise ValueError(
+                        f"Replies nest at most {self.MAX_DEPTH} levels deep."
+                    )
+                Comment._base_manager.using(using).filter(pk=self.pk).update(
+                    path=self.path
+                )
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["task", "-created_at"], name="comment_task_created_idx"
+            ),
+            # All discussion of a project, keyset paginated by the API
+            models.Index(
+                fields=["project", "-created_at", "-id"],
+                name="comment_project_created_idx",
+            ),
+            # Keyset pagination of the API
+            models.Index(fields=["-created_at", "-id"], name="comment_created_idx"),
+            # Threads and subtrees, see CommentQuerySet.subtree()
+            models.Index(fields=["task", "path"], name="comment_thread_idx"),
+        ]
+        constraints = [
+            # Every comment has a project, task comments their task's
+            models.CheckConstraint(
+                condition=models.Q(project__isnull=False), name="comment_has_project"
+            ),
+        ]
+
+
+class ProjectTaskStatsManager(models.Manager):
+    def adjust(self, deltas):
+        """Apply a mapping of ``(project_id, status)`` to count deltas."""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.bulk_create(
+            [
+                self.model(project_id=project_id, status=status)
+                for (project_id, status), delta in deltas.items()
+                if delta > 0
+            ],
+            ignore_conflicts=True,
+        )
+        items = list(deltas.items())
+        # One UPDATE per chunk of counters rather than one per counter
+        for start in range(0, len(items), 250):
+            chunk = items[start : start + 250]
+            conditions = [
+                models.Q(project_id=project_id, status=status)
+                for (project_id, status), _ in chunk
+            ]
+            delta = models.Case(
+                *[
+                    models.When(condition, then=models.Value(delta))
+                    for condition, (_, delta) in zip(conditions, chunk)
+                ],
+                default=models.Value(0),
+            )
+            self.filter(models.Q(*conditions, _connector=models.Q.OR)).update(
+                count=models.F("count") + delta
+            )
+
+    def expected(self):
+        """Return the counters as computed from the ``Task`` table."""
+        return Task.objects.using(self.db).status_counts()
+
+    def stored(self):
+        return Counter(
+            {
+                (project_id, status): count
+                for project_id, status, count in self.filter(count__gt=0).values_list(
+                    "project_id", "status", "count"
+                )
+            }
+        )
+
+    def rebuild(self):
+        """Recompute every counter from the ``Task`` table."""
+        with transaction.atomic(using=self.db):
+            counts = self.expected()
+            self.all().delete()
+            self.bulk_create(
+                [
+                    self.model(project_id=project_id, status=status, count=count)
+                    for (project_id, status), count in counts.items()
+                ],
+                batch_size=1000,
+            )
+        return counts
+
+
+class ProjectTaskStats(models.Model):
+    """Denormalized number of tasks per project and status."""
+
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="task_stats"
+    )
+    status = models.CharField(max_length=20, choices=Task.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    objects = ProjectTaskStatsManager()
+
+    def __str__(self):
+        return f"{self.project_id} - {self.get_status_display()}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "status"], name="unique_project_task_status"
+            )
+        ]
+
+
+class ArchivedTask(models.Model):
+    """
+    A task moved out of ``Task`` by ``archive.archive_tasks()``. Rows keep the
+    id and timestamps they had in ``Task`` so they can be restored unchanged.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=Task.STATUS_CHOICES)
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="archived_tasks"
+    )
+    assignee = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_tasks",
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.title} - {self.get_status_display()} (archived)"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["project", "created_at", "id"],
+                name="archived_task_project_idx",
+            ),
+        ]
+
+
+class ArchivedComment(models.Model):
+    """A comment of an archived task, or an old project comment."""
+
+    id = models.BigIntegerField(primary_key=True)
+    text = models.TextField()
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_comments"
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    task = models.ForeignKey(
+        ArchivedTask,
+        on_delete=models.CASCADE,
+        related_name="comments",
+        null=True,
+        blank=True,
+    )
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name="archived_comments",
+        null=True,
+        blank=True,
+    )
+    # Not a foreign key, replies are archived before their parent
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    path = models.CharField(max_length=Comment.SEGMENT * Comment.MAX_DEPTH, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Comment by {self.author.username} on {self.created_at} (archived)"
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["project", "-created_at"],
+                name="archived_comment_project_idx",
+            ),
+        ]
+
+
+class ChangeManager(models.Manager):
+    def log_tasks(self, pks, action="updated"):
+        """Log the current state of the tasks ``pks``, for bulk updates."""
+        pks = list(pks)
+        for start in range(0, len(pks), 900):
+            rows = (
+                Task._base_manager.using(self.db)
+                .filter(pk__in=pks[start : start + 900])
+                .values_list("pk", "project_id", "status", "title")
+            )
+            self.bulk_create(
+                [
+                    self.model(
+                        kind="task",
+                        action=action,
+                        object_id=pk,
+                        project_id=project_id,
+                        data={"status": status, "title": title},
+                    )
+                    for pk, project_id, status, title in rows
+                ]
+            )
+
+    def log_comments(self, pks, action="updated"):
+        """Log the current state of the comments ``pks``, for bulk writes."""
+        pks = list(pks)
+        for start in range(0, len(pks), 900):
+            rows = (
+                Comment._base_manager.using(self.db)
+                .filter(pk__in=pks[start : start + 900])
+                .order_by("pk")
+                .values_list("pk", "project_id", "task_id", "author_id")
+            )
+            self.bulk_create(
+                [
+                    self.model(
+                        kind="comment",
+                        action=action,
+                        object_id=pk,
+                        project_id=project_id,
+                        data={"task": task_id, "author": author_id},
+                    )
+                    for pk, project_id, task_id, author_id in rows
+                ]
+            )
+
+    def since(self, cursor, limit=100, project=None, kinds=None):
+        """
+        Changes after ``cursor``, oldest first. The cursor is the primary key,
+        which only follows commit order while writes are serialized, as they
+        are on SQLite. On databases with concurrent writers, e.g. PostgreSQL,
+        a change committed after a later id was read can be skipped.
+        """
+        changes = self.filter(pk__gt=cursor)
+        if project is not None:
+            changes = changes.filter(project_id=project)
+        if kinds:
+            changes = changes.filter(kind__in=kinds)
+        return changes.order_by("pk")[:limit]
+
+    def prune(self, keep=None, before=None, batch_size=10000):
+        """
+        Delete changes beyond the newest ``keep`` or older than ``before``,
+        oldest first in batches. Returns the number of deleted changes.
+        """
+        # Everything below the threshold id goes
+        threshold = 0
+        if keep is not None:
+            newest = self.order_by("-pk").values_list("pk", flat=True)
+            beyond = list(newest[keep : keep + 1])
+            if beyond:
+                threshold = beyond[0] + 1
+        if before is not None:
+            old = list(
+                self.filter(created_at__lt=before)
+                .order_by("-pk")
+                .values_list("pk", flat=True)[:1]
+            )
+            if old:
+                threshold = max(threshold, old[0] + 1)
+
+        deleted = 0
+        while True:
+            # Short transactions, a batch of ids at a time
+            pks = list(
+                self.filter(pk__lt=threshold)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                return deleted
+            deleted += self.filter(pk__gte=pks[0], pk__lte=pks[-1]).delete()[0]
+
+
+class Change(models.Model):
+    """
+    Append-only log of task, comment and project changes, read by the change
+    feed. The primary key is the feed cursor, see ``ChangeManager.since()``.
+    Changes are written in the transaction of the change itself, so rolled
+    back writes never appear.
+    """
+
+    KIND_CHOICES = [("task", "Task"), ("comment", "Comment"), ("project", "Project")]
+    ACTION_CHOICES = [
+        ("created", "Created"),
+        ("updated", "Updated"),
+        ("deleted", "Deleted"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    object_id = models.BigIntegerField()
+    # Not foreign keys, the log outlives deleted rows
+    project_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ChangeManager()
+
+    def __str__(self):
+        return f"{self.pk}: {self.kind} {self.object_id} {self.action}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project_id", "id"], name="change_project_idx"),
+        ]
+
+
+class WorkItemManager(models.Manager):
+    def compute(self, task_ids):
+        """
+        Build the work items of ``task_ids``: tasks with an assignee who is a
+        member of the task's project, with the task's latest comment.
+        """
+        Membership = Project.team_members.through
+        latest = (
+            Comment.objects.using(self.db)
+            .filter(task=models.OuterRef("pk"))
+            .order_by("-created_at", "-id")
+        )
+        rows = (
+            Task._base_manager.using(self.db)
+            .filter(pk__in=task_ids, assignee__isnull=False)
+            .filter(
+                models.Exists(
+                    Membership.objects.filter(
+                        project_id=models.OuterRef("project_id"),
+                        user_id=models.OuterRef("assignee_id"),
+                    )
+                )
+            )
+            .annotate(
+                comment_text=models.Subquery(
+                    latest.annotate(snippet=Left("text", 200)).values("snippet")[:1]
+                ),
+                comment_author=models.Subquery(latest.values("author__username")[:1]),
+                comment_at=models.Subquery(latest.values("created_at")[:1]),
+            )
+            .values_list(
+                "pk",
+                "assignee_id",
+                "project_id",
+                "project__title",
+                "title",
+                "status",
+                "updated_at",
+                "comment_text",
+                "comment_author",
+                "comment_at",
+            )
+        )
+        return [
+            self.model(
+                task_id=pk,
+                user_id=user_id,
+                project_id=project_id,
+                project_title=project_title,
+                title=title,
+                status=status,
+                task_updated_at=updated_at,
+                last_comment_text=comment_text or "",
+                last_comment_author=comment_author or "",
+                last_comment_at=comment_at,
+                activity_at=max(updated_at, comment_at or updated_at),
+            )
+            for (
+                pk,
+                user_id,
+                project_id,
+                project_title,
+                title,
+                status,
+                updated_at,
+                comment_text,
+                comment_author,
+                comment_at,
+            ) in rows
+        ]
+
+    def refresh(self, task_ids):
+        """Recompute the work items of ``task_ids``."""
+        if defer_work_items.get():
+            return
+        task_ids = list(task_ids)
+        with transaction.atomic(using=self.db, savepoint=False):
+            # Stay below the SQLite bound parameter limit
+            for start in range(0, len(task_ids), 900):
+                chunk = task_ids[start : start + 900]
+                self.filter(task_id__in=chunk).delete()
+                self.bulk_create(self.compute(chunk))
+
+    def refresh_assignments(self, project_ids=None, user_ids=None):
+        """Recompute the work items of the tasks of projects or assignees."""
+        tasks = Task._base_manager.using(self.db).filter(assignee__isnull=False)
+        if project_ids is not None:
+            tasks = tasks.filter(project_id__in=project_ids)
+        if user_ids is not None:
+            tasks = tasks.filter(assignee_id__in=user_ids)
+        self.refresh(tasks.values_list("pk", flat=True))
+
+    @contextmanager
+    def deferred(self):
+        """
+        Skip the incremental refreshes inside the block and rebuild every
+        work item once at the end, which is much cheaper for bulk loads.
+        """
+        token = defer_work_items.set(True)
+        try:
+            yield
+        finally:
+            defer_work_items.reset(token)
+        self.rebuild()
+
+    def rebuild(self, batch_size=900):
+        """Recompute every work item, return how many there are."""
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            tasks = (
+                Task._base_manager.using(self.db)
+                .filter(assignee__isnull=False)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            last, count = 0, 0
+            while pks := list(tasks.filter(pk__gt=last)[:batch_size]):
+                items = self.bulk_create(self.compute(pks))
+                last, count = pks[-1], count + len(items)
+        return count
+
+    def verify(self):
+        """Return the ids of tasks whose stored work item is out of date."""
+        fields = [field.attname for field in self.model._meta.concrete_fields]
+        stored = {row[0]: row for row in self.values_list(*fields)}
+        task_ids = list(
+            Task._base_manager.using(self.db)
+            .filter(assignee__isnull=False)
+            .values_list("pk", flat=True)
+        )
+        expected = {}
+        for start in range(0, len(task_ids), 900):
+            for item in self.compute(task_ids[start : start + 900]):
+                expected[item.pk] = tuple(getattr(item, name) for name in fields)
+        return sorted(
+            pk
+            for pk in stored.keys() | expected.keys()
+            if stored.get(pk) != expected.get(pk)
+        )
+
+
+class WorkItem(models.Model):
+    """
+    A user's work queue, materialized: one row per task assigned to a member
+    of the task's project, with the project title and the task's latest
+    comment. Kept up to date by the task, comment, project and membership
+    write paths, so listing it is a single index range scan.
+    """
+
+    task = models.OneToOneField(
+        Task, on_delete=models.CASCADE, primary_key=True, related_name="work_item"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="work_items")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="+")
+    project_title = models.CharField(max_length=200)
+    title = models.CharField(max_length=200)
+    status = models.CharField(max_length=20, choices=Task.STATUS_CHOICES)
+    task_updated_at = models.DateTimeField()
+    last_comment_text = models.CharField(max_length=200, blank=True)
+    last_comment_author = models.CharField(max_length=150, blank=True)
+    last_comment_at = models.DateTimeField(null=True, blank=True)
+    # Latest of task_updated_at and last_comment_at
+    activity_at = models.DateTimeField()
+
+    objects = WorkItemManager()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.title}"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-activity_at", "-task"],
+                name="work_item_user_activity_idx",
+            ),
+        ]
+
+
+class TaskTransitionManager(models.Manager):
+    def record(self, changes):
+        """
+        Log ``(task_id, project_id, from_status, to_status)`` changes, with
+        ``from_status`` None for new tasks, and roll up the completions.
+        """
+        if suppress_transitions.get():
+            return
+        now = timezone.now()
+        transitions = self.bulk_create(
+            [
+                self.model(
+                    task_id=task_id,
+                    project_id=project_id,
+                    from_status=self.model.code(before),
+                    to_status=self.model.code(after),
+                    at=now,
+                )
+                for task_id, project_id, before, after in changes
+                if task_id is not None and before != after
+            ],
+            batch_size=1000,
+        )
+        ProjectCycleStats.objects.db_manager(self.db).add(transitions)
+
+    def record_changed(self, before):
+        """Log the tasks whose status differs from ``before``, ``{pk: status}``."""
+        pks = list(before)
+        changes = []
+        # Stay below the SQLite bound parameter limit
+        for start in range(0, len(pks), 900):
+            rows = (
+                Task._base_manager.using(self.db)
+                .filter(pk__in=pks[start : start + 900])
+                .values_list("pk", "project_id", "status")
+            )
+            changes.extend(
+                (pk, project_id, before[pk], status) for pk, project_id, status in rows
+            )
+        self.record(changes)
+
+
+class TaskTransition(models.Model):
+    """
+    Append-only log of task status changes, written by the task save and
+    bulk write paths. A task's first row has ``from_status`` 0.
+
+    Rows are kept small: statuses are stored as the small integer codes of
+    ``CODES``, and task and project are plain integers so the history outlives
+    deleted tasks.
+    """
+
+    # Stored in the rows: new statuses get new codes, codes are never
+    # renumbered or reused
+    CODES = MappingProxyType(
+        {
+            None: 0,
+            "open": 1,
+            "review": 2,
+            "working": 3,
+            "awaiting_release": 4,
+            "waiting_qa": 5,
+            "completed": 6,
+            "closed": 7,
+        }
+    )
+    STATUSES = MappingProxyType({code: status for status, code in CODES.items()})
+    WORKING = CODES["working"]
+    COMPLETED = CODES["completed"]
+
+    task_id = models.BigIntegerField()
+    project_id = models.BigIntegerField()
+    from_status = models.PositiveSmallIntegerField()
+    to_status = models.PositiveSmallIntegerField()
+    at = models.DateTimeField()
+
+    objects = TaskTransitionManager()
+
+    def __str__(self):
+        return (
+            f"{self.task_id}: {self.status(self.from_status)} -> "
+            f"{self.status(self.to_status)}"
+        )
+
+    @classmethod
+    def code(cls, status):
+        return cls.CODES[status]
+
+    @classmethod
+    def status(cls, code):
+        return cls.STATUSES[code]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["task_id", "at"], name="transition_task_idx"),
+        ]
+
+
+class ProjectCycleStatsManager(models.Manager):
+    FIELDS = (
+        "completed",
+        "cycle_time",
+        "cycle_time_count",
+        "lead_time",
+        "lead_time_count",
+    )
+
+    def deltas(self, transitions):
+        """
+        Return ``{(project_id, day): Counter}`` of the rollup increments for
+        the completions among ``transitions``.
+        """
+        completions = [
+            transition
+            for transition in transitions
+            # Tasks created as completed were never worked on here
+            if transition.to_status == TaskTransition.COMPLETED
+            and transition.from_status != 0
+        ]
+        task_ids = list({transition.task_id for transition in completions})
+        firsts = {}
+        for start in range(0, len(task_ids), 900):
+            firsts.update(
+                (task_id, (created, started))
+                for task_id, created, started in TaskTransition.objects.using(self.db)
+                .filter(task_id__in=task_ids[start : start + 900])
+                .values("task_id")
+                .annotate(
+                    created=models.Min("at", filter=models.Q(from_status=0)),
+                    started=models.Min(
+                        "at", filter=models.Q(to_status=TaskTransition.WORKING)
+                    ),
+                )
+                .values_list("task_id", "created", "started")
+            )
+
+        deltas = {}
+        for transition in completions:
+            key = (transition.project_id, timezone.localdate(transition.at))
+            delta = deltas.setdefault(key, Counter())
+            delta["completed"] += 1
+            # Tasks older than the log have no creation row
+            created, started = firsts.get(transition.task_id, (None, None))
+            if created is not None:
+                delta["lead_time_count"] += 1
+                delta["lead_time"] += int((transition.at - created).total_seconds())
+            if started is not None and started <= transition.at:
+                delta["cycle_time_count"] += 1
+                delta["cycle_time"] += int((transition.at - started).total_seconds())
+        return deltas
+
+    def add(self, transitions):
+        """Roll up newly logged ``TaskTransition`` rows."""
+        deltas = self.deltas(transitions)
+        if not deltas:
+            return
+        self.bulk_create(
+            [self.model(project_id=project_id, day=day) for project_id, day in deltas],
+            ignore_conflicts=True,
+        )
+        # Few keys per write: the projects touched on one day
+        for (project_id, day), delta in deltas.items():
+            self.filter(project_id=project_id, day=day).update(
+                **{name: models.F(name) + value for name, value in delta.items()}
+            )
+
+    def expected(self, batch_size=10000):
+        """Return the rollups as computed from the transition log."""
+        totals = {}
+        completions = TaskTransition.objects.using(self.db).filter(
+            to_status=TaskTransition.COMPLETED
+        )
+        last = 0
+        while batch := list(
+            completions.filter(pk__gt=last).order_by("pk")[:batch_size]
+        ):
+            for key, delta in self.deltas(batch).items():
+                totals.setdefault(key, Counter()).update(delta)
+            last = batch[-1].pk
+        # The log outlives deleted projects, their rollups went with them
+        projects = set(Project.objects.using(self.db).values_list("pk", flat=True))
+        return {key: delta for key, delta in totals.items() if key[0] in projects}
+
+    def stored(self):
+        return {
+            (row["project_id"], row["day"]): Counter(
+                {name: row[name] for name in self.FIELDS if row[name]}
+            )
+            for row in self.values("project_id", "day", *self.FIELDS)
+        }
+
+    def rebuild(self):
+        """Recompute every rollup from the transition log, return how many."""
+        with transaction.atomic(using=self.db):
+            totals = self.expected()
+            self.all().delete()
+            self.bulk_create(
+                [
+                    self.model(project_id=project_id, day=day, **delta)
+                    for (project_id, day), delta in totals.items()
+                ],
+                batch_size=1000,
+            )
+        return len(totals)
+
+    def summary(self, project_ids=None, start=None, end=None):
+        """
+        Return ``{project_id: {...}}`` with completions (throughput) and mean
+        cycle and lead times in hours between the days ``start`` and ``end``.
+        """
+        rollups = self.all()
+        if project_ids is not None:
+            rollups = rollups.filter(project_id__in=project_ids)
+        if start is not None:
+            rollups = rollups.filter(day__gte=start)
+        if end is not None:
+            rollups = rollups.filter(day__lte=end)
+        rows = rollups.values("project_id").annotate(
+            completed=models.Sum("completed"),
+            days=models.Count("day"),
+            cycle_time=models.Sum("cycle_time"),
+            cycle_time_count=models.Sum("cycle_time_count"),
+            lead_time=models.Sum("lead_time"),
+            lead_time_count=models.Sum("lead_time_count"),
+        )
+        return {
+            row["project_id"]: {
+                "completed": row["completed"],
+                "active_days": row["days"],
+                "mean_cycle_hours": (
+                    row["cycle_time"] / row["cycle_time_count"] / 3600
+                    if row["cycle_time_count"]
+                    else None
+                ),
+                "mean_lead_hours": (
+                    row["lead_time"] / row["lead_time_count"] / 3600
+                    if row["lead_time_count"]
+                    else None
+                ),
+            }
+            for row in rows.order_by("project_id")
+        }
+
+
+class ProjectCycleStats(models.Model):
+    """
+    Daily per-project rollup of task completions and their cycle times
+    (first "working" to "completed") and lead times (creation to
+    "completed"), kept up to date as transitions are logged. Durations are
+    totals in seconds, divide by the matching count for the mean.
+    """
+
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="cycle_stats"
+    )
+    day = models.DateField()
+    completed = models.IntegerField(default=0)
+    cycle_time = models.BigIntegerField(default=0)
+    cycle_time_count = models.IntegerField(default=0)
+    lead_time = models.BigIntegerField(default=0)
+    lead_time_count = models.IntegerField(default=0)
+
+    objects = ProjectCycleStatsManager()
+
+    def __str__(self):
+        return f"{self.project_id} {self.day}: {self.completed} completed"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "day"], name="unique_project_cycle_day"
+            )
+        ]
@@ -0,0 +1,83 @@
+import hashlib
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .cache import get_cache
+
+
+def estimated_count(model, using="default"):
+    """
+    Return the planner's row estimate for ``model``'s table, or None when the
+    backend keeps no usable statistics.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(table)],
+            )
+            row = cursor.fetchone()
+            # reltuples is -1 until the table has been analyzed
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone():
+                # Filled by ANALYZE, "stat" starts with the table's row count
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+                )
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    return None
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator for very large changelists.
+
+    Counts up to ``MODELS_TASK_EXACT_COUNT_THRESHOLD`` rows exactly, with a
+    single bounded query. Above that, unfiltered lists use the table
+    statistics the database keeps (ANALYZE), and filtered lists, or tables
+    without statistics, reuse an exact count cached for
+    ``MODELS_TASK_COUNT_CACHE_TIMEOUT`` seconds.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        threshold = getattr(settings, "MODELS_TASK_EXACT_COUNT_THRESHOLD", 10000)
+
+        # Counting a LIMITed subquery stays cheap however large the table is
+        bounded = queryset.order_by()[: threshold + 1].count()
+        if bounded <= threshold:
+            return bounded
+
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > threshold:
+                return estimate
+
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(
+            repr((sql, params)).encode(), usedforsecurity=False
+        ).hexdigest()
+        key = f"models_task:count:{queryset.db}:{digest}"
+        cache = get_cache()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(
+                key,
+                count,
+                getattr(settings, "MODELS_TASK_COUNT_CACHE_TIMEOUT", 60),
+            )
+        return count
@@ -0,0 +1,242 @@
+"""
+In-process request profiling used by ``QueryProfilingMiddleware``.
+
+Each process aggregates the last ``WINDOW`` requests per route and writes a
+JSON snapshot to ``MODELS_TASK_PROFILING_DIR`` at most every
+``MODELS_TASK_PROFILING_FLUSH_INTERVAL`` seconds, so reports can merge every
+worker process of a deployment.
+"""
+
+import json
+import os
+import re
+import resource
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+WINDOW = 1000
+MAX_DUPLICATES = 50
+
+_IN_LIST = re.compile(r"\((?:%s, )+%s\)")
+
+
+def fingerprint(sql):
+    """Normalize ``sql`` so queries differing only in IN list length match."""
+    return _IN_LIST.sub("(%s, ...)", sql)[:500]
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper()`` callable recording one request's SQL."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: n - 1 for sql, n in self.fingerprints.items() if n > 1}
+
+
+# Recorder of the request being handled. A context variable rather than a
+# per-connection wrapper reaches the queries async views run in worker threads.
+current_recorder = ContextVar("current_recorder", default=None)
+
+
+def record_queries(execute, sql, params, many, context):
+    """Wrapper installed on every connection, see ``install()``."""
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def enabled():
+    """Whether ``QueryProfilingMiddleware`` is installed and samples requests."""
+    return (
+        "models_task.middleware.QueryProfilingMiddleware" in settings.MIDDLEWARE
+        and getattr(settings, "MODELS_TASK_PROFILING_SAMPLE_RATE", 1.0) > 0
+    )
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # First in line, as execute_wrapper() pops the last wrapper on exit
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_queries)
+
+
+def install():
+    """
+    Wrap every new connection with ``record_queries()`` when profiling is
+    enabled. Otherwise queries run without the extra call.
+    """
+    if enabled():
+        connection_created.connect(
+            install_query_recorder, dispatch_uid="models_task.profiling"
+        )
+
+
+@contextmanager
+def recording(recorder):
+    """Record the queries run in this context, and its threads, to ``recorder``."""
+    token = current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        current_recorder.reset(token)
+
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.wall = deque(maxlen=WINDOW)
+        self.sql_time = deque(maxlen=WINDOW)
+        self.queries = deque(maxlen=WINDOW)
+        self.duplicates = Counter()
+
+    def add(self, wall, recorder):
+        self.requests += 1
+        self.wall.append(wall)
+        self.sql_time.append(recorder.duration)
+        self.queries.append(recorder.count)
+        self.duplicates.update(recorder.duplicates)
+        if len(self.duplicates) > MAX_DUPLICATES * 2:
+            self.duplicates = Counter(dict(self.duplicates.most_common(MAX_DUPLICATES)))
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "wall": list(self.wall),
+            "sql_time": list(self.sql_time),
+            "queries": list(self.queries),
+            "duplicates": dict(self.duplicates.most_common(MAX_DUPLICATES)),
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def record(self, route, wall, recorder):
+        with self.lock:
+            self.routes.setdefault(route, RouteStats()).add(wall, recorder)
+            interval = getattr(settings, "MODELS_TASK_PROFILING_FLUSH_INTERVAL", 30)
+            if time.monotonic() - self.last_flush < interval:
+                return
+            self.last_flush = time.monotonic()
+            snapshot = {route: stats.as_dict() for route, stats in self.routes.items()}
+        write_snapshot(snapshot)
+
+    def snapshot(self):
+        with self.lock:
+            return {route: stats.as_dict() for route, stats in self.routes.items()}
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+
+profiler = Profiler()
+
+
+def snapshot_dir():
+    path = getattr(settings, "MODELS_TASK_PROFILING_DIR", None)
+    return Path(path) if path else None
+
+
+def write_snapshot(snapshot):
+    directory = snapshot_dir()
+    if directory is None:
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"{os.getpid()}.json"
+    temporary = target.with_suffix(".tmp")
+    temporary.write_text(json.dumps(snapshot))
+    # Atomic so readers never see a half written snapshot
+    temporary.replace(target)
+
+
+def load_snapshots():
+    """Return this process's live stats plus every other process's snapshot."""
+    snapshots = [profiler.snapshot()]
+    directory = snapshot_dir()
+    if directory is not None and directory.is_dir():
+        for path in directory.glob("*.json"):
+            if path.stem != str(os.getpid()):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue
+    return snapshots
+
+
+def peak_rss():
+    """Peak resident memory of this process so far, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report():
+    """Merge all snapshots into per-route percentiles, slowest p99 first."""
+    merged = {}
+    for snapshot in load_snapshots():
+        for route, stats in snapshot.items():
+            entry = merged.setdefault(
+                route,
+                {
+                    "requests": 0,
+                    "wall": [],
+                    "sql_time": [],
+                    "queries": [],
+                    "duplicates": Counter(),
+                },
+            )
+            entry["requests"] += stats["requests"]
+            for name in ("wall", "sql_time", "queries"):
+                entry[name].extend(stats[name])
+            entry["duplicates"].update(stats["duplicates"])
+
+    rows = []
+    for route, entry in merged.items():
+        row = {"route": route, "requests": entry["requests"]}
+        for name in ("wall", "sql_time", "queries"):
+            for label, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+                row[f"{name}_{label}"] = percentile(entry[name], fraction)
+        row["duplicates"] = dict(entry["duplicates"].most_common(10))
+        rows.append(row)
+    return sorted(rows, key=lambda row: row["wall_p99"] or 0, reverse=True)
+
+
+def reset():
+    profiler.reset()
+    directory = snapshot_dir()
+    if directory is not None and directory.is_dir():
+        for path in directory.glob("*.json"):
+            path.unlink(missing_ok=True)
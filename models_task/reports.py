@@ -0,0 +1,130 @@
+"""
+Reports aggregated in the database and streamed to a file.
+
+Each report is a single ``values()``/``annotate()`` query, so grouping and
+counting happen in the database and no model instance is ever built. Rows
+are read with ``iterator()`` and flow through generators to the writer a
+chunk at a time, which keeps memory flat however large the tables are.
+
+Besides CSV and JSONL, reports can be written in a columnar layout: a header
+line naming the columns, then one JSON line per chunk holding a list of
+values per column, like the row groups of a Parquet file.
+"""
+
+import csv
+import json
+from datetime import datetime
+
+from django.db.models import Count, F, Max
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .models import Comment, Document, Task
+from .utils import JSONEncoder, chunked
+
+
+class Report:
+    def __init__(self, build, columns, date_field, description):
+        # Returns the grouped queryset
+        self.build = build
+        self.columns = columns
+        # Field the --month period filters on
+        self.date_field = date_field
+        self.description = description
+
+    def queryset(self, start=None, end=None):
+        queryset = self.build()
+        if start is not None:
+            queryset = queryset.filter(**{f"{self.date_field}__gte": start})
+        if end is not None:
+            queryset = queryset.filter(**{f"{self.date_field}__lt": end})
+        return queryset.values_list(*self.columns)
+
+
+REPORTS = {
+    "tasks-by-assignee": Report(
+        lambda: Task.objects.values("status", assignee_name=F("assignee__username"))
+        .annotate(tasks=Count("pk"))
+        .order_by("assignee_name", "status"),
+        ["assignee_name", "status", "tasks"],
+        "updated_at",
+        "Tasks per assignee and status, of the tasks updated in the period",
+    ),
+    "comments-by-project-week": Report(
+        lambda: Comment.objects.values(
+            "project_id",
+            project_title=F("project__title"),
+            week=TruncWeek("created_at"),
+        )
+        .annotate(comments=Count("pk"), authors=Count("author", distinct=True))
+        .order_by("project_id", "week"),
+        ["project_id", "project_title", "week", "comments", "authors"],
+        "created_at",
+        "Comments and distinct authors per project and week",
+    ),
+    "documents-by-project-version": Report(
+        lambda: Document.objects.values(
+            "project_id", "version", project_title=F("project__title")
+        )
+        .annotate(documents=Count("pk"), last_uploaded_at=Max("uploaded_at"))
+        .order_by("project_id", "version"),
+        ["project_id", "project_title", "version", "documents", "last_uploaded_at"],
+        "uploaded_at",
+        "Documents per project and version",
+    ),
+}
+
+
+def month_range(month):
+    """Return the ``[start, end)`` datetimes of a ``YYYY-MM`` month."""
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def report_chunks(name, start=None, end=None, chunk_size=2000):
+    """Yield the rows of report ``name`` as lists of at most ``chunk_size`` tuples."""
+    rows = REPORTS[name].queryset(start, end).iterator(chunk_size=chunk_size)
+    yield from chunked(rows, chunk_size)
+
+
+def write_csv(stream, columns, chunks):
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    count = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        count += len(chunk)
+    return count
+
+
+def write_jsonl(stream, columns, chunks):
+    count = 0
+    for chunk in chunks:
+        for row in chunk:
+            stream.write(json.dumps(dict(zip(columns, row)), cls=JSONEncoder))
+            stream.write("\n")
+        count += len(chunk)
+    return count
+
+
+def write_columnar(stream, columns, chunks):
+    stream.write(json.dumps({"columns": columns}))
+    stream.write("\n")
+    count = 0
+    for chunk in chunks:
+        stream.write(
+            json.dumps([list(values) for values in zip(*chunk)], cls=JSONEncoder)
+        )
+        stream.write("\n")
+        count += len(chunk)
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "columnar": write_columnar}
+
+
+def write_report(stream, name, fmt="csv", start=None, end=None, chunk_size=2000):
+    """Write report ``name`` to ``stream`` and return how many rows were written."""
+    chunks = report_chunks(name, start, end, chunk_size)
+    return WRITERS[fmt](stream, REPORTS[name].columns, chunks)
@@ -0,0 +1,180 @@
+"""
+Full-text search over tasks, comments and documents.
+
+On SQLite every searchable table gets an external-content FTS5 table
+(``<table>_fts``) kept in sync by triggers, so bulk writes that skip model
+signals are indexed too. On PostgreSQL a GIN index over the ``tsvector``
+expression of the same columns needs no syncing at all. Other backends, or a
+SQLite build without FTS5, fall back to the admin's ``LIKE`` search.
+
+Django rebuilds a SQLite table, dropping its triggers, when a migration alters
+it; such migrations must call ``install()`` again, passing the historical
+models from ``apps.get_model()`` rather than the ones in ``models.py``.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Document, Task
+
+SEARCHABLE = {
+    "task": (Task, ("title", "description")),
+    "comment": (Comment, ("text",)),
+    "document": (Document, ("name", "description")),
+}
+
+# Models -> indexed columns, as used by the admin
+INDEXED_FIELDS = {model: fields for model, fields in SEARCHABLE.values()}
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def tsvector(connection, fields):
+    columns = " || ' ' || ".join(
+        f"coalesce({connection.ops.quote_name(field)}, '')" for field in fields
+    )
+    return f"to_tsvector('english', {columns})"
+
+
+def searchable_models(models=None):
+    """
+    Yield ``(model, fields)`` for ``models`` (default: all searchable). Fields
+    are looked up by model name, so historical models are accepted too.
+    """
+    if models is None:
+        models = [model for model, _ in SEARCHABLE.values()]
+    for model in models:
+        yield model, SEARCHABLE[model._meta.model_name][1]
+
+
+def install(schema_editor, models=None):
+    """Create the search index for ``models`` (default: all searchable)."""
+    connection = schema_editor.connection
+    for model, fields in searchable_models(models):
+        table = model._meta.db_table
+        if connection.vendor == "postgresql":
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_search ON {table} "
+                f"USING GIN ({tsvector(connection, fields)})"
+            )
+        elif connection.vendor == "sqlite" and fts5_supported(connection):
+            fts = fts_table(model)
+            columns = ", ".join(fields)
+            new = ", ".join(f"new.{field}" for field in fields)
+            old = ", ".join(f"old.{field}" for field in fields)
+            delete = (
+                f"INSERT INTO {fts} ({fts}, rowid, {columns}) "
+                f"VALUES ('delete', old.id, {old});"
+            )
+            insert = f"INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new});"
+            for statement in (
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{columns}, content='{table}', content_rowid='id')",
+                f"DROP TRIGGER IF EXISTS {fts}_insert",
+                f"DROP TRIGGER IF EXISTS {fts}_delete",
+                f"DROP TRIGGER IF EXISTS {fts}_update",
+                f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+                f"{insert} END",
+                f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+                f"{delete} END",
+                f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {columns} ON {table} "
+                f"BEGIN {delete} {insert} END",
+                # Index the rows that already exist
+                f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+            ):
+                schema_editor.execute(statement)
+
+
+def uninstall(schema_editor, models=None):
+    connection = schema_editor.connection
+    for model, _ in searchable_models(models):
+        table = model._meta.db_table
+        if connection.vendor == "postgresql":
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search")
+        elif connection.vendor == "sqlite":
+            fts = fts_table(model)
+            for name in ("insert", "delete", "update"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{name}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+def fts5_supported(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any("ENABLE_FTS5" in row[0] for row in cursor.fetchall())
+
+
+def available(model, using="default"):
+    """Whether ``model`` can be searched through the full-text index."""
+    connection = connections[using]
+    if model not in INDEXED_FIELDS:
+        return False
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [fts_table(model)],
+        )
+        return cursor.fetchone() is not None
+
+
+def fts_query(term):
+    """
+    Turn free text into an FTS5 query matching every word as a prefix. Words
+    are quoted, so FTS5 operators in the input cannot cause syntax errors.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", term))
+
+
+def ranked_sql(model, term, using="default"):
+    """
+    Return ``(sql, params)`` selecting ``(id, score)`` of the rows matching
+    ``term``, best match first. Scores are higher for better matches.
+    """
+    connection = connections[using]
+    fields = INDEXED_FIELDS[model]
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(model._meta.db_table)
+        vector = tsvector(connection, fields)
+        return (
+            f"SELECT id, ts_rank({vector}, query) AS score FROM {table}, "
+            f"websearch_to_tsquery('english', %s) query "
+            f"WHERE {vector} @@ query ORDER BY 2 DESC",
+            [term],
+        )
+    fts = fts_table(model)
+    return (
+        f"SELECT rowid AS id, -bm25({fts}) AS score FROM {fts} WHERE {fts} MATCH %s "
+        f"ORDER BY bm25({fts})",
+        [fts_query(term)],
+    )
+
+
+def matching(model, term, using="default"):
+    """Subquery of the ids of ``model`` rows matching ``term``, for ``pk__in``."""
+    sql, params = ranked_sql(model, term, using)
+    return RawSQL(f"SELECT id FROM ({sql}) ranked", params)
+
+
+def search(term, kinds=None, limit=20, using="default"):
+    """Return ``[(kind, id, score)]`` of the best matches across ``kinds``."""
+    if not re.search(r"\w", term):
+        return []
+    results = []
+    connection = connections[using]
+    for kind, (model, _) in SEARCHABLE.items():
+        if kinds and kind not in kinds or not available(model, using):
+            continue
+        sql, params = ranked_sql(model, term, using)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} LIMIT %s", [*params, limit])
+            results.extend((kind, pk, score) for pk, score in cursor.fetchall())
+    results.sort(key=lambda result: result[2], reverse=True)
+    return results[:limit]
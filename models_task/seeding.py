@@ -0,0 +1,153 @@
+"""
+Row builders and shard workers used by the ``populate_fake_data`` bulk mode.
+
+Every entity count is split into shards of ``batch_size`` rows. Each shard is
+generated by its own Faker instance seeded from ``(seed, label, index)``, so the
+rows a shard produces do not depend on how many worker processes ran it.
+"""
+
+import random
+import string
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from faker import Faker
+
+from models_task.models import Profile, Project, Task, Document, Comment
+
+User = get_user_model()
+
+
+def generate_username(fake):
+    suffix = "".join(fake.random.choices(string.digits, k=4))
+    return f"{fake.user_name()}{suffix}"
+
+
+def build_users(fake, count, password):
+    roles = [choice[0] for choice in Profile.ROLE_CHOICES]
+    for _ in range(count):
+        username = generate_username(fake)
+        user = User(
+            username=username,
+            email=f"{username}@example.com",
+            password=password,
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+        )
+        profile = Profile(
+            role=fake.random.choice(roles),
+            contact_number=f"+{fake.msisdn()[1:]}",
+        )
+        yield user, profile
+
+
+def build_projects(fake, count, user_ids, offset=0):
+    for i in range(offset, offset + count):
+        start_date = fake.date_between(start_date="-1y", end_date="today")
+        end_date = fake.date_between(
+            start_date=start_date, end_date=start_date + timedelta(days=180)
+        )
+        project = Project(
+            title=f"{fake.catch_phrase()} {i+1}",
+            description=fake.text(max_nb_chars=200),
+            start_date=start_date,
+            end_date=end_date,
+        )
+        members = fake.random.sample(
+            user_ids, fake.random.randint(min(2, len(user_ids)), min(5, len(user_ids)))
+        )
+        yield project, members
+
+
+def build_tasks(fake, count, project_members, offset=0):
+    statuses = [choice[0] for choice in Task.STATUS_CHOICES]
+    project_ids = list(project_members)
+    for i in range(offset, offset + count):
+        project_id = fake.random.choice(project_ids)
+        members = project_members[project_id]
+        yield Task(
+            title=f"{fake.sentence(nb_words=6)} {i+1}",
+            description=fake.text(max_nb_chars=200),
+            status=fake.random.choice(statuses),
+            project_id=project_id,
+            assignee_id=fake.random.choice(members) if members else None,
+        )
+
+
+def build_documents(fake, count, project_ids, offset=0):
+    for i in range(offset, offset + count):
+        yield Document(
+            name=f"{fake.file_name()} {i+1}",
+            description=fake.text(max_nb_chars=100),
+            file="dummy_file.pdf",
+            version=f"{fake.random.randint(1, 5)}.{fake.random.randint(0, 9)}",
+            project_id=fake.random.choice(project_ids),
+        )
+
+
+def build_comments(fake, count, user_ids, project_ids, task_ids):
+    for _ in range(count):
+        # Randomly choose between commenting on a task or project
+        if fake.random.choice([True, False]) and task_ids:
+            task_id, project_id = fake.random.choice(task_ids), None
+        else:
+            task_id, project_id = None, fake.random.choice(project_ids)
+        yield Comment(
+            text=fake.paragraph(),
+            author_id=fake.random.choice(user_ids),
+            task_id=task_id,
+            project_id=project_id,
+        )
+
+
+BUILDERS = {
+    "users": build_users,
+    "projects": build_projects,
+    "tasks": build_tasks,
+    "documents": build_documents,
+    "comments": build_comments,
+}
+
+# Builders putting the row number into titles, they take the shard's offset
+NUMBERED = {"projects", "tasks", "documents"}
+
+
+def shard_seed(seed, label, index):
+    # Seeding Random with a string is stable across processes, unlike hash()
+    return random.Random(f"{seed}:{label}:{index}").getrandbits(32)
+
+
+def plan_shards(label, count, batch_size, seed):
+    """Return ``(label, seed, offset, count)`` tuples covering ``count`` rows."""
+    return [
+        (label, shard_seed(seed, label, index), offset, min(batch_size, count - offset))
+        for index, offset in enumerate(range(0, count, batch_size))
+    ]
+
+
+# Per-process state, set by init_worker() before any shard is generated
+_worker = {}
+
+
+def init_worker(context, write):
+    _worker["fake"] = Faker()
+    _worker["context"] = context
+    _worker["write"] = write
+
+
+def generate_shard(shard):
+    """
+    Build the rows of one shard. When the worker is also a writer the rows are
+    inserted here and only their primary keys travel back to the parent.
+    """
+    label, seed, offset, count = shard
+    fake = _worker["fake"]
+    fake.seed_instance(seed)
+    numbering = {"offset": offset} if label in NUMBERED else {}
+    rows = list(BUILDERS[label](fake, count, **numbering, **_worker["context"]))
+    if not _worker["write"]:
+        return rows
+    with transaction.atomic():
+        type(rows[0]).objects.bulk_create(rows)
+    return [row.pk for row in rows]
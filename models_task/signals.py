@@ -0,0 +1,332 @@
+from collections import Counter
+
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import cache, thumbnails
+from .cache import invalidate
+from .models import (
+    Change,
+    Comment,
+    Profile,
+    Project,
+    ProjectTaskStats,
+    Task,
+    TaskQuerySet,
+    TaskTransition,
+    WorkItem,
+    suppress_task_stats,
+)
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_stats_key(sender, instance, using, update_fields=None, **kwargs):
+    instance._stats_key_before = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not TaskQuerySet.STATS_FIELDS.intersection(
+        update_fields
+    ):
+        return
+    loaded = getattr(instance, "_loaded_values", {})
+    if "project_id" in loaded and "status" in loaded:
+        instance._stats_key_before = (loaded["project_id"], loaded["status"])
+    else:
+        # Created by bulk_create() or loaded with deferred fields
+        instance._stats_key_before = (
+            Task._base_manager.using(using)
+            .filter(pk=instance.pk)
+            .values_list("project_id", "status")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Task)
+def update_task_stats_on_save(sender, instance, created, using, **kwargs):
+    key = (instance.project_id, instance.status)
+    before = getattr(instance, "_stats_key_before", None)
+    deltas = Counter()
+    if created:
+        deltas[key] += 1
+    elif before is not None and before != key:
+        deltas[before] -= 1
+        deltas[key] += 1
+    ProjectTaskStats.objects.db_manager(using).adjust(deltas)
+    instance._loaded_values = {"project_id": key[0], "status": key[1]}
+
+
+@receiver(post_delete, sender=Task)
+def update_task_stats_on_delete(sender, instance, using, **kwargs):
+    if suppress_task_stats.get():
+        return
+    loaded = getattr(instance, "_loaded_values", {})
+    key = (
+        loaded.get("project_id", instance.project_id),
+        loaded.get("status", instance.status),
+    )
+    ProjectTaskStats.objects.db_manager(using).adjust({key: -1})
+
+
+@receiver(post_save, sender=Task)
+def log_task_transition(sender, instance, created, using, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        before = None
+    else:
+        # Set by remember_task_stats_key, None when the status was not saved
+        key = getattr(instance, "_stats_key_before", None)
+        if key is None:
+            return
+        before = key[1]
+    TaskTransition.objects.db_manager(using).record(
+        [(instance.pk, instance.project_id, before, instance.status)]
+    )
+
+
+@receiver(post_save, sender=Task)
+def move_task_comments(sender, instance, created, using, raw=False, **kwargs):
+    before = getattr(instance, "_stats_key_before", None)
+    if created or raw or before is None or before[0] == instance.project_id:
+        return
+    # Task comments carry their task's project
+    comments = Comment.objects.using(using).filter(task=instance)
+    if comments.sync_projects():
+        invalidate(cache.comment.keys(comments.values_list("pk", flat=True)), using)
+
+
+# Work items
+
+
+@receiver(post_save, sender=Task)
+def refresh_task_work_item(sender, instance, using, raw=False, **kwargs):
+    if not raw:
+        WorkItem.objects.db_manager(using).refresh([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def refresh_comment_work_item(
+    sender, instance, using, raw=False, origin=None, **kwargs
+):
+    if not instance.task_id or raw:
+        return
+    # Comments deleted along with their task or project must not recreate
+    # the work item the deletion already removed
+    origin_model = getattr(origin, "model", type(origin))
+    if origin is not None and origin_model in (Task, Project):
+        return
+    WorkItem.objects.db_manager(using).refresh([instance.task_id])
+
+
+@receiver(post_save, sender=Project)
+def rename_work_items(sender, instance, created, using, raw=False, **kwargs):
+    if not created and not raw:
+        WorkItem.objects.db_manager(using).filter(project=instance).update(
+            project_title=instance.title
+        )
+
+
+@receiver(m2m_changed, sender=Project.team_members.through)
+def refresh_membership_work_items(
+    sender, instance, action, reverse, pk_set, using, **kwargs
+):
+    if action == "pre_clear" and reverse:
+        # pk_set is empty for clear(), remember the user's projects
+        instance._work_item_project_ids = list(
+            instance.projects.values_list("pk", flat=True)
+        )
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    manager = WorkItem.objects.db_manager(using)
+    if not reverse:
+        # pk_set holds users, None for clear()
+        manager.refresh_assignments([instance.pk], pk_set)
+    elif action == "post_clear":
+        project_ids = getattr(instance, "_work_item_project_ids", [])
+        manager.refresh_assignments(project_ids, [instance.pk])
+    else:
+        manager.refresh_assignments(pk_set, [instance.pk])
+
+
+# Change feed
+
+
+def log_change(instance, using, action):
+    if isinstance(instance, Task):
+        kind, project_id = "task", instance.project_id
+        data = {"status": instance.status, "title": instance.title}
+    elif isinstance(instance, Comment):
+        kind, project_id = "comment", instance.project_id
+        data = {"task": instance.task_id, "author": instance.author_id}
+    else:
+        kind, project_id = "project", instance.pk
+        data = {"title": instance.title}
+    Change.objects.db_manager(using).create(
+        kind=kind,
+        action=action,
+        object_id=instance.pk,
+        project_id=project_id,
+        data=data,
+    )
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Project)
+def log_saved(sender, instance, created, using, raw=False, **kwargs):
+    if not raw:
+        log_change(instance, using, "created" if created else "updated")
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Project)
+def log_deleted(sender, instance, using, **kwargs):
+    log_change(instance, using, "deleted")
+
+
+# Profile picture thumbnails
+
+
+@receiver(pre_save, sender=Profile)
+def reset_thumbnails(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "profile_picture" not in update_fields:
+        return
+    instance._picture_changed = (instance.profile_picture.name or None) != getattr(
+        instance, "_loaded_picture", None
+    )
+    if instance._picture_changed:
+        # Serve the new picture itself until its thumbnails exist
+        instance.profile_picture_hash = ""
+
+
+@receiver(post_save, sender=Profile)
+def schedule_thumbnails(sender, instance, using, **kwargs):
+    name = instance.profile_picture.name
+    if getattr(instance, "_picture_changed", False) and name:
+        thumbnails.schedule(instance.pk, name, using)
+    instance._loaded_picture = name or None
+    instance._picture_changed = False
+
+
+# Cache invalidation
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_cache(sender, instance, using, **kwargs):
+    project_ids = {instance.project_id}
+    before = getattr(instance, "_stats_key_before", None)
+    if before:
+        project_ids.add(before[0])
+    # Comments embed their task's title
+    comment_ids = (
+        Comment._base_manager.using(using)
+        .filter(task_id=instance.pk)
+        .values_list("pk", flat=True)
+    )
+    invalidate(
+        [
+            *cache.task.keys([instance.pk]),
+            *cache.task_comments.keys([instance.pk]),
+            *cache.comment.keys(comment_ids),
+            *cache.project_tasks.keys(project_ids),
+            # Projects embed their task counts
+            *cache.project.keys(project_ids),
+        ],
+        using,
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_cache(sender, instance, using, **kwargs):
+    invalidate(
+        [
+            *cache.comment.keys([instance.pk]),
+            *cache.task_comments.keys([instance.task_id]),
+            *cache.project_comments.keys([instance.project_id]),
+        ],
+        using,
+    )
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_cache(sender, instance, using, **kwargs):
+    # Tasks and comments embed the project title. Projects are rarely saved,
+    # so dropping the entries of everything under the project is affordable.
+    task_ids = list(
+        Task._base_manager.using(using)
+        .filter(project_id=instance.pk)
+        .values_list("pk", flat=True)
+    )
+    comment_ids = (
+        Comment._base_manager.using(using)
+        .filter(project_id=instance.pk)
+        .values_list("pk", flat=True)
+    )
+    invalidate(
+        [
+            *cache.project.keys([instance.pk]),
+            *cache.project_tasks.keys([instance.pk]),
+            *cache.project_comments.keys([instance.pk]),
+            *cache.task.keys(task_ids),
+            *cache.task_comments.keys(task_ids),
+            *cache.comment.keys(comment_ids),
+        ],
+        using,
+    )
+
+
+@receiver(m2m_changed, sender=Project.team_members.through)
+def invalidate_team_cache(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action == "pre_clear":
+        # pk_set is empty for clear(), remember whose memberships go
+        if reverse:
+            instance._cleared_project_ids = list(
+                instance.projects.values_list("pk", flat=True)
+            )
+        else:
+            instance._cleared_user_ids = list(
+                instance.team_members.values_list("pk", flat=True)
+            )
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        project_ids = [instance.pk]
+        if action == "post_clear":
+            user_ids = getattr(instance, "_cleared_user_ids", [])
+        else:
+            user_ids = pk_set
+    elif action == "post_clear":
+        project_ids = getattr(instance, "_cleared_project_ids", [])
+        user_ids = [instance.pk]
+    else:
+        project_ids = pk_set
+        user_ids = [instance.pk]
+    invalidate(
+        [*cache.project.keys(project_ids), *cache.user_projects.keys(user_ids)], using
+    )
+
+
+@receiver(pre_delete, sender=Project)
+def remember_team(sender, instance, using, **kwargs):
+    # The memberships are deleted without m2m_changed signals
+    instance._member_ids = list(
+        Project.team_members.through.objects.using(using)
+        .filter(project_id=instance.pk)
+        .values_list("user_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Project)
+def invalidate_member_cache(sender, instance, using, **kwargs):
+    invalidate(cache.user_projects.keys(getattr(instance, "_member_ids", [])), using)
@@ -0,0 +1,138 @@
+"""
+Content-addressed file storage for document uploads.
+
+Files are stored under the SHA-256 of their content, so uploading the same
+file again, e.g. as an unchanged new version of a document, reuses the
+stored blob instead of writing another copy. Content is streamed to a
+temporary file in chunks and hashed on the way. Uploads that arrive through
+``HashingUploadHandler`` are already hashed on disk and are only renamed.
+
+Blobs are shared between documents, so they are never deleted when a
+document is. ``prune_document_blobs`` removes the ones nothing refers to.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+CHUNK_SIZE = 64 * 1024
+
+
+class HashedTemporaryUploadedFile(TemporaryUploadedFile):
+    """An upload spooled to disk with the SHA-256 of its content."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        self.hash.update(data)
+        return self.file.write(data)
+
+    @property
+    def sha256(self):
+        return self.hash.hexdigest()
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Stream every upload straight to a temporary file, hashing it as the
+    chunks arrive, rather than buffering small uploads in memory.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = HashedTemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, "file"):
+            path = self.file.temporary_file_path()
+            try:
+                self.file.close()
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Store files as ``<upload_to>/<aa>/<sha256><ext>``, where ``aa`` are the
+    first two hex digits of the hash, keeping directories small.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from the content, an existing name holds the
+        # same bytes and is reused rather than suffixed
+        return name
+
+    def blob_name(self, name, digest):
+        directory, basename = os.path.split(name)
+        # Bounded so the name fits FileField's default max_length
+        extension = os.path.splitext(basename)[1].lower()[:12]
+        return os.path.join(directory, digest[:2], f"{digest}{extension}")
+
+    def _save(self, name, content):
+        digest = getattr(content, "sha256", None)
+        if digest is not None and hasattr(content, "temporary_file_path"):
+            source, owned = content.temporary_file_path(), False
+        else:
+            source, digest = self.spool(content)
+            owned = True
+
+        name = self.blob_name(name, digest)
+        path = self.path(name)
+        if os.path.exists(path):
+            if owned:
+                os.unlink(source)
+            # Reused blobs count as new for prune_document_blobs' grace period
+            os.utime(path)
+            return name
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(os.path.dirname(path), self.directory_permissions_mode)
+        if owned:
+            # Atomic, a concurrent save of the same content writes the same bytes
+            os.replace(source, path)
+        else:
+            file_move_safe(source, path, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+        return name
+
+    def spool(self, content):
+        """Copy ``content`` to a temporary file in chunks, return its path and hash."""
+        directory = self.path(".tmp")
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, "wb") as output:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    output.write(chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path, digest.hexdigest()
+
+
+def document_storage():
+    return ContentAddressedStorage()
@@ -1,3 +1,1716 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import cache as read_cache
+from . import (
+    archive,
+    benchmarks,
+    db,
+    deletion,
+    membership,
+    profiling,
+    reports,
+    search,
+    signals,
+    storage,
+    thumbnails,
+    transfer,
+)
+from .models import (
+    ArchivedComment,
+    ArchivedTask,
+    Change,
+    Comment,
+    Document,
+    Profile,
+    Project,
+    ProjectCycleStats,
+    ProjectTaskStats,
+    Task,
+    TaskTransition,
+    WorkItem,
+)
+from .paginator import ApproximateCountPaginator
+
+User = get_user_model()
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Changelist pages must run a fixed number of queries, whatever the rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        users = User.objects.bulk_create([User(username=f"user{i}") for i in range(10)])
+        Profile.objects.bulk_create(
+            [Profile(user=user) for user in [cls.admin, *users]]
+        )
+        projects = Project.objects.bulk_create(
+            [Project(title=f"Project {i}", start_date=date.today()) for i in range(10)]
+        )
+        tasks = Task.objects.bulk_create(
+            [
+                Task(
+                    title=f"Task {i}",
+                    project=projects[i % 10],
+                    assignee=users[i % 10],
+                )
+                for i in range(100)
+            ]
+        )
+        Comment.objects.bulk_create(
+            [
+                Comment(
+                    text=f"Comment {i}",
+                    author=users[i % 10],
+                    task=tasks[i] if i % 2 else None,
+                    project=None if i % 2 else projects[i % 10],
+                )
+                for i in range(100)
+            ]
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assertChangelistQueries(self, model, num, params=None):
+        url = reverse(f"admin:models_task_{model}_changelist")
+        # Warm up caches such as content types before counting
+        self.client.get(url, params)
+        with self.assertNumQueries(num):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_task_changelist(self):
+        response = self.assertChangelistQueries("task", 4)
+        self.assertEqual(len(response.context["cl"].result_list), 100)
+
+    def test_task_changelist_filtered_by_project(self):
+        project = Project.objects.first()
+        response = self.assertChangelistQueries(
+            "task", 5, {"project__id__exact": project.pk}
+        )
+        self.assertContains(response, project.title)
+
+    def test_comment_changelist(self):
+        response = self.assertChangelistQueries("comment", 4)
+        self.assertEqual(len(response.context["cl"].result_list), 100)
+
+    def test_profile_changelist(self):
+        response = self.assertChangelistQueries("profile", 5)
+        self.assertEqual(len(response.context["cl"].result_list), 11)
+
+
+class ApproximateCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        project = Project.objects.create(title="Project", start_date=date.today())
+        Task.objects.bulk_create(
+            [Task(title=f"Task {i}", project=project) for i in range(30)]
+        )
+
+    @override_settings(MODELS_TASK_EXACT_COUNT_THRESHOLD=100)
+    def test_exact_below_threshold(self):
+        for queryset in (Task.objects.filter(status="open"), Task.objects.all()):
+            paginator = ApproximateCountPaginator(queryset.order_by("pk"), 10)
+            # No statistics lookups for small tables
+            with self.assertNumQueries(1):
+                self.assertEqual(paginator.count, 30)
+
+    @override_settings(MODELS_TASK_EXACT_COUNT_THRESHOLD=10)
+    def test_unfiltered_uses_table_statistics(self):
+        read_cache.get_cache().clear()
+        queryset = Task.objects.order_by("pk")
+        Task.objects.filter(pk=queryset.first().pk).delete()
+        # Without statistics the exact count is cached instead
+        self.assertEqual(ApproximateCountPaginator(queryset, 10).count, 29)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Task._meta.db_table}")
+        Task.objects.filter(pk=queryset.first().pk).delete()
+        # Only as fresh as the last ANALYZE
+        self.assertEqual(ApproximateCountPaginator(queryset, 10).count, 29)
+
+    @override_settings(MODELS_TASK_EXACT_COUNT_THRESHOLD=10)
+    def test_filtered_count_is_cached(self):
+        read_cache.get_cache().clear()
+        queryset = Task.objects.filter(status="open").order_by("pk")
+        self.assertEqual(ApproximateCountPaginator(queryset, 10).count, 30)
+        Task.objects.filter(pk=queryset.first().pk).delete()
+        self.assertEqual(ApproximateCountPaginator(queryset, 10).count, 30)
+
+    @override_settings(
+        MODELS_TASK_EXACT_COUNT_THRESHOLD=10,
+        MODELS_TASK_CACHE="counts",
+        CACHES={
+            **settings.CACHES,
+            "counts": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "counts",
+            },
+        },
+    )
+    def test_count_uses_the_models_task_cache(self):
+        cache.clear()
+        queryset = Task.objects.filter(status="open").order_by("pk")
+        self.assertEqual(ApproximateCountPaginator(queryset, 10).count, 30)
+        Task.objects.filter(pk=queryset.first().pk).delete()
+        read_cache.get_cache().clear()
+        self.assertEqual(ApproximateCountPaginator(queryset, 10).count, 29)
+
+
+class ProjectTaskStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(title="A", start_date=date.today())
+        cls.other = Project.objects.create(title="B", start_date=date.today())
+
+    def assertStatsCorrect(self):
+        self.assertEqual(
+            ProjectTaskStats.objects.stored(), ProjectTaskStats.objects.expected()
+        )
+
+    def test_save_and_delete(self):
+        task = Task.objects.create(title="T", project=self.project)
+        self.assertEqual(self.project.task_status_counts(), {"open": 1})
+        task = Task.objects.get(pk=task.pk)
+        task.status = "closed"
+        task.save()
+        task.project = self.other
+        task.save(update_fields=["project"])
+        self.assertEqual(self.project.task_status_counts(), {})
+        self.assertEqual(self.other.task_status_counts(), {"closed": 1})
+        task.delete()
+        self.assertStatsCorrect()
+
+    def test_bulk_paths(self):
+        tasks = Task.objects.bulk_create(
+            [Task(title=f"T{i}", project=self.project) for i in range(10)]
+        )
+        self.assertEqual(self.project.task_status_counts(), {"open": 10})
+        Task.objects.filter(pk__in=[t.pk for t in tasks[:4]]).update(status="working")
+        Task.objects.filter(pk=tasks[4].pk).update(project=self.other)
+        for task in tasks[5:7]:
+            task.status = "closed"
+        Task.objects.bulk_update(tasks[5:7], ["status"])
+        self.assertEqual(
+            self.project.task_status_counts(), {"open": 3, "working": 4, "closed": 2}
+        )
+        Task.objects.bulk_create(
+            [Task(pk=tasks[0].pk, title="T0", project=self.other, status="review")],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["project", "status"],
+        )
+        # Neither status nor project is overwritten, the counts stay
+        Task.objects.bulk_create(
+            [Task(pk=tasks[1].pk, title="T1", project=self.other, status="closed")],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["title"],
+        )
+        self.assertStatsCorrect()
+        Task.objects.filter(status="closed").delete()
+        self.assertStatsCorrect()
+
+    def test_rebuild(self):
+        Task.objects.create(title="T", project=self.project)
+        ProjectTaskStats.objects.all().delete()
+        ProjectTaskStats.objects.rebuild()
+        self.assertEqual(self.project.task_status_counts(), {"open": 1})
+
+
+class KeysetAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("reader", password="pw")
+        project = Project.objects.create(title="P", start_date=date.today())
+        project.team_members.add(cls.user)
+        tasks = Task.objects.bulk_create(
+            [Task(title=f"Task {i}", project=project) for i in range(25)]
+        )
+        # Identical timestamps exercise the id tie-breaker
+        Task.objects.filter(pk__in=[task.pk for task in tasks[5:15]]).update(
+            created_at=tasks[5].created_at
+        )
+        Comment.objects.bulk_create(
+            [Comment(text=f"C{i}", author=cls.user, task=tasks[0]) for i in range(7)]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def fetch(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join(response.streaming_content))
+
+    def walk(self, name, limit):
+        url = reverse(f"models_task:{name}-list")
+        ids, params = [], {"limit": limit}
+        while True:
+            page = self.fetch(url, params)
+            ids.extend(item["id"] for item in page["results"])
+            if not page["next"]:
+                return ids
+            params["cursor"] = page["next"]
+
+    def test_pages_cover_every_row_once(self):
+        ids = self.walk("task", 4)
+        self.assertEqual(sorted(ids), sorted(Task.objects.values_list("pk", flat=True)))
+        self.assertEqual(len(ids), len(set(ids)))
+        ids = self.walk("comment", 3)
+        self.assertEqual(
+            ids,
+            list(
+                Comment.objects.order_by("-created_at", "-id").values_list(
+                    "pk", flat=True
+                )
+            ),
+        )
+
+    def test_deep_page_costs_one_query(self):
+        url = reverse("models_task:task-list")
+        first = self.fetch(url, {"limit": 20})
+        # Session and user lookups, then a single query for the page
+        with self.assertNumQueries(3):
+            page = self.fetch(url, {"limit": 20, "cursor": first["next"]})
+        self.assertEqual(len(page["results"]), 5)
+        self.assertIsNone(page["next"])
+
+    def test_project_includes_members_and_counts(self):
+        page = self.fetch(reverse("models_task:project-list"))
+        self.assertEqual(page["results"][0]["team_members"], ["reader"])
+        self.assertEqual(page["results"][0]["task_counts"], {"open": 25})
+
+    def test_invalid_cursor_and_anonymous(self):
+        url = reverse("models_task:task-list")
+        self.assertEqual(self.client.get(url, {"cursor": "nope"}).status_code, 400)
+        for values in (
+            [[1], 1],
+            [{"a": 1}, "x"],
+            [1, [2]],
+            ["2026-01-01T00:00:00+00:00", None],
+        ):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            for name in ("task", "comment"):
+                response = self.client.get(
+                    reverse(f"models_task:{name}-list"), {"cursor": cursor}
+                )
+                self.assertEqual(response.status_code, 400, (name, values))
+        # Decodes, but None cannot be compared in the keyset filter
+        cursor = base64.urlsafe_b64encode(b"[null, null]").decode()
+        project = Project.objects.get()
+        for name in ("project-tasks", "project-comments", "async-project-tasks"):
+            response = self.client.get(
+                reverse(f"models_task:{name}", args=[project.pk]), {"cursor": cursor}
+            )
+            self.assertEqual(response.status_code, 400, name)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    async def test_async_views_match(self):
+        await self.async_client.aforce_login(self.user)
+        for name, params in (("task", {"limit": 7}), ("project", {})):
+            expected = await sync_to_async(self.fetch)(
+                reverse(f"models_task:{name}-list"), params
+            )
+            response = await self.async_client.get(
+                reverse(f"models_task:async-{name}-list"), params
+            )
+            body = b"".join([chunk async for chunk in response.streaming_content])
+            self.assertEqual(json.loads(body), expected)
+
+        pk = expected["results"][0]["id"]
+        response = await self.async_client.get(
+            reverse("models_task:async-project-detail", args=[pk])
+        )
+        self.assertEqual(response.json()["task_counts"], {"open": 25})
+        response = await self.async_client.get(
+            reverse("models_task:async-project-tasks", args=[pk])
+        )
+        self.assertEqual(len(response.json()["results"]), 25)
+
+
+class ReadCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("reader")
+        cls.project = Project.objects.create(title="P", start_date=date.today())
+        cls.task = Task.objects.create(title="T", project=cls.project)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hits_until_invalidated(self):
+        # The page, then whether the task of the empty page exists
+        with self.assertNumQueries(2):
+            read_cache.task_comments.get(self.task.pk)
+            read_cache.task_comments.get(self.task.pk)
+        self.assertGreaterEqual(
+            read_cache.CachedRead.stats()["task_comments"]["hits"], 1
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(text="Hi", author=self.user, task=self.task)
+        self.assertEqual(len(read_cache.task_comments.get(self.task.pk)["results"]), 1)
+
+    def test_lists_cache_their_first_page(self):
+        Comment.objects.bulk_create(
+            [Comment(text=f"C{i}", author=self.user, task=self.task) for i in range(60)]
+        )
+        self.project.team_members.add(self.user)
+        self.client.force_login(self.user)
+        url = reverse("models_task:task-comments", args=[self.task.pk])
+        first = self.client.get(url).json()
+        self.assertEqual(len(first["results"]), 50)
+        response = self.client.get(url, {"cursor": first["next"]})
+        rest = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(rest["results"]), 10)
+        self.assertIsNone(rest["next"])
+        ids = [item["id"] for item in first["results"] + rest["results"]]
+        self.assertEqual(len(set(ids)), 60)
+
+        url = reverse("models_task:project-tasks", args=[self.project.pk + 1])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_task_save_refreshes_comments(self):
+        comment = Comment.objects.create(text="Hi", author=self.user, task=self.task)
+        read_cache.comment.get(comment.pk)
+        read_cache.task_comments.get(self.task.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.title = "Renamed"
+            self.task.save()
+        self.assertEqual(read_cache.comment.get(comment.pk)["task_title"], "Renamed")
+        page = read_cache.task_comments.get(self.task.pk)
+        self.assertEqual(page["results"][0]["task_title"], "Renamed")
+
+    def test_task_save_refreshes_project(self):
+        self.assertEqual(
+            read_cache.project.get(self.project.pk)["task_counts"], {"open": 1}
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.status = "closed"
+            self.task.save()
+        self.assertEqual(
+            read_cache.project.get(self.project.pk)["task_counts"], {"closed": 1}
+        )
+        self.assertEqual(read_cache.task.get(self.task.pk)["status"], "closed")
+
+    def test_team_membership_refreshes_project(self):
+        self.assertEqual(read_cache.project.get(self.project.pk)["team_members"], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.projects.add(self.project)
+        self.assertEqual(
+            read_cache.project.get(self.project.pk)["team_members"], ["reader"]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.projects.clear()
+        self.assertEqual(read_cache.project.get(self.project.pk)["team_members"], [])
+
+
+class SQLitePragmaTests(TestCase):
+    def pragmas(self, *names):
+        # A fresh connection, as a new thread or worker process opens one
+        new = connections.create_connection("default")
+        try:
+            with new.cursor() as cursor:
+                values = {}
+                for name in names:
+                    cursor.execute(f"PRAGMA {name}")
+                    values[name] = cursor.fetchone()[0]
+                return values
+        finally:
+            new.close()
+
+    def test_applied_on_connect(self):
+        # The in-memory test database cannot use WAL, and SQLite reports
+        # synchronous and temp_store as numbers
+        self.assertEqual(
+            self.pragmas("synchronous", "busy_timeout", "cache_size", "temp_store"),
+            {
+                "synchronous": 1,
+                "busy_timeout": db.DEFAULT_SQLITE_PRAGMAS["busy_timeout"],
+                "cache_size": db.DEFAULT_SQLITE_PRAGMAS["cache_size"],
+                "temp_store": 2,
+            },
+        )
+        with override_settings(MODELS_TASK_SQLITE_PRAGMAS={"busy_timeout": 1234}):
+            self.assertEqual(self.pragmas("busy_timeout"), {"busy_timeout": 1234})
+
+
+class QueryProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(
+            MODELS_TASK_PROFILING_DIR=directory.name,
+            MODELS_TASK_PROFILING_FLUSH_INTERVAL=0,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        profiling.reset()
+        cache.clear()
+        self.admin = User.objects.create_superuser("admin", "a@example.com", "pw")
+        self.project = Project.objects.create(title="P", start_date=date.today())
+        self.project.team_members.add(self.admin)
+        self.client.force_login(self.admin)
+
+    def test_recorder_installed_when_enabled(self):
+        self.assertTrue(profiling.enabled())
+        self.assertIn(profiling.record_queries, connection.execute_wrappers)
+        with override_settings(MODELS_TASK_PROFILING_SAMPLE_RATE=0):
+            self.assertFalse(profiling.enabled())
+        middleware = [
+            name for name in settings.MIDDLEWARE if "QueryProfiling" not in name
+        ]
+        with override_settings(MIDDLEWARE=middleware):
+            self.assertFalse(profiling.enabled())
+
+    def test_records_streamed_requests(self):
+        Task.objects.create(title="T", project=self.project)
+        response = self.client.get(reverse("models_task:task-list"))
+        b"".join(response.streaming_content)
+
+        report = self.client.get(reverse("models_task:profiling-report")).json()
+        row = next(r for r in report["routes"] if r["route"] == "GET /api/tasks/")
+        self.assertEqual(row["requests"], 1)
+        # Session, user, team memberships and the page query
+        self.assertEqual(row["queries_p50"], 4)
+        self.assertGreater(row["wall_p99"], 0)
+
+    async def test_records_async_views(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse("models_task:async-task-list"))
+        b"".join([chunk async for chunk in response.streaming_content])
+
+        report = await sync_to_async(profiling.report)()
+        row = next(r for r in report if r["route"] == "GET /api/async/tasks/")
+        # Queries run in sync_to_async() threads are attributed too
+        self.assertEqual(row["queries_p50"], 4)
+
+    def test_flags_duplicate_queries(self):
+        recorder = profiling.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for pk in (1, 2, 3):
+                list(Project.objects.filter(pk__in=[pk, pk + 1]))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(list(recorder.duplicates.values()), [2])
+
+
+class FullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "a@example.com", "pw")
+        cls.project = Project.objects.create(title="Apollo", start_date=date.today())
+        cls.project.team_members.add(cls.admin)
+        cls.tasks = Task.objects.bulk_create(
+            [
+                Task(title="Fix login redirect", project=cls.project),
+                Task(title="Write docs", description="Login flow", project=cls.project),
+                Task(title="Unrelated", project=cls.project),
+            ]
+        )
+
+    def setUp(self):
+        if not search.available(Task):
+            self.skipTest("No full-text index on this database")
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_index_follows_bulk_writes(self):
+        kinds = ["task"]
+        self.assertEqual(
+            {pk for _, pk, _ in search.search("logi", kinds)},
+            {self.tasks[0].pk, self.tasks[1].pk},
+        )
+        Task.objects.filter(pk=self.tasks[2].pk).update(title="Login audit")
+        Task.objects.filter(pk=self.tasks[0].pk).delete()
+        self.assertEqual(
+            {pk for _, pk, _ in search.search("login", kinds)},
+            {self.tasks[1].pk, self.tasks[2].pk},
+        )
+        # FTS5 syntax in user input is matched literally
+        self.assertEqual(search.search('"login" OR (', kinds), [])
+
+    def test_api_and_admin(self):
+        results = self.client.get(reverse("models_task:search"), {"q": "login"})
+        self.assertEqual(len(results.json()["results"]), 2)
+
+        url = reverse("admin:models_task_task_changelist")
+        response = self.client.get(url, {"q": "redirect"})
+        self.assertEqual(response.context["cl"].result_count, 1)
+        # Related fields are still searched
+        response = self.client.get(url, {"q": "apoll"})
+        self.assertEqual(response.context["cl"].result_count, 3)
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("author")
+        cls.project = Project.objects.create(title="P", start_date=date.today())
+        cls.old, cls.recent, cls.working = Task.objects.bulk_create(
+            [
+                Task(title="Old", status="closed", project=cls.project),
+                Task(title="Recent", status="completed", project=cls.project),
+                Task(title="Working", status="working", project=cls.project),
+            ]
+        )
+        cls.cutoff = timezone.now() - timedelta(days=30)
+        Task.objects.exclude(pk=cls.recent.pk).update(
+            updated_at=cls.cutoff - timedelta(days=1)
+        )
+        Comment.objects.bulk_create(
+            [Comment(text=f"C{i}", author=cls.user, task=cls.old) for i in range(3)]
+        )
+
+    def test_archive_and_restore(self):
+        old = Task.objects.get(pk=self.old.pk)
+        self.assertEqual(
+            list(archive.archive_tasks(self.cutoff, batch_size=1)), [(1, 3)]
+        )
+        self.assertEqual(
+            set(Task.objects.values_list("title", flat=True)), {"Recent", "Working"}
+        )
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(self.project.task_status_counts().get("closed"), None)
+        rows = archive.task_rows("id", project_id=self.project.pk)
+        self.assertEqual(
+            {row["id"]: row["archived"] for row in rows},
+            {self.old.pk: True, self.recent.pk: False, self.working.pk: False},
+        )
+        self.assertEqual(archive.comment_rows(task_id=self.old.pk).count(), 3)
+
+        self.assertEqual(archive.restore_tasks([self.old.pk]), (1, 3))
+        restored = Task.objects.get(pk=self.old.pk)
+        self.assertEqual(
+            (restored.created_at, restored.updated_at),
+            (old.created_at, old.updated_at),
+        )
+        self.assertEqual(self.old.comments.count(), 3)
+        self.assertEqual(self.project.task_status_counts()["closed"], 1)
+        self.assertFalse(ArchivedComment.objects.exists())
+
+    def test_batch_queries_do_not_grow_with_rows(self):
+        many = Task.objects.create(title="Many", status="closed", project=self.project)
+        Comment.objects.bulk_create(
+            [Comment(text=f"M{i}", author=self.user, task=many) for i in range(20)]
+        )
+        counts = []
+        for pk in (self.old.pk, many.pk):
+            with CaptureQueriesContext(connection) as queries:
+                archive.archive_task_batch([pk])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(
+            ProjectTaskStats.objects.stored(), ProjectTaskStats.objects.expected()
+        )
+        self.assertEqual(
+            Change.objects.filter(kind="comment", action="deleted").count(), 23
+        )
+
+
+class ProjectDeletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("member")
+        cls.big = Project.objects.create(title="Big", start_date=date.today())
+        cls.other = Project.objects.create(title="Other", start_date=date.today())
+        cls.big.team_members.add(cls.user)
+        cls.other.team_members.add(cls.user)
+        tasks = Task.objects.bulk_create(
+            [Task(title=f"T{i}", project=cls.big, assignee=cls.user) for i in range(5)]
+        )
+        cls.kept = Task.objects.create(
+            title="Kept", project=cls.other, assignee=cls.user
+        )
+        Comment.objects.bulk_create(
+            [Comment(text="On task", author=cls.user, task=task) for task in tasks]
+            + [Comment(text="On project", author=cls.user, project=cls.big)]
+        )
+        Document.objects.create(name="D", file="d.pdf", version="1", project=cls.big)
+        now = timezone.now()
+        archived = ArchivedTask.objects.create(
+            id=10_000,
+            title="A",
+            status="closed",
+            project=cls.big,
+            created_at=now,
+            updated_at=now,
+        )
+        ArchivedComment.objects.create(
+            id=10_000,
+            text="A",
+            author=cls.user,
+            task=archived,
+            project=cls.big,
+            created_at=now,
+            updated_at=now,
+        )
+        # Archived before comments had to have a project
+        ArchivedComment.objects.create(
+            id=10_001,
+            text="B",
+            author=cls.user,
+            task=archived,
+            created_at=now,
+            updated_at=now,
+        )
+
+    def test_delete_project(self):
+        totals = Counter()
+        for label, count in deletion.delete_project(self.big.pk, batch_size=2):
+            totals[label] += count
+        self.assertEqual(
+            totals,
+            {
+                "comments": 6,
+                "tasks": 5,
+                "documents": 1,
+                "archived comments": 2,
+                "archived tasks": 1,
+                "projects": 1,
+            },
+        )
+        self.assertFalse(Project.objects.filter(pk=self.big.pk).exists())
+        self.assertEqual(list(Task.objects.values_list("title", flat=True)), ["Kept"])
+        self.assertEqual(WorkItem.objects.get().last_comment_text, "")
+        self.assertEqual(WorkItem.objects.verify(), [])
+        self.assertEqual(
+            ProjectTaskStats.objects.stored(), ProjectTaskStats.objects.expected()
+        )
+        self.assertEqual(
+            Change.objects.filter(kind="task", action="deleted").count(), 5
+        )
+
+    @override_settings(MODELS_TASK_BACKGROUND_DELETION=False)
+    def test_admin_action(self):
+        admin_user = User.objects.create_superuser("admin", password="x")
+        self.client.force_login(admin_user)
+        url = reverse("admin:models_task_project_changelist")
+        data = {"action": "delete_in_batches", "_selected_action": [self.big.pk]}
+        response = self.client.post(url, data)
+        self.assertContains(response, "Big: 5 tasks")
+        self.assertTrue(Project.objects.filter(pk=self.big.pk).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {**data, "post": "yes"})
+        self.assertFalse(Project.objects.filter(pk=self.big.pk).exists())
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_resume_pending(self):
+        # A restart before the background thread ran drops the callback
+        with self.captureOnCommitCallbacks(execute=False):
+            deletion.schedule([self.big.pk])
+        self.assertEqual(deletion.pending(), [self.big.pk])
+
+        call_command("delete_projects", pending=True, stdout=io.StringIO())
+        self.assertFalse(Project.objects.filter(pk=self.big.pk).exists())
+        self.assertEqual(deletion.pending(), [])
+
+
+class SeedingTests(TestCase):
+    def populate(self, workers, seed=7):
+        call_command(
+            "populate_fake_data",
+            users=12,
+            projects=6,
+            tasks=25,
+            documents=7,
+            comments=30,
+            batch_size=4,
+            workers=workers,
+            seed=seed,
+            stdout=io.StringIO(),
+        )
+        # Primary keys depend on the run, the contents must not
+        contents = {
+            "users": sorted(
+                User.objects.values_list(
+                    "username", "email", "first_name", "profile__role"
+                )
+            ),
+            "projects": sorted(
+                (project.title, project.description, project.start_date)
+                + tuple(sorted(project.team_members.values_list("username", flat=True)))
+                for project in Project.objects.all()
+            ),
+            "tasks": sorted(
+                Task.objects.values_list(
+                    "title", "status", "project__title", "assignee__username"
+                )
+            ),
+            "documents": sorted(
+                Document.objects.values_list("name", "version", "project__title")
+            ),
+            "comments": sorted(
+                Comment.objects.values_list(
+                    "text", "author__username", "task__title", "project__title"
+                )
+            ),
+        }
+        Project.objects.all().delete()
+        User.objects.all().delete()
+        return contents
+
+    def test_workers_do_not_change_the_output(self):
+        serial = self.populate(1)
+        self.assertEqual(
+            {name: len(rows) for name, rows in serial.items()},
+            {"users": 12, "projects": 6, "tasks": 25, "documents": 7, "comments": 30},
+        )
+        self.assertEqual(self.populate(2), serial)
+        self.assertNotEqual(self.populate(1, seed=8), serial)
+
+    def test_small_batches_keep_references_valid(self):
+        call_command(
+            "populate_fake_data",
+            users=7,
+            projects=5,
+            tasks=23,
+            documents=5,
+            comments=31,
+            batch_size=3,
+            seed=7,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(
+            [
+                model.objects.count()
+                for model in (User, Profile, Project, Task, Document, Comment)
+            ],
+            [7, 7, 5, 23, 5, 31],
+        )
+        # Raises IntegrityError for any foreign key to a missing row
+        connection.check_constraints(
+            table_names=[
+                model._meta.db_table
+                for model in (Profile, Task, Document, Comment, membership.Membership)
+            ]
+        )
+        self.assertFalse(Task.objects.filter(project=None).exists())
+        self.assertFalse(Document.objects.filter(project=None).exists())
+        self.assertFalse(
+            Comment.objects.exclude(task=None)
+            .exclude(project=F("task__project"))
+            .exists()
+        )
+        self.assertFalse(
+            Comment.objects.exclude(parent=None)
+            .exclude(task=F("parent__task"))
+            .exists()
+        )
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user("alice")
+        cls.bob = User.objects.create_user("bob")
+        cls.project = Project.objects.create(title="P", start_date=date.today())
+        cls.project.team_members.add(cls.alice)
+        cls.task = Task.objects.create(
+            title="T", project=cls.project, assignee=cls.alice
+        )
+        Comment.objects.create(text="C", author=cls.bob, task=cls.task)
+
+    def setUp(self):
+        cache.clear()
+
+    def snapshot(self):
+        return {
+            name: list(transfer.export_rows(transfer.SPECS[name], 100))
+            for name in ("projects", "tasks", "comments")
+        }
+
+    def test_round_trip(self):
+        expected = self.snapshot()
+        for fmt in transfer.FORMATS:
+            with tempfile.TemporaryDirectory() as directory:
+                for name in expected:
+                    call_command(
+                        "export_data",
+                        name,
+                        f"{directory}/{name}.{fmt}",
+                        stderr=io.StringIO(),
+                    )
+                Task.objects.update(title="Changed", assignee=self.bob)
+                Comment.objects.update(text="Changed")
+                self.project.team_members.set([self.bob])
+                for name in expected:
+                    call_command(
+                        "import_data",
+                        name,
+                        f"{directory}/{name}.{fmt}",
+                        stdout=io.StringIO(),
+                    )
+            self.assertEqual(self.snapshot(), expected, fmt)
+
+    def test_import_refreshes_memberships(self):
+        self.assertEqual(membership.project_ids(self.alice), {self.project.pk})
+        self.assertTrue(WorkItem.objects.filter(user=self.alice).exists())
+        rows = [
+            {
+                "id": self.project.pk,
+                "title": "P",
+                "start_date": str(date.today()),
+                "team_members": ["bob"],
+            }
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer.import_batch(transfer.SPECS["projects"], rows)
+        self.assertEqual(read_cache.user_projects.get(self.alice.pk), [])
+        self.assertEqual(read_cache.user_projects.get(self.bob.pk), [self.project.pk])
+        self.assertEqual(
+            read_cache.project.get(self.project.pk)["team_members"], ["bob"]
+        )
+        # Alice is off the team, her assigned task no longer in her work queue
+        self.assertFalse(WorkItem.objects.filter(user=self.alice).exists())
+        self.assertEqual(WorkItem.objects.verify(), [])
+
+
+class MembershipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f"user{i}") for i in range(3)]
+        cls.projects = [
+            Project.objects.create(title=f"P{i}", start_date=date.today())
+            for i in range(3)
+        ]
+        cls.projects[0].team_members.add(cls.users[0])
+        cls.task = Task.objects.create(
+            title="T", project=cls.projects[1], assignee=cls.users[1]
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def lookup(self, user):
+        # A fresh object, as a new request would load
+        return membership.project_ids(User.objects.get(pk=user.pk))
+
+    def test_cached_until_changed(self):
+        user = User.objects.get(pk=self.users[0].pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(membership.project_ids(user), {self.projects[0].pk})
+            self.assertTrue(membership.is_member(user, self.projects[0]))
+            self.assertFalse(membership.is_member(user, self.projects[1].pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects[1].team_members.add(self.users[0])
+        self.assertEqual(len(self.lookup(self.users[0])), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects[1].team_members.clear()
+        self.assertEqual(len(self.lookup(self.users[0])), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects[0].delete()
+        self.assertEqual(self.lookup(self.users[0]), set())
+
+    def test_bulk_add_and_remove(self):
+        pks = [project.pk for project in self.projects]
+        user_pks = [user.pk for user in self.users]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(membership.add(pks, user_pks), 8)
+        self.assertEqual(self.lookup(self.users[2]), set(pks))
+        self.assertTrue(WorkItem.objects.filter(task=self.task).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(membership.remove(pks[1:], user_pks[1:]), 4)
+        self.assertEqual(self.lookup(self.users[1]), {pks[0]})
+        self.assertFalse(WorkItem.objects.exists())
+
+    def other_team_urls(self, prefix=""):
+        comment = Comment.objects.create(text="C", author=self.users[1], task=self.task)
+        document = Document.objects.create(
+            name="D", file="d.pdf", version="1", project=self.projects[1]
+        )
+        details = [
+            ("task-detail", self.task.pk),
+            ("comment-detail", comment.pk),
+            ("task-comments", self.task.pk),
+            ("project-tasks", self.projects[1].pk),
+            ("project-comments", self.projects[1].pk),
+        ]
+        if not prefix:
+            details += [
+                ("comment-thread", comment.pk),
+                ("document-download", document.pk),
+            ]
+        return (
+            [reverse(f"models_task:{prefix}{name}", args=[pk]) for name, pk in details],
+            [
+                reverse(f"models_task:{prefix}{name}-list")
+                for name in ("task", "comment")
+            ],
+        )
+
+    def test_views_hide_other_teams(self):
+        details, lists = self.other_team_urls()
+        self.client.force_login(self.users[0])
+        for url in details:
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+        for url in lists:
+            response = self.client.get(url)
+            page = json.loads(b"".join(response.streaming_content))
+            self.assertEqual(page["results"], [], url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.add([self.projects[1].pk], [self.users[0].pk])
+        self.assertEqual(self.client.get(details[0]).status_code, 200)
+
+    async def test_async_views_hide_other_teams(self):
+        details, lists = await sync_to_async(self.other_team_urls)("async-")
+        await self.async_client.aforce_login(self.users[0])
+        for url in details:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 404, url)
+        for url in lists:
+            response = await self.async_client.get(url)
+            content = b"".join([chunk async for chunk in response.streaming_content])
+            self.assertEqual(json.loads(content)["results"], [], url)
+
+    def test_admin_action(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        url = reverse("admin:models_task_project_changelist")
+        data = {
+            "action": "change_team",
+            "_selected_action": [project.pk for project in self.projects],
+            "operation": "add",
+            "usernames": "user1, user2\nuser1",
+        }
+        response = self.client.post(url, data)
+        self.assertContains(response, "3 selected projects")
+        response = self.client.post(url, {**data, "usernames": "nobody", "apply": 1})
+        self.assertContains(response, "Unknown usernames: nobody")
+
+        self.client.post(url, {**data, "apply": 1})
+        self.assertEqual(Project.team_members.through.objects.count(), 7)
+
+
+class TaskTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("member")
+        cls.project = Project.objects.create(title="P", start_date=date.today())
+
+    def history(self, task):
+        return list(
+            TaskTransition.objects.filter(task_id=task.pk)
+            .order_by("pk")
+            .values_list("from_status", "to_status")
+        )
+
+    def test_log_and_rollups(self):
+        task = Task.objects.create(title="T", project=self.project)
+        task.status = "working"
+        task.save()
+        task.title = "Renamed"
+        task.save()
+        hours_ago = timezone.now() - timedelta(hours=3)
+        TaskTransition.objects.filter(task_id=task.pk, from_status=0).update(
+            at=hours_ago - timedelta(hours=1)
+        )
+        TaskTransition.objects.filter(task_id=task.pk, from_status__gt=0).update(
+            at=hours_ago
+        )
+        Task.objects.filter(pk=task.pk).update(status="completed")
+        codes = [TaskTransition.code(s) for s in (None, "open", "working", "completed")]
+        self.assertEqual(
+            self.history(task),
+            [(codes[0], codes[1]), (codes[1], codes[2]), (codes[2], codes[3])],
+        )
+
+        summary = ProjectCycleStats.objects.summary()[self.project.pk]
+        self.assertEqual(summary["completed"], 1)
+        self.assertAlmostEqual(summary["mean_cycle_hours"], 3, places=2)
+        self.assertAlmostEqual(summary["mean_lead_hours"], 4, places=2)
+        self.assertEqual(
+            ProjectCycleStats.objects.stored(), ProjectCycleStats.objects.expected()
+        )
+
+        self.client.force_login(self.user)
+        url = reverse("models_task:project-cycle-stats", args=[self.project.pk])
+        data = self.client.get(url, {"days": 7}).json()
+        self.assertEqual(data["summary"]["completed"], 1)
+        self.assertEqual(len(data["daily"]), 1)
+
+    def test_every_status_has_a_code(self):
+        statuses = {status for status, _ in Task.STATUS_CHOICES}
+        self.assertEqual(set(TaskTransition.CODES), statuses | {None})
+        self.assertEqual(len(TaskTransition.STATUSES), len(TaskTransition.CODES))
+
+    def test_bulk_paths(self):
+        tasks = Task.objects.bulk_create(
+            [Task(title=f"T{i}", project=self.project) for i in range(3)]
+        )
+        Task.objects.bulk_update([Task(pk=tasks[0].pk, status="closed")], ["status"])
+        Task.objects.filter(pk__in=[t.pk for t in tasks]).update(status="closed")
+        self.assertEqual(TaskTransition.objects.count(), 6)
+        Task.objects.bulk_create(
+            [Task(pk=tasks[1].pk, title="T1", project=self.project, status="open")],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["title"],
+        )
+        self.assertEqual(TaskTransition.objects.count(), 6)
+        self.assertEqual(len(self.history(tasks[0])), 2)
+        # Created as completed, never worked on here
+        Task.objects.create(title="Done", project=self.project, status="completed")
+        self.assertFalse(ProjectCycleStats.objects.exists())
+
+        Task.objects.filter(pk=tasks[0].pk).update(
+            updated_at=timezone.now() - timedelta(days=2)
+        )
+        list(archive.archive_tasks(timezone.now() - timedelta(days=1)))
+        archive.restore_tasks([tasks[0].pk])
+        self.assertEqual(len(self.history(tasks[0])), 2)
+
+
+class ThreadedCommentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("author")
+        cls.project = Project.objects.create(title="P", start_date=date.today())
+        cls.project.team_members.add(cls.user)
+        cls.task = Task.objects.create(title="T", project=cls.project)
+
+    def setUp(self):
+        cache.clear()
+
+    def reply(self, parent, text):
+        return Comment.objects.create(text=text, author=self.user, parent=parent)
+
+    def test_thread_order(self):
+        first = Comment.objects.create(text="1", author=self.user, task=self.task)
+        second = Comment.objects.create(text="2", author=self.user, task=self.task)
+        first_reply = self.reply(first, "1.1")
+        self.reply(first_reply, "1.1.1")
+        self.reply(first, "1.2")
+        self.reply(second, "2.1")
+        self.assertEqual(first_reply.task, self.task)
+        self.assertEqual(first_reply.ancestor_ids(), [first.pk])
+
+        with self.assertNumQueries(1):
+            texts = [c.text for c in Comment.objects.thread(first_reply)]
+        self.assertEqual(texts, ["1", "1.1", "1.1.1", "1.2"])
+        self.assertEqual(
+            [c.text for c in Comment.objects.subtree(first_reply)], ["1.1", "1.1.1"]
+        )
+        self.assertEqual(
+            [c.text for c in self.task.comments.threaded()],
+            ["1", "1.1", "1.1.1", "1.2", "2", "2.1"],
+        )
+
+        self.client.force_login(self.user)
+        url = reverse("models_task:comment-thread", args=[first.pk])
+        results = self.client.get(url).json()["results"]
+        self.assertEqual([item["depth"] for item in results], [0, 1, 2, 1])
+        self.assertEqual(results[1]["parent"], first.pk)
+
+    def test_bulk_create_paths(self):
+        root = Comment.objects.create(text="root", author=self.user, task=self.task)
+        comments = Comment.objects.bulk_create(
+            [
+                Comment(text="reply", author=self.user, task=self.task, parent=root),
+                Comment(text="other", author=self.user, task=self.task),
+            ]
+        )
+        reply, other = Comment.objects.filter(pk__in=[c.pk for c in comments]).order_by(
+            "pk"
+        )
+        self.assertEqual(reply.path, root.path + str(reply.pk).zfill(10))
+        self.assertEqual(other.depth, 0)
+
+    def test_archive_whole_threads(self):
+        old = timezone.now() - timedelta(days=30)
+        quiet = Comment.objects.create(text="q", author=self.user, project=self.project)
+        quiet_reply = self.reply(quiet, "q.1")
+        active = Comment.objects.create(
+            text="a", author=self.user, project=self.project
+        )
+        self.reply(active, "a.1")
+        Comment.objects.exclude(text="a.1").update(created_at=old)
+
+        archived = sum(archive.archive_comments(timezone.now() - timedelta(days=1)))
+        self.assertEqual(archived, 2)
+        self.assertEqual(Comment.objects.count(), 2)
+
+        self.assertEqual(archive.restore_comments([quiet_reply.pk]), 2)
+        self.assertEqual(
+            [c.text for c in Comment.objects.thread(quiet_reply)], ["q", "q.1"]
+        )
+
+        list(deletion.delete_project(self.project.pk, batch_size=1))
+        self.assertFalse(Comment.objects.exists())
+
+
+class CommentProjectTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("author")
+        cls.projects = [
+            Project.objects.create(title=f"P{i}", start_date=date.today())
+            for i in range(2)
+        ]
+        cls.task = Task.objects.create(title="T", project=cls.projects[0])
+
+    def test_task_comments_follow_their_task(self):
+        comment = Comment.objects.create(text="c", author=self.user, task=self.task)
+        (bulk,) = Comment.objects.bulk_create(
+            [Comment(text="b", author=self.user, task=self.task)]
+        )
+        self.assertEqual(comment.project, self.projects[0])
+        self.assertEqual(bulk.project_id, self.projects[0].pk)
+        with self.assertRaises(ValidationError):
+            Comment(text="orphan", author=self.user).full_clean()
+
+        task = Task.objects.get(pk=self.task.pk)
+        task.project = self.projects[1]
+        task.save()
+        self.assertEqual(self.projects[1].comments.count(), 2)
+        Task.objects.filter(pk=task.pk).update(project=self.projects[0])
+        self.assertEqual(self.projects[0].comments.count(), 2)
+
+    def test_database_requires_a_project(self):
+        comment = Comment.objects.create(text="c", author=self.user, task=self.task)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Comment.objects.filter(pk=comment.pk).update(project=None)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Comment.objects.bulk_create([Comment(text="orphan", author=self.user)])
+
+    def test_repair_command(self):
+        comment = Comment.objects.create(text="c", author=self.user, task=self.task)
+        Comment.objects.filter(pk=comment.pk).update(project=self.projects[1], path="")
+        out = io.StringIO()
+        call_command("repair_comments", "--dry-run", stdout=out)
+        self.assertIn("Need 1 projects and 1 paths", out.getvalue())
+        call_command("repair_comments", stdout=io.StringIO())
+        comment.refresh_from_db()
+        self.assertEqual(comment.project, self.projects[0])
+        self.assertEqual(comment.depth, 0)
+
+    def test_repair_archived_comments(self):
+        now = timezone.now()
+        task = ArchivedTask.objects.create(
+            id=10_000,
+            title="A",
+            status="closed",
+            project=self.projects[1],
+            created_at=now,
+            updated_at=now,
+        )
+        comment = ArchivedComment.objects.create(
+            id=10_000,
+            text="a",
+            author=self.user,
+            task=task,
+            created_at=now,
+            updated_at=now,
+        )
+        out = io.StringIO()
+        call_command("repair_comments", "--dry-run", stdout=out)
+        self.assertIn("Need 1 projects of archived comments", out.getvalue())
+        call_command("repair_comments", stdout=io.StringIO())
+        comment.refresh_from_db()
+        self.assertEqual(comment.project, self.projects[1])
+
+
+class ReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f"user{i}") for i in range(2)]
+        cls.project = Project.objects.create(title="P", start_date=date.today())
+        Task.objects.bulk_create(
+            [
+                Task(title="a", project=cls.project, assignee=cls.users[0]),
+                Task(title="b", project=cls.project, assignee=cls.users[0]),
+                Task(title="c", project=cls.project, status="closed"),
+            ]
+        )
+        Comment.objects.bulk_create(
+            Comment(text="c", author=user, project=cls.project)
+            for user in [*cls.users, cls.users[0]]
+        )
+        for version in ("1", "1", "2"):
+            Document.objects.create(
+                name="D", file="d.pdf", version=version, project=cls.project
+            )
+
+    def rows(self, name, **kwargs):
+        return [row for chunk in reports.report_chunks(name, **kwargs) for row in chunk]
+
+    def test_reports(self):
+        self.assertEqual(
+            self.rows("tasks-by-assignee", chunk_size=1),
+            [(None, "closed", 1), ("user0", "open", 2)],
+        )
+        ((project_id, title, week, comments, authors),) = self.rows(
+            "comments-by-project-week"
+        )
+        self.assertEqual((project_id, comments, authors), (self.project.pk, 3, 2))
+        self.assertEqual(week.weekday(), 0)
+        self.assertEqual(
+            [row[2:4] for row in self.rows("documents-by-project-version")],
+            [("1", 2), ("2", 1)],
+        )
+        start, end = reports.month_range("2001-12")
+        self.assertEqual(self.rows("tasks-by-assignee", start=start, end=end), [])
+        self.assertEqual(end.year, 2002)
+
+    def test_command_formats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/tasks.columnar"
+            err = io.StringIO()
+            call_command(
+                "export_report",
+                "tasks-by-assignee",
+                path,
+                format="columnar",
+                chunk_size=1,
+                stderr=err,
+            )
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(lines[0], {"columns": ["assignee_name", "status", "tasks"]})
+        self.assertEqual(
+            lines[1:], [[[None], ["closed"], [1]], [["user0"], ["open"], [2]]]
+        )
+        self.assertIn("2 rows", err.getvalue())
+        self.assertIn("peak memory", err.getvalue())
+
+
+class DocumentStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "a@example.com", "pw")
+        cls.project = Project.objects.create(title="P", start_date=date.today())
+        cls.project.team_members.add(cls.admin)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(MEDIA_ROOT=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_uploads_are_deduplicated(self):
+        url = reverse("admin:models_task_document_add")
+        for version in ("1", "2"):
+            upload = SimpleUploadedFile("Spec.PDF", b"0123456789")
+            response = self.client.post(
+                url,
+                {
+                    "name": "Spec",
+                    "version": version,
+                    "project": self.project.pk,
+                    "file": upload,
+                },
+            )
+            self.assertEqual(response.status_code, 302)
+        first, second = Document.objects.order_by("version")
+        self.assertEqual(first.file.name, second.file.name)
+        digest = hashlib.sha256(b"0123456789").hexdigest()
+        self.assertEqual(
+            first.file.name, f"project_documents/{digest[:2]}/{digest}.pdf"
+        )
+        third = Document(name="Notes", version="1", project=self.project)
+        third.file.save("notes.pdf", ContentFile(b"0123456789"))
+        self.assertEqual(third.file.name, first.file.name)
+
+    def test_upload_handler(self):
+        handler = storage.HashingUploadHandler()
+        handler.new_file("file", "a.txt", "text/plain", 0)
+        for start, chunk in ((0, b"01234"), (5, b"56789")):
+            handler.receive_data_chunk(chunk, start)
+        upload = handler.file_complete(10)
+        self.assertEqual(upload.sha256, hashlib.sha256(b"0123456789").hexdigest())
+        self.assertEqual(upload.read(), b"0123456789")
+        upload.close()
+
+        handler.new_file("file", "b.txt", "text/plain", 0)
+        path = handler.file.temporary_file_path()
+        handler.upload_interrupted()
+        self.assertFalse(os.path.exists(path))
+
+    def test_download_ranges(self):
+        document = Document(name="Spec", version="1", project=self.project)
+        document.file.save("spec.txt", ContentFile(b"0123456789"))
+        url = reverse("models_task:document-download", args=[document.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertIn('filename="Spec.txt"', response["Content-Disposition"])
+        etag = response["ETag"]
+
+        response = self.client.get(url, headers={"Range": "bytes=2-5"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        response = self.client.get(url, headers={"Range": "bytes=-3"})
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+        response = self.client.get(url, headers={"Range": "bytes=20-"})
+        self.assertEqual(response.status_code, 416)
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(MODELS_TASK_THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(MEDIA_ROOT=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def picture(self, color):
+        output = io.BytesIO()
+        Image.new("RGB", (800, 600), color).save(output, "PNG")
+        return ContentFile(output.getvalue())
+
+    def test_thumbnails_follow_the_picture(self):
+        first = Profile.objects.create(user=User.objects.create_user("a"))
+        second = Profile.objects.create(user=User.objects.create_user("b"))
+        with self.captureOnCommitCallbacks(execute=True):
+            first.profile_picture.save("a.png", self.picture("red"))
+            second.profile_picture.save("b.png", self.picture("red"))
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.profile_picture_hash)
+        # Same content, same thumbnails
+        self.assertEqual(first.thumbnail_url(), second.thumbnail_url())
+        name = thumbnails.thumbnail_name(first.profile_picture_hash, "medium")
+        with Image.open(default_storage.open(name)) as thumbnail:
+            self.assertEqual(thumbnail.size, (256, 192))
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            first.profile_picture.save("c.png", self.picture("blue"))
+        first.refresh_from_db()
+        # The old thumbnails are not served for the new picture
+        self.assertEqual(first.profile_picture_hash, "")
+        self.assertEqual(first.thumbnail_url(), first.profile_picture.url)
+        callbacks[0]()
+        first.refresh_from_db()
+        self.assertNotEqual(first.profile_picture_hash, second.profile_picture_hash)
+
+    def test_backfill(self):
+        profile = Profile.objects.create(user=User.objects.create_user("a"))
+        name = default_storage.save("profile_pics/a.png", self.picture("green"))
+        Profile.objects.filter(pk=profile.pk).update(profile_picture=name)
+        call_command("generate_thumbnails", workers=1, stdout=io.StringIO())
+        profile.refresh_from_db()
+        self.assertTrue(profile.profile_picture_hash)
+
+    def test_backfill_skips_replaced_pictures(self):
+        profile = Profile.objects.create(user=User.objects.create_user("a"))
+        name = default_storage.save("profile_pics/a.png", self.picture("green"))
+        Profile.objects.filter(pk=profile.pk).update(profile_picture=name)
+        generate = thumbnails.generate
+
+        def replace_then_generate(name):
+            Profile.objects.filter(pk=profile.pk).update(profile_picture="new.png")
+            return generate(name)
+
+        with mock.patch.object(thumbnails, "generate", replace_then_generate):
+            call_command("generate_thumbnails", workers=1, stdout=io.StringIO())
+        profile.refresh_from_db()
+        self.assertEqual(profile.profile_picture_hash, "")
+
+
+class ChangeFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("reader")
+        cls.project = Project.objects.create(title="P", start_date=date.today())
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def poll(self, **params):
+        response = self.client.get(reverse("models_task:changes"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_deltas_since_cursor(self):
+        cursor = self.poll()["cursor"]
+        task = Task.objects.create(title="T", project=self.project)
+        Task.objects.filter(pk=task.pk).update(status="closed")
+        Comment.objects.create(text="C", author=self.user, task=task)
+        other = Project.objects.create(title="Q", start_date=date.today())
+
+        page = self.poll(cursor=cursor)
+        self.assertEqual(
+            [(c["kind"], c["action"], c["id"]) for c in page["results"]],
+            [
+                ("task", "created", task.pk),
+                ("task", "updated", task.pk),
+                ("comment", "created", task.comments.get().pk),
+                ("project", "created", other.pk),
+            ],
+        )
+        self.assertEqual(page["results"][1]["data"]["status"], "closed")
+        self.assertEqual(page["results"][2]["project"], self.project.pk)
+        self.assertEqual(
+            len(self.poll(cursor=cursor, project=self.project.pk)["results"]), 3
+        )
+        self.assertEqual(self.poll(cursor=page["cursor"])["results"], [])
+
+    def test_bulk_comment_writes_are_logged(self):
+        task = Task.objects.create(title="T", project=self.project, status="closed")
+        cursor = self.poll()["cursor"]
+        first, second = Comment.objects.bulk_create(
+            [Comment(text=f"C{i}", author=self.user, task=task) for i in range(2)]
+        )
+        Comment.objects.filter(pk=first.pk).update(text="Edited")
+        second.text = "Imported"
+        Comment.objects.bulk_create(
+            [second],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["text"],
+        )
+        archive.archive_task_batch([task.pk])
+        archive.restore_tasks([task.pk])
+
+        page = self.poll(cursor=cursor, kind="comment")
+        self.assertEqual(
+            [(c["action"], c["id"]) for c in page["results"]],
+            [
+                ("created", first.pk),
+                ("created", second.pk),
+                ("updated", first.pk),
+                ("updated", second.pk),
+                ("deleted", first.pk),
+                ("deleted", second.pk),
+                ("created", first.pk),
+                ("created", second.pk),
+            ],
+        )
+        self.assertEqual(page["results"][0]["project"], self.project.pk)
+
+    def test_bulk_writes_are_logged(self):
+        cursor = self.poll()["cursor"]
+        first, second = Task.objects.bulk_create(
+            [Task(title=f"T{i}", project=self.project) for i in range(2)]
+        )
+        first.title = "Renamed"
+        Task.objects.bulk_create(
+            [first],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["title"],
+        )
+        second.status = "closed"
+        second.save()
+        archive.archive_task_batch([second.pk])
+        archive.restore_tasks([second.pk])
+
+        page = self.poll(cursor=cursor)
+        self.assertEqual(
+            [(c["action"], c["id"]) for c in page["results"]],
+            [
+                ("created", first.pk),
+                ("created", second.pk),
+                ("updated", first.pk),
+                ("updated", second.pk),
+                ("deleted", second.pk),
+                ("created", second.pk),
+            ],
+        )
+        self.assertEqual(page["results"][2]["data"]["title"], "Renamed")
+
+        Change.objects.prune(keep=1)
+        self.assertEqual(Change.objects.count(), 1)
+        response = self.client.get(reverse("models_task:changes"), {"cursor": cursor})
+        self.assertEqual(response.status_code, 410)
+
+    @override_settings(
+        MODELS_TASK_CHANGES_STREAM_TIMEOUT=0.05,
+        MODELS_TASK_CHANGES_POLL_INTERVAL=0.01,
+    )
+    async def test_event_stream(self):
+        await self.async_client.aforce_login(self.user)
+        project = await Project.objects.acreate(title="R", start_date=date.today())
+        response = await self.async_client.get(
+            reverse("models_task:change-stream"),
+            headers={"Last-Event-ID": "0"},
+        )
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        events = [
+            event for event in body.decode().split("\n\n") if "event: change" in event
+        ]
+        self.assertEqual(len(events), 2)
+        last = json.loads(events[-1].split("data: ", 1)[1])
+        self.assertEqual((last["kind"], last["id"]), ("project", project.pk))
+
+
+class WorkItemTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create_user("member")
+        cls.outsider = User.objects.create_user("outsider")
+        cls.project = Project.objects.create(title="P", start_date=date.today())
+        cls.project.team_members.add(cls.member)
+
+    def titles(self, user):
+        return set(user.work_items.values_list("title", flat=True))
+
+    def test_write_paths_keep_items_current(self):
+        task = Task.objects.create(
+            title="A", project=self.project, assignee=self.member
+        )
+        Task.objects.bulk_create(
+            [Task(title="B", project=self.project, assignee=self.outsider)]
+        )
+        self.assertEqual(self.titles(self.member), {"A"})
+        self.assertEqual(self.titles(self.outsider), set())
+
+        self.project.team_members.add(self.outsider)
+        self.assertEqual(self.titles(self.outsider), {"B"})
+        Comment.objects.create(text="Latest", author=self.outsider, task=task)
+        Task.objects.filter(pk=task.pk).update(status="review")
+        self.project.title = "Renamed"
+        self.project.save()
+        item = WorkItem.objects.get(task=task)
+        self.assertEqual(
+            (item.status, item.project_title, item.last_comment_text),
+            ("review", "Renamed", "Latest"),
+        )
+        self.assertEqual(item.last_comment_author, "outsider")
+
+        self.outsider.projects.clear()
+        self.assertEqual(self.titles(self.outsider), set())
+        Task.objects.filter(pk=task.pk).update(assignee=None)
+        self.assertEqual(self.titles(self.member), set())
+        self.assertEqual(WorkItem.objects.verify(), [])
+
+        self.project.team_members.add(self.outsider)
+        self.project.delete()
+        self.assertFalse(WorkItem.objects.exists())
+
+    def test_clear_without_the_cache_receiver(self):
+        Task.objects.create(title="A", project=self.project, assignee=self.member)
+        # The work item receiver must not rely on state other receivers keep
+        receiver = signals.invalidate_team_cache
+        m2m_changed.disconnect(receiver, sender=Project.team_members.through)
+        self.addCleanup(
+            m2m_changed.connect, receiver, sender=Project.team_members.through
+        )
+        self.member.projects.clear()
+        self.assertEqual(self.titles(self.member), set())
+
+    def test_endpoint_is_one_query(self):
+        Task.objects.bulk_create(
+            [
+                Task(title=f"T{i}", project=self.project, assignee=self.member)
+                for i in range(5)
+            ]
+        )
+        self.client.force_login(self.member)
+        url = reverse("models_task:work-items")
+        # Session and user lookups, then a single query for the page
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"limit": 3})
+            page = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(page["results"]), 3)
+        self.assertEqual(WorkItem.objects.rebuild(), 5)
+
+
+class BenchmarkTests(TestCase):
+    def test_measure_rolls_writes_back(self):
+        user = User.objects.create_user(username="member")
+        project = Project.objects.create(
+            title="P", start_date=date.today(), end_date=date.today()
+        )
+        project.team_members.add(user)
+        task = Task.objects.create(title="T", project=project, assignee=user)
+        Comment.objects.create(text="C", author=user, task=task)
+
+        fixture = benchmarks.Fixture()
+        for name in ("api-tasks-project", "delete-project"):
+            result = benchmarks.measure(name, fixture, repeat=2, warmup=0)
+            self.assertGreater(result["queries"], 0)
+            self.assertGreater(result["memory"], 0)
+        self.assertTrue(Project.objects.filter(pk=project.pk).exists())
+
+    def test_benchmark_indexes(self):
+        user = User.objects.create_user(username="member")
+        project = Project.objects.create(title="P", start_date=date.today())
+        task = Task.objects.create(title="T", project=project, assignee=user)
+        Comment.objects.create(text="C", author=user, task=task)
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command("benchmark_indexes", repeat=1, stdout=out)
+        dropped = {
+            query["sql"].split()[-1].strip('"')
+            for query in queries
+            if query["sql"].startswith("DROP INDEX")
+        }
+        # The composite indexes and the foreign key indexes they extend
+        self.assertLessEqual(
+            {
+                "task_project_status_idx",
+                "task_assignee_status_idx",
+                "task_project_created_idx",
+                "comment_task_created_idx",
+                "comment_project_created_idx",
+            },
+            dropped,
+        )
+        with connection.cursor() as cursor:
+            for model, column in ((Task, "project_id"), (Comment, "task_id")):
+                constraints = connection.introspection.get_constraints(
+                    cursor, model._meta.db_table
+                )
+                foreign_key_indexes = {
+                    name
+                    for name, info in constraints.items()
+                    if info["index"] and info["columns"] == [column]
+                }
+                self.assertTrue(foreign_key_indexes)
+                self.assertLessEqual(foreign_key_indexes, dropped)
+        self.assertIn("Summary (median ms)", out.getvalue())
+        # The drop was rolled back
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Task._meta.db_table
+            )
+        self.assertIn("task_project_status_idx", constraints)
+
+    def test_compare(self):
+        base = {"a": {"p50": 10.0, "queries": 3, "memory": 1 << 20}}
+        same = {"a": {"p50": 12.0, "queries": 3, "memory": 1 << 20}}
+        self.assertEqual(benchmarks.compare(same, base, 0.25), [])
+        worse = {"a": {"p50": 20.0, "queries": 4, "memory": 2 << 20}}
+        self.assertEqual(len(benchmarks.compare(worse, base, 0.25)), 3)
@@ -0,0 +1,133 @@
+"""
+Thumbnails of profile pictures.
+
+Pictures are resized and recompressed off the request path, in a small
+thread pool fed once the saving transaction commits. Thumbnails are named
+after the SHA-256 of the source image, so identical pictures share them and
+regenerating an existing one is skipped. ``Profile.profile_picture_hash``
+records the hash once the thumbnails exist, until then the original picture
+is served.
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = {"small": 64, "medium": 256}
+
+_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def sizes():
+    return getattr(settings, "MODELS_TASK_THUMBNAIL_SIZES", DEFAULT_SIZES)
+
+
+def image_format():
+    return getattr(settings, "MODELS_TASK_THUMBNAIL_FORMAT", "WEBP")
+
+
+def thumbnail_name(digest, size):
+    extension = _EXTENSIONS[image_format()]
+    return f"thumbnails/{size}/{digest[:2]}/{digest}.{extension}"
+
+
+def render(image, pixels):
+    """Return the encoded bytes of ``image`` scaled to fit ``pixels`` square."""
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((pixels, pixels), Image.Resampling.LANCZOS)
+    fmt = image_format()
+    transparent = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    image = image.convert("RGBA" if transparent and fmt != "JPEG" else "RGB")
+    output = io.BytesIO()
+    image.save(output, fmt, quality=80, optimize=True)
+    return output.getvalue()
+
+
+def generate(name, storage=default_storage):
+    """
+    Create the missing thumbnails of the stored image ``name`` and return the
+    content hash they are filed under.
+    """
+    with storage.open(name, "rb") as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()
+    image = None
+    for size, pixels in sizes().items():
+        target = thumbnail_name(digest, size)
+        if storage.exists(target):
+            continue
+        if image is None:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        storage.save(target, ContentFile(render(image.copy(), pixels)))
+    return digest
+
+
+def process(profile_pk, name):
+    """Generate the thumbnails of one profile and record their hash."""
+    from .models import Profile
+
+    try:
+        digest = generate(name)
+    except Exception:
+        logger.exception("Thumbnailing %s failed", name)
+        return
+    # Skipped when the picture was replaced in the meantime, that change
+    # scheduled its own run
+    Profile.objects.filter(pk=profile_pk, profile_picture=name).update(
+        profile_picture_hash=digest
+    )
+
+
+def _run(profile_pk, name):
+    try:
+        process(profile_pk, name)
+    finally:
+        # Pool threads hold their own connections
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "MODELS_TASK_THUMBNAIL_WORKERS", 2),
+                thread_name_prefix="thumbnails",
+            )
+        return _executor
+
+
+def schedule(profile_pk, name, using=None):
+    """Thumbnail ``name`` in the background once the transaction commits."""
+
+    def submit():
+        if getattr(settings, "MODELS_TASK_THUMBNAIL_WORKERS", 2) == 0:
+            # Inline, e.g. for tests
+            process(profile_pk, name)
+        else:
+            get_executor().submit(_run, profile_pk, name)
+
+    transaction.on_commit(submit, using=using)
+
+
+def thumbnail_url(profile, size="small"):
+    """URL of ``profile``'s thumbnail, or of the picture until it is ready."""
+    if not profile.profile_picture:
+        return None
+    if profile.profile_picture_hash:
+        return default_storage.url(thumbnail_name(profile.profile_picture_hash, size))
+    return profile.profile_picture.url
@@ -0,0 +1,296 @@
+"""
+Streaming CSV/JSONL import and export of models_task data.
+
+Foreign keys to users are written as usernames, the other foreign keys as
+primary keys. Both directions work in chunks: exports read with
+``QuerySet.iterator()`` and imports resolve every foreign key column with one
+query per batch before writing the batch with a single upserting
+``bulk_create``.
+"""
+
+import csv
+import json
+
+from models_task import membership
+from models_task.models import Profile, Project, Task, Document, Comment
+from models_task.utils import JSONEncoder, chunked
+
+FORMATS = ("csv", "jsonl")
+
+
+class ModelSpec:
+    def __init__(self, model, fields, references=None, many=None, unique="id"):
+        self.model = model
+        # Plain columns, copied as-is
+        self.fields = fields
+        # Foreign key column -> field identifying the related row in files
+        self.references = references or {}
+        # Many-to-many column -> field identifying the related rows in files
+        self.many = many or {}
+        # Field used to match rows that already exist
+        self.unique = unique
+
+    @property
+    def columns(self):
+        return [*self.fields, *self.references, *self.many]
+
+    def natural_key(self, name):
+        return self.references.get(name) or self.many[name]
+
+    def related_model(self, name):
+        return self.model._meta.get_field(name).related_model
+
+
+SPECS = {
+    "projects": ModelSpec(
+        Project,
+        ["id", "title", "description", "start_date", "end_date"],
+        many={"team_members": "username"},
+    ),
+    "tasks": ModelSpec(
+        Task,
+        ["id", "title", "description", "status", "created_at", "updated_at"],
+        references={"project": "id", "assignee": "username"},
+    ),
+    "documents": ModelSpec(
+        Document,
+        ["id", "name", "description", "file", "version", "uploaded_at"],
+        references={"project": "id"},
+    ),
+    "comments": ModelSpec(
+        Comment,
+        ["id", "text", "created_at", "updated_at", "parent_id", "path"],
+        references={"author": "username", "task": "id", "project": "id"},
+    ),
+    "profiles": ModelSpec(
+        Profile,
+        ["role", "contact_number", "profile_picture"],
+        references={"user": "username"},
+        unique="user",
+    ),
+}
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if str(path).endswith((".jsonl", ".json")) else "csv"
+
+
+# Export
+
+
+def export_rows(spec, chunk_size):
+    """Yield one dict per row of ``spec.model`` in primary key order."""
+    lookups = {name: name for name in spec.fields}
+    lookups.update({name: f"{name}__{key}" for name, key in spec.references.items()})
+    queryset = (
+        spec.model.objects.order_by("pk")
+        .values("pk", *lookups.values())
+        .iterator(chunk_size=chunk_size)
+    )
+    for chunk in chunked(queryset, chunk_size):
+        related = {
+            name: related_keys(spec, name, [row["pk"] for row in chunk])
+            for name in spec.many
+        }
+        for row in chunk:
+            record = {name: row[lookup] for name, lookup in lookups.items()}
+            for name, keys in related.items():
+                record[name] = keys.get(row["pk"], [])
+            yield record
+
+
+def related_keys(spec, name, pks):
+    """Map each of ``pks`` to the natural keys of its ``name`` M2M targets."""
+    field = spec.model._meta.get_field(name)
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    keys = {}
+    rows = through.objects.filter(**{f"{source}__in": pks}).values_list(
+        source, f"{target}__{spec.natural_key(name)}"
+    )
+    for pk, key in rows:
+        keys.setdefault(pk, []).append(key)
+    return keys
+
+
+def write_rows(stream, fmt, spec, rows):
+    """Write ``rows`` to ``stream`` and return how many were written."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=spec.columns)
+        writer.writeheader()
+        for row in rows:
+            for name in spec.many:
+                row[name] = " ".join(row[name])
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps(row, cls=JSONEncoder))
+            stream.write("\n")
+            count += 1
+    return count
+
+
+# Import
+
+
+def read_rows(stream, fmt, spec):
+    """Yield one dict per record in ``stream``, with empty CSV cells as None."""
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            record = {
+                key: (value if value != "" else None) for key, value in row.items()
+            }
+            for name in spec.many:
+                if name in record:
+                    record[name] = (record[name] or "").split()
+            yield record
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def resolve(spec, name, rows):
+    """Map the natural keys used in column ``name`` of ``rows`` to primary keys."""
+    values = set()
+    for row in rows:
+        value = row.get(name)
+        if isinstance(value, list):
+            values.update(value)
+        elif value is not None:
+            values.add(value)
+    if not values:
+        return {}
+    key = spec.natural_key(name)
+    model = spec.related_model(name)
+    field = model._meta.get_field(key)
+    values = {field.to_python(value) for value in values}
+    return dict(model.objects.filter(**{f"{key}__in": values}).values_list(key, "pk"))
+
+
+def build_objects(spec, rows):
+    """
+    Turn a batch of records into unsaved model instances.
+
+    Returns ``(objects, memberships, skipped)`` where ``memberships`` maps each
+    object to the primary keys of its M2M targets and ``skipped`` counts records
+    whose required foreign keys could not be resolved.
+    """
+    opts = spec.model._meta
+    lookups = {
+        name: resolve(spec, name, rows) for name in [*spec.references, *spec.many]
+    }
+    objects, memberships, skipped = [], [], 0
+    for row in rows:
+        values = {}
+        for name in spec.fields:
+            if name in row:
+                values[name] = opts.get_field(name).to_python(row[name])
+        missing = False
+        for name, key in spec.references.items():
+            field = opts.get_field(name)
+            value = row.get(name)
+            if value is None:
+                values[field.attname] = None
+                missing = missing or not field.null
+                continue
+            value = field.related_model._meta.get_field(key).to_python(value)
+            values[field.attname] = lookups[name].get(value)
+            missing = missing or values[field.attname] is None
+        if missing:
+            skipped += 1
+            continue
+        obj = spec.model(**values)
+        objects.append(obj)
+        memberships.append(
+            {
+                name: [
+                    lookups[name][key]
+                    for key in row.get(name) or []
+                    if key in lookups[name]
+                ]
+                for name in spec.many
+                if name in row
+            }
+        )
+    return objects, memberships, skipped
+
+
+def import_batch(spec, rows):
+    """Upsert one batch of records and return ``(written, skipped)``."""
+    objects, memberships, skipped = build_objects(spec, rows)
+    if not objects:
+        return 0, skipped
+
+    opts = spec.model._meta
+    timestamps = [
+        field.attname
+        for field in opts.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    # bulk_create() stamps auto_now(_add) fields, keep the imported values
+    imported = [{name: getattr(obj, name) for name in timestamps} for obj in objects]
+
+    update_fields = [
+        field.attname
+        for field in opts.concrete_fields
+        if not field.primary_key and field.name != spec.unique
+    ]
+    spec.model.objects.bulk_create(
+        objects,
+        update_conflicts=True,
+        unique_fields=[spec.unique],
+        update_fields=update_fields,
+    )
+
+    restored = []
+    for obj, values in zip(objects, imported):
+        values = {name: value for name, value in values.items() if value is not None}
+        if values and obj.pk is not None:
+            for name, value in values.items():
+                setattr(obj, name, value)
+            restored.append(obj)
+    if restored:
+        spec.model.objects.bulk_update(restored, timestamps)
+
+    for name in spec.many:
+        field = opts.get_field(name)
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        pairs = [
+            (obj.pk, target_pk)
+            for obj, related in zip(objects, memberships)
+            if name in related
+            for target_pk in related[name]
+        ]
+        replaced = [
+            obj.pk for obj, related in zip(objects, memberships) if name in related
+        ]
+        existing = set(
+            through.objects.filter(**{f"{source}__in": replaced}).values_list(
+                f"{source}_id", f"{target}_id"
+            )
+        )
+        through.objects.filter(**{f"{source}__in": replaced}).delete()
+        through.objects.bulk_create(
+            [
+                through(**{f"{source}_id": source_pk, f"{target}_id": target_pk})
+                for source_pk, target_pk in pairs
+            ],
+            ignore_conflicts=True,
+        )
+        if through is membership.Membership:
+            # The raw writes send no m2m_changed signals, refresh what the
+            # receivers would for the memberships that came or went
+            changes = existing.symmetric_difference(pairs)
+            membership.changed(
+                {project_id for project_id, _ in changes},
+                {user_id for _, user_id in changes},
+            )
+    return len(objects), skipped
@@ -0,0 +1,74 @@
+from django.urls import path
+
+from . import views
+
+app_name = "models_task"
+
+urlpatterns = [
+    path("projects/", views.ProjectView.as_view(), name="project-list"),
+    path("projects/<int:pk>/", views.ProjectView.as_view(), name="project-detail"),
+    path("projects/<int:pk>/tasks/", views.project_tasks, name="project-tasks"),
+    path(
+        "projects/<int:pk>/comments/",
+        views.project_comments,
+        name="project-comments",
+    ),
+    path(
+        "projects/<int:pk>/cycle-stats/",
+        views.project_cycle_stats,
+        name="project-cycle-stats",
+    ),
+    path("tasks/", views.TaskView.as_view(), name="task-list"),
+    path("tasks/<int:pk>/", views.TaskView.as_view(), name="task-detail"),
+    path("tasks/<int:pk>/comments/", views.task_comments, name="task-comments"),
+    path("comments/", views.CommentView.as_view(), name="comment-list"),
+    path("comments/<int:pk>/", views.CommentView.as_view(), name="comment-detail"),
+    path("comments/<int:pk>/thread/", views.comment_thread, name="comment-thread"),
+    # Async variants of the read endpoints, for ASGI deployments
+    path(
+        "async/projects/", views.AsyncProjectView.as_view(), name="async-project-list"
+    ),
+    path(
+        "async/projects/<int:pk>/",
+        views.AsyncProjectView.as_view(),
+        name="async-project-detail",
+    ),
+    path(
+        "async/projects/<int:pk>/tasks/",
+        views.async_project_tasks,
+        name="async-project-tasks",
+    ),
+    path(
+        "async/projects/<int:pk>/comments/",
+        views.async_project_comments,
+        name="async-project-comments",
+    ),
+    path("async/tasks/", views.AsyncTaskView.as_view(), name="async-task-list"),
+    path(
+        "async/tasks/<int:pk>/", views.AsyncTaskView.as_view(), name="async-task-detail"
+    ),
+    path(
+        "async/tasks/<int:pk>/comments/",
+        views.async_task_comments,
+        name="async-task-comments",
+    ),
+    path(
+        "async/comments/", views.AsyncCommentView.as_view(), name="async-comment-list"
+    ),
+    path(
+        "async/comments/<int:pk>/",
+        views.AsyncCommentView.as_view(),
+        name="async-comment-detail",
+    ),
+    path(
+        "documents/<int:pk>/download/",
+        views.document_download,
+        name="document-download",
+    ),
+    path("me/work/", views.WorkItemView.as_view(), name="work-items"),
+    path("changes/", views.changes, name="changes"),
+    path("changes/stream/", views.change_stream, name="change-stream"),
+    path("search/", views.search_view, name="search"),
+    path("cache/stats/", views.cache_stats, name="cache-stats"),
+    path("profiling/", views.profiling_report, name="profiling-report"),
+]
@@ -0,0 +1,54 @@
+import datetime
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class JSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder truncates to milliseconds, keep the full value
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def chunked(iterable, size):
+    """Yield lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def pk_batches(queryset, batch_size, descending=False):
+    """Yield lists of primary keys, walking ``queryset`` in primary key order."""
+    last = None
+    while True:
+        batch = queryset.order_by("-pk" if descending else "pk")
+        if last is not None:
+            batch = batch.filter(**{"pk__lt" if descending else "pk__gt": last})
+        pks = list(batch.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return
+        last = pks[-1]
+        yield pks
+
+
+async def achunked(aiterable, size):
+    """Async ``chunked()``, for async iterators such as ``aiterator()``."""
+    chunk = []
+    async for item in aiterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def throughput(count, elapsed):
+    """Format a row count and elapsed seconds as a human readable rate."""
+    rate = count / elapsed if elapsed > 0 else 0
+    return f"{count} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)"
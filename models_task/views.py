@@ -1,3 +1,802 @@
-from django.shortcuts import render
+import asyncio
+import base64
+import binascii
+import json
+import mimetypes
+import os
+import re
+import time
+from datetime import timedelta
 
-# Create your views here.
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from django.views import View
+
+from . import cache, membership, profiling, search
+from .models import (
+    Change,
+    Comment,
+    Document,
+    Project,
+    ProjectCycleStats,
+    ProjectTaskStats,
+    Task,
+    WorkItem,
+)
+from .utils import JSONEncoder, achunked, chunked
+
+
+def keyset_filter(ordering, values):
+    """
+    Build the condition selecting rows after ``values`` in ``ordering``, e.g.
+    ``a > x OR (a = x AND b > y)`` for ``("a", "b")``. Descending fields
+    (``"-a"``) compare with ``<``.
+    """
+    condition = None
+    for name, value in reversed(list(zip(ordering, values))):
+        field = name.lstrip("-")
+        lookup = "lt" if name.startswith("-") else "gt"
+        after = Q(**{f"{field}__{lookup}": value})
+        condition = (
+            after if condition is None else after | (Q(**{field: value}) & condition)
+        )
+    return condition
+
+
+class KeysetListView(View):
+    """
+    Read-only JSON list and detail endpoint.
+
+    Lists are paginated with an opaque cursor holding the ``ordering`` values of
+    the last row instead of an OFFSET, so a deep page costs the same index range
+    scan as the first one. Rows are read with ``values()`` (related fields are
+    joined in the same query) and streamed to the client.
+    """
+
+    http_method_names = ["get"]
+    model = None
+    # cache.CachedRead serving the detail endpoint
+    cached = None
+    ordering = ("created_at", "id")
+    # Output key -> values() lookup
+    fields = {}
+    # Query parameter -> model field to filter on
+    filters = {}
+    # Output key of the row's project. When set, lists and details only show
+    # rows of the projects the user is a team member of.
+    project_key = None
+    default_limit = 50
+    max_limit = 500
+
+    def get(self, request, pk=None):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        if self.project_key:
+            self.member_projects = membership.project_ids(request.user)
+        try:
+            if pk is not None:
+                return self.detail(pk)
+            limit = int(request.GET.get("limit", self.default_limit))
+            if not 0 < limit <= self.max_limit:
+                raise ValueError
+            queryset = self.get_queryset(request)
+        except (ValueError, ValidationError):
+            return JsonResponse({"error": "Invalid query parameters."}, status=400)
+        return StreamingHttpResponse(
+            self.stream(queryset, limit), content_type="application/json"
+        )
+
+    def get_queryset(self, request):
+        queryset = self.model.objects.all()
+        if self.project_key:
+            queryset = queryset.filter(
+                **{f"{self.fields[self.project_key]}__in": self.member_projects}
+            )
+        for param, name in self.filters.items():
+            if param in request.GET:
+                field = self.model._meta.get_field(name)
+                queryset = queryset.filter(
+                    **{name: field.to_python(request.GET[param])}
+                )
+        if "cursor" in request.GET:
+            queryset = queryset.filter(
+                keyset_filter(self.ordering, self.decode_cursor(request.GET["cursor"]))
+            )
+        return queryset.order_by(*self.ordering)
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, UnicodeError, json.JSONDecodeError):
+            raise ValueError("Malformed cursor")
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise ValueError("Malformed cursor")
+        try:
+            return [
+                self.model._meta.get_field(name.lstrip("-")).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValidationError):
+            # Valid JSON, but not values of the ordering fields
+            raise ValueError("Malformed cursor")
+
+    def encode_cursor(self, row):
+        values = [row[name.lstrip("-")] for name in self.ordering]
+        data = json.dumps(values, cls=JSONEncoder).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def lookups(self):
+        keys = [name.lstrip("-") for name in self.ordering]
+        return list(dict.fromkeys([*keys, *self.fields.values()]))
+
+    def serialize(self, rows):
+        """Turn a chunk of ``values()`` rows into output dicts."""
+        return [
+            {key: row[lookup] for key, lookup in self.fields.items()} for row in rows
+        ]
+
+    def stream(self, queryset, limit):
+        # Fetching one row past the page tells whether there is a next page
+        rows = queryset.values(*self.lookups())[: limit + 1]
+        yield '{"results": ['
+        count, last, more = 0, None, False
+        for chunk in chunked(rows.iterator(chunk_size=100), 100):
+            if count + len(chunk) > limit:
+                chunk, more = chunk[: limit - count], True
+            if not chunk:
+                break
+            for item in self.serialize(chunk):
+                yield ("," if count else "") + json.dumps(item, cls=JSONEncoder)
+                count += 1
+            last = chunk[-1]
+        cursor = self.encode_cursor(last) if more else None
+        yield f'], "next": {json.dumps(cursor)}}}'
+
+    def page(self, queryset, limit):
+        """Return the first ``limit`` rows of ``queryset`` and the next cursor."""
+        rows = list(queryset.values(*self.lookups())[: limit + 1])
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "results": self.serialize(rows) if rows else [],
+            "next": self.encode_cursor(rows[-1]) if more else None,
+        }
+
+    def detail(self, pk):
+        item = self.cached.get(self.model._meta.pk.to_python(pk))
+        if not self.visible(item):
+            return JsonResponse({"error": "Not found."}, status=404)
+        return JsonResponse(item, encoder=JSONEncoder)
+
+    def visible(self, item):
+        # Other teams' rows are hidden as if they did not exist
+        if item is None:
+            return False
+        return not self.project_key or item[self.project_key] in self.member_projects
+
+    async def aserialize(self, rows):
+        """``serialize()`` for async views, for subclasses that query."""
+        return self.serialize(rows)
+
+
+class AsyncKeysetMixin:
+    """
+    Serve a ``KeysetListView`` asynchronously, reading through the async ORM.
+
+    Under ASGI a request waiting on the database no longer holds a worker
+    thread, so many slow polling clients are cheap.
+    """
+
+    async def get(self, request, pk=None):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        if self.project_key:
+            self.member_projects = await membership.aproject_ids(user)
+        try:
+            if pk is not None:
+                return await self.adetail(pk)
+            limit = int(request.GET.get("limit", self.default_limit))
+            if not 0 < limit <= self.max_limit:
+                raise ValueError
+            # Lazy, building the queryset runs no query
+            queryset = self.get_queryset(request)
+        except (ValueError, ValidationError):
+            return JsonResponse({"error": "Invalid query parameters."}, status=400)
+        return StreamingHttpResponse(
+            self.astream(queryset, limit), content_type="application/json"
+        )
+
+    async def astream(self, queryset, limit):
+        rows = queryset.values(*self.lookups())[: limit + 1]
+        yield '{"results": ['
+        count, last, more = 0, None, False
+        async for chunk in achunked(rows.aiterator(chunk_size=100), 100):
+            if count + len(chunk) > limit:
+                chunk, more = chunk[: limit - count], True
+            if not chunk:
+                break
+            for item in await self.aserialize(chunk):
+                yield ("," if count else "") + json.dumps(item, cls=JSONEncoder)
+                count += 1
+            last = chunk[-1]
+        cursor = self.encode_cursor(last) if more else None
+        yield f'], "next": {json.dumps(cursor)}}}'
+
+    async def adetail(self, pk):
+        item = await self.cached.aget(self.model._meta.pk.to_python(pk))
+        if not self.visible(item):
+            return JsonResponse({"error": "Not found."}, status=404)
+        return JsonResponse(item, encoder=JSONEncoder)
+
+
+class ProjectView(KeysetListView):
+    model = Project
+    cached = cache.project
+    # Projects have no creation timestamp, the primary key orders them
+    ordering = ("id",)
+    fields = {
+        "id": "id",
+        "title": "title",
+        "description": "description",
+        "start_date": "start_date",
+        "end_date": "end_date",
+    }
+
+    def related(self, pks):
+        Membership = Project.team_members.through
+        members = Membership.objects.filter(project_id__in=pks).values_list(
+            "project_id", "user__username"
+        )
+        counts = ProjectTaskStats.objects.filter(
+            project_id__in=pks, count__gt=0
+        ).values_list("project_id", "status", "count")
+        return members, counts
+
+    def attach(self, items, member_rows, count_rows):
+        members, counts = {}, {}
+        for project_id, username in member_rows:
+            members.setdefault(project_id, []).append(username)
+        for project_id, status, count in count_rows:
+            counts.setdefault(project_id, {})[status] = count
+        for item in items:
+            item["team_members"] = members.get(item["id"], [])
+            item["task_counts"] = counts.get(item["id"], {})
+        return items
+
+    def serialize(self, rows):
+        items = super().serialize(rows)
+        members, counts = self.related([item["id"] for item in items])
+        return self.attach(items, members, counts)
+
+    async def aserialize(self, rows):
+        items = super().serialize(rows)
+        members, counts = self.related([item["id"] for item in items])
+        return self.attach(
+            items, [row async for row in members], [row async for row in counts]
+        )
+
+
+class TaskView(KeysetListView):
+    model = Task
+    cached = cache.task
+    fields = {
+        "id": "id",
+        "title": "title",
+        "description": "description",
+        "status": "status",
+        "created_at": "created_at",
+        "updated_at": "updated_at",
+        "project": "project_id",
+        "project_title": "project__title",
+        "assignee": "assignee__username",
+    }
+    filters = {"project": "project_id", "assignee": "assignee_id", "status": "status"}
+    project_key = "project"
+
+
+class CommentView(KeysetListView):
+    model = Comment
+    cached = cache.comment
+    # Newest first, like Comment.Meta.ordering
+    ordering = ("-created_at", "-id")
+    fields = {
+        "id": "id",
+        "text": "text",
+        "created_at": "created_at",
+        "updated_at": "updated_at",
+        "author": "author__username",
+        "task": "task_id",
+        "task_title": "task__title",
+        "project": "project_id",
+        "project_title": "project__title",
+        "parent": "parent_id",
+        "path": "path",
+    }
+    filters = {"task": "task_id", "project": "project_id", "author": "author_id"}
+    project_key = "project"
+
+    def serialize(self, rows):
+        items = super().serialize(rows)
+        # The depth is all clients need of the path
+        for item in items:
+            item["depth"] = len(item.pop("path")) // Comment.SEGMENT - 1
+        return items
+
+
+def comment_thread(request, pk):
+    """A comment and every reply below it, in display order."""
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    comment = (
+        Comment.objects.filter(pk=pk).only("task_id", "project_id", "path").first()
+    )
+    if comment is None or not membership.is_member(request.user, comment.project_id):
+        return JsonResponse({"error": "Not found."}, status=404)
+    view = CommentView()
+    rows = Comment.objects.subtree(comment).values(*view.lookups())
+    return JsonResponse({"results": view.serialize(rows)}, encoder=JSONEncoder)
+
+
+def cached_list(read, view_class):
+    """
+    View listing the children of a parent object: the first page from the
+    ``cache.CachedPage`` ``read``, the pages after its ``next`` cursor from
+    the database through ``view_class``.
+    """
+
+    def view(request, pk):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        if not membership.is_member(request.user, read.project_of(pk)):
+            return JsonResponse({"error": "Not found."}, status=404)
+        if "cursor" in request.GET:
+            keyset = view_class()
+            try:
+                # None values from the cursor only fail here, in filter()
+                queryset = read.queryset(keyset, pk).filter(
+                    keyset_filter(
+                        keyset.ordering, keyset.decode_cursor(request.GET["cursor"])
+                    )
+                )
+            except (ValueError, ValidationError):
+                return JsonResponse({"error": "Invalid query parameters."}, status=400)
+            return StreamingHttpResponse(
+                keyset.stream(queryset, keyset.default_limit),
+                content_type="application/json",
+            )
+        page = read.get(pk)
+        if page is None:
+            return JsonResponse({"error": "Not found."}, status=404)
+        return JsonResponse(page, encoder=JSONEncoder)
+
+    return view
+
+
+class WorkItemView(KeysetListView):
+    """The requesting user's work queue, most recently active first."""
+
+    model = WorkItem
+    ordering = ("-activity_at", "-task")
+    fields = {
+        "task": "task",
+        "title": "title",
+        "status": "status",
+        "project": "project_id",
+        "project_title": "project_title",
+        "updated_at": "task_updated_at",
+        "last_comment": "last_comment_text",
+        "last_comment_author": "last_comment_author",
+        "last_comment_at": "last_comment_at",
+        "activity_at": "activity_at",
+    }
+    filters = {"project": "project_id", "status": "status"}
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(user=request.user)
+
+
+class AsyncProjectView(AsyncKeysetMixin, ProjectView):
+    pass
+
+
+class AsyncTaskView(AsyncKeysetMixin, TaskView):
+    pass
+
+
+class AsyncCommentView(AsyncKeysetMixin, CommentView):
+    pass
+
+
+project_tasks = cached_list(cache.project_tasks, TaskView)
+project_comments = cached_list(cache.project_comments, CommentView)
+task_comments = cached_list(cache.task_comments, CommentView)
+
+
+def acached_list(read, view_class):
+    """Async ``cached_list()``, ``view_class`` an ``AsyncKeysetMixin`` view."""
+
+    async def view(request, pk):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        if not await membership.ais_member(user, await read.aproject_of(pk)):
+            return JsonResponse({"error": "Not found."}, status=404)
+        if "cursor" in request.GET:
+            keyset = view_class()
+            try:
+                # None values from the cursor only fail here, in filter()
+                queryset = read.queryset(keyset, pk).filter(
+                    keyset_filter(
+                        keyset.ordering, keyset.decode_cursor(request.GET["cursor"])
+                    )
+                )
+            except (ValueError, ValidationError):
+                return JsonResponse({"error": "Invalid query parameters."}, status=400)
+            return StreamingHttpResponse(
+                keyset.astream(queryset, keyset.default_limit),
+                content_type="application/json",
+            )
+        page = await read.aget(pk)
+        if page is None:
+            return JsonResponse({"error": "Not found."}, status=404)
+        return JsonResponse(page, encoder=JSONEncoder)
+
+    return view
+
+
+async_project_tasks = acached_list(cache.project_tasks, AsyncTaskView)
+async_project_comments = acached_list(cache.project_comments, AsyncCommentView)
+async_task_comments = acached_list(cache.task_comments, AsyncCommentView)
+
+
+def project_cycle_stats(request, pk):
+    """
+    Daily completions and mean cycle and lead times of a project over the
+    last ``days`` days, read from the precomputed rollups.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    try:
+        days = int(request.GET.get("days", 30))
+        if not 0 < days <= 366:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"error": "Invalid query parameters."}, status=400)
+    if not Project.objects.filter(pk=pk).exists():
+        return JsonResponse({"error": "Not found."}, status=404)
+
+    start = timezone.localdate() - timedelta(days=days - 1)
+    rollups = ProjectCycleStats.objects.filter(project_id=pk, day__gte=start)
+    daily = [
+        {
+            "day": row.day,
+            "completed": row.completed,
+            "mean_cycle_hours": (
+                row.cycle_time / row.cycle_time_count / 3600
+                if row.cycle_time_count
+                else None
+            ),
+            "mean_lead_hours": (
+                row.lead_time / row.lead_time_count / 3600
+                if row.lead_time_count
+                else None
+            ),
+        }
+        for row in rollups.order_by("day")
+    ]
+    summary = ProjectCycleStats.objects.summary([pk], start=start).get(pk)
+    return JsonResponse(
+        {"since": start, "summary": summary, "daily": daily}, encoder=JSONEncoder
+    )
+
+
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse(cache.CachedRead.stats())
+
+
+@staff_member_required
+def profiling_report(request):
+    return JsonResponse({"routes": profiling.report()})
+
+
+def search_view(request):
+    """Ranked full-text matches across tasks, comments and documents."""
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    term = request.GET.get("q", "")
+    kinds = request.GET.getlist("kind") or None
+    try:
+        limit = int(request.GET.get("limit", 20))
+        if not 0 < limit <= 100:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"error": "Invalid query parameters."}, status=400)
+
+    matches = search.search(term, kinds, limit)
+    # One values() query per kind fetches the display text of its matches
+    summaries = {
+        "task": (Task, "title"),
+        "comment": (Comment, "text"),
+        "document": (Document, "name"),
+    }
+    rows = {}
+    for kind, (model, field) in summaries.items():
+        pks = [pk for match_kind, pk, _ in matches if match_kind == kind]
+        if pks:
+            rows[kind] = dict(
+                model.objects.filter(
+                    pk__in=pks, project_id__in=membership.project_ids(request.user)
+                ).values_list("pk", field)
+            )
+    results = [
+        {"kind": kind, "id": pk, "score": score, "text": rows[kind][pk][:200]}
+        for kind, pk, score in matches
+        if pk in rows.get(kind, {})
+    ]
+    return JsonResponse({"results": results})
+
+
+_BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+def byte_range(header, size):
+    """
+    Return the ``(start, end)`` bytes, inclusive, of a single range ``Range``
+    header, or None to send the whole file (no header or several ranges).
+    Raises ValueError for a range outside the file.
+    """
+    match = _BYTE_RANGE.match(header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range, the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def read_range(file, start, length, chunk_size=64 * 1024):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def document_download(request, pk):
+    """
+    Serve a document's file. Whole files go out through ``FileResponse``, which
+    WSGI servers send with sendfile(), or through the web server when
+    ``MODELS_TASK_SENDFILE_HEADER`` is set. Single byte ranges are supported
+    so that interrupted downloads can resume.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    document = (
+        Document.objects.filter(pk=pk).values("name", "file", "project_id").first()
+    )
+    if (
+        document is None
+        or not document["file"]
+        or not membership.is_member(request.user, document["project_id"])
+    ):
+        return JsonResponse({"error": "Not found."}, status=404)
+    storage = Document._meta.get_field("file").storage
+    name = document["file"]
+    try:
+        size = storage.size(name)
+    except OSError:
+        return JsonResponse({"error": "Not found."}, status=404)
+
+    stem, extension = os.path.splitext(os.path.basename(name))
+    filename = document["name"]
+    if not filename.lower().endswith(extension):
+        filename += extension
+    # Content-addressed files are named after their hash, a strong ETag
+    etag = f'"{stem}"' if _DIGEST.match(stem) else None
+    if etag and etag in request.headers.get("If-None-Match", ""):
+        return HttpResponseNotModified(headers={"ETag": etag})
+
+    header = getattr(settings, "MODELS_TASK_SENDFILE_HEADER", None)
+    if header:
+        # The web server handles ranges and conditional requests itself
+        prefix = getattr(settings, "MODELS_TASK_SENDFILE_PREFIX", None)
+        response = HttpResponse(
+            content_type=mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        )
+        response[header] = prefix + name if prefix else storage.path(name)
+        response["Content-Disposition"] = content_disposition_header(True, filename)
+        return response
+
+    requested = request.headers.get("Range")
+    if "If-Range" in request.headers and request.headers["If-Range"] != etag:
+        # The client's partial copy may be of different content
+        requested = None
+    try:
+        span = byte_range(requested, size)
+    except ValueError:
+        return HttpResponse(status=416, headers={"Content-Range": f"bytes */{size}"})
+
+    if span is None:
+        response = FileResponse(
+            storage.open(name, "rb"), as_attachment=True, filename=filename
+        )
+    else:
+        start, end = span
+        response = StreamingHttpResponse(
+            read_range(storage.open(name, "rb"), start, end - start + 1),
+            status=206,
+            content_type=mimetypes.guess_type(filename)[0]
+            or "application/octet-stream",
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+        response["Content-Disposition"] = content_disposition_header(True, filename)
+    response["Accept-Ranges"] = "bytes"
+    if etag:
+        response["ETag"] = etag
+    return response
+
+
+CHANGE_FIELDS = {
+    "cursor": "id",
+    "kind": "kind",
+    "id": "object_id",
+    "action": "action",
+    "project": "project_id",
+    "data": "data",
+    "at": "created_at",
+}
+
+
+def change_params(request):
+    """Parse the change feed's query parameters, raising ValueError."""
+    cursor = request.GET.get("cursor", request.headers.get("Last-Event-ID"))
+    project = request.GET.get("project")
+    kinds = request.GET.getlist("kind")
+    limit = int(request.GET.get("limit", 100))
+    if not 0 < limit <= 500 or not set(kinds) <= {"task", "comment", "project"}:
+        raise ValueError
+    return {
+        "cursor": None if cursor in (None, "") else int(cursor),
+        "project": None if project is None else int(project),
+        "kinds": kinds,
+        "limit": limit,
+    }
+
+
+async def read_changes(cursor, project, kinds, limit):
+    changes = Change.objects.since(cursor, limit, project, kinds)
+    return [
+        {key: row[name] for key, name in CHANGE_FIELDS.items()}
+        async for row in changes.values(*CHANGE_FIELDS.values())
+    ]
+
+
+async def start_cursor(params):
+    """
+    Return the cursor to read from, or None when changes after the given one
+    have been pruned and the client must reload instead.
+    """
+    if params["cursor"] is not None:
+        oldest = (
+            await Change.objects.order_by("pk").values_list("pk", flat=True).afirst()
+        )
+        if params["cursor"] and oldest and params["cursor"] < oldest - 1:
+            return None
+        return params["cursor"]
+    # No cursor, start from now
+    latest = await Change.objects.order_by("-pk").values_list("pk", flat=True).afirst()
+    return latest or 0
+
+
+def poll_interval():
+    return getattr(settings, "MODELS_TASK_CHANGES_POLL_INTERVAL", 1.0)
+
+
+async def changes(request):
+    """
+    Long-poll the change feed: return the changes after ``cursor``, waiting up
+    to ``wait`` seconds for one to happen. Without a cursor the current one is
+    returned, to start from.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    try:
+        params = change_params(request)
+        wait = float(request.GET.get("wait", 0))
+        if not 0 <= wait <= getattr(settings, "MODELS_TASK_CHANGES_MAX_WAIT", 25):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"error": "Invalid query parameters."}, status=400)
+    given = params["cursor"]
+    cursor = await start_cursor(params)
+    if cursor is None:
+        return JsonResponse({"error": "Cursor expired, reload."}, status=410)
+    if given is None:
+        return JsonResponse({"results": [], "cursor": cursor})
+
+    deadline = time.monotonic() + wait
+    while True:
+        results = await read_changes(
+            cursor, params["project"], params["kinds"], params["limit"]
+        )
+        if results or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(min(poll_interval(), deadline - time.monotonic()))
+    if results:
+        cursor = results[-1]["cursor"]
+    return JsonResponse({"results": results, "cursor": cursor}, encoder=JSONEncoder)
+
+
+async def change_stream(request):
+    """
+    The change feed as Server-Sent Events. Each event's id is its cursor, so
+    a reconnecting EventSource resumes where it left off. Streams end after
+    ``MODELS_TASK_CHANGES_STREAM_TIMEOUT`` seconds and the client reconnects.
+    Serve it through ASGI, WSGI servers would hold a thread per client.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    try:
+        params = change_params(request)
+    except ValueError:
+        return JsonResponse({"error": "Invalid query parameters."}, status=400)
+    cursor = await start_cursor(params)
+    if cursor is None:
+        return JsonResponse({"error": "Cursor expired, reload."}, status=410)
+    return StreamingHttpResponse(
+        change_events(cursor, params),
+        content_type="text/event-stream",
+        # Proxies must not buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def change_events(cursor, params):
+    deadline = time.monotonic() + getattr(
+        settings, "MODELS_TASK_CHANGES_STREAM_TIMEOUT", 300
+    )
+    sent = time.monotonic()
+    yield "retry: 2000\n\n"
+    while time.monotonic() < deadline:
+        results = await read_changes(
+            cursor, params["project"], params["kinds"], params["limit"]
+        )
+        for item in results:
+            data = json.dumps(item, cls=JSONEncoder)
+            yield f"id: {item['cursor']}\nevent: change\ndata: {data}\n\n"
+        if results:
+            cursor, sent = results[-1]["cursor"], time.monotonic()
+            continue
+        if time.monotonic() - sent > 15:
+            # Keeps idle connections from being closed by proxies
+            yield ": keepalive\n\n"
+            sent = time.monotonic()
+        await asyncio.sleep(poll_interval())
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "models_task.middleware.QueryProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -79,9 +81,40 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Take the write lock at BEGIN so concurrent writers queue up on
+            # busy_timeout instead of failing when upgrading a read lock
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory (LRU once MAX_ENTRIES is reached) unless REDIS_URL is set. With
+# Redis, configure maxmemory-policy allkeys-lru on the server for eviction.
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+            "TIMEOUT": 300,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "models-task",
+            "TIMEOUT": 300,
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+
+# Cache alias used by models_task.cache
+MODELS_TASK_CACHE = "default"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -119,7 +152,80 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+MEDIA_URL = "media/"
+
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Uploads go straight to disk, hashed on the way, for the content-addressed
+# document storage (see models_task.storage)
+FILE_UPLOAD_HANDLERS = ["models_task.storage.HashingUploadHandler"]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Changelist counts
+# Admin changelists count up to this many rows exactly and fall back to table
+# statistics or a cached count above it (see models_task.paginator).
+
+MODELS_TASK_EXACT_COUNT_THRESHOLD = 10000
+
+MODELS_TASK_COUNT_CACHE_TIMEOUT = 60
+
+
+# Request profiling
+# Snapshots of models_task.middleware.QueryProfilingMiddleware, read by the
+# profile_report command and /api/profiling/.
+
+MODELS_TASK_PROFILING_SAMPLE_RATE = 1.0
+
+MODELS_TASK_PROFILING_DIR = BASE_DIR / "profiling"
+
+MODELS_TASK_PROFILING_FLUSH_INTERVAL = 30
+
+
+# Document downloads
+# When set, downloads are handed to the web server through this header
+# ("X-Accel-Redirect" for nginx, "X-Sendfile" for Apache) instead of being
+# streamed by Django. The header carries MODELS_TASK_SENDFILE_PREFIX plus the
+# file name, or the absolute path when no prefix is set.
+
+MODELS_TASK_SENDFILE_HEADER = None
+
+MODELS_TASK_SENDFILE_PREFIX = None
+
+
+# Profile picture thumbnails
+# Generated by models_task.thumbnails in a background thread pool. 0 workers
+# generates them inline once the saving transaction commits.
+
+MODELS_TASK_THUMBNAIL_SIZES = {"small": 64, "medium": 256}
+
+MODELS_TASK_THUMBNAIL_FORMAT = "WEBP"
+
+MODELS_TASK_THUMBNAIL_WORKERS = 2
+
+
+# Project deletion
+# The admin's "Delete selected projects in batches" action runs
+# models_task.deletion in a background thread. When False it runs inline
+# once the request's transaction commits.
+
+MODELS_TASK_BACKGROUND_DELETION = True
+
+
+# Change feed
+# Read by /api/changes/ (long-poll) and /api/changes/stream/ (Server-Sent
+# Events), pruned by the prune_changes command.
+
+MODELS_TASK_CHANGES_POLL_INTERVAL = 1.0
+
+MODELS_TASK_CHANGES_MAX_WAIT = 25
+
+MODELS_TASK_CHANGES_STREAM_TIMEOUT = 300
+
+MODELS_TASK_CHANGES_KEEP = 100000
+
+MODELS_TASK_CHANGES_KEEP_DAYS = 7
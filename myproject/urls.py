@@ -15,9 +15,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/", include("models_task.urls")),
+    # Only serves files with DEBUG on, the web server does otherwise
+    *static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT),
 ]